@@ -0,0 +1,127 @@
+import glob
+import os
+import sys
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Iterable, Iterator
+
+from app.main import COMMANDS, USAGE, OutputFormat, parse_arguments
+from app.protocol import OUTPUT_ENCODING, OUTPUT_ERRORS
+from app.server import handle, start_worker
+
+SOURCE_SUFFIX = ".lox"
+# Files handed to a worker at a time, up to this many
+MAX_CHUNK_SIZE = 64
+
+
+def find_sources(target: str) -> list[str]:
+    """
+    Files named by a directory, searched recursively for Lox sources, a glob
+    pattern, or a manifest listing a path per line relative to itself.
+    Blank lines and lines starting with # are skipped.
+    """
+    if os.path.isdir(target):
+        sources = []
+        for directory, subdirectories, files in os.walk(target):
+            subdirectories.sort()
+            sources.extend(
+                os.path.join(directory, name)
+                for name in sorted(files)
+                if name.endswith(SOURCE_SUFFIX)
+            )
+        return sources
+
+    if any(character in target for character in "*?["):
+        # Patterns like dir/** match the directories too
+        return sorted(
+            path for path in glob.glob(target, recursive=True) if os.path.isfile(path)
+        )
+
+    base = os.path.dirname(target)
+    with open(target) as manifest:
+        lines = [line.strip() for line in manifest]
+    return [
+        os.path.join(base, line) for line in lines if line and not line.startswith("#")
+    ]
+
+
+def _chunk_size(count: int, jobs: int) -> int:
+    # A few chunks per worker balance the load, larger ones cut the overhead
+    return max(1, min(MAX_CHUNK_SIZE, count // (jobs * 4)))
+
+
+def run_files(
+    command: str, sources: list[str], options: list[str], jobs: int = 1
+) -> Iterator[dict[str, Any]]:
+    """
+    Responses of running the command on each source, as handled by serve,
+    in the order of the sources while the pool works ahead.
+    """
+    requests = [{"arguments": [command, source, *options]} for source in sources]
+    with ProcessPoolExecutor(jobs, initializer=start_worker) as pool:
+        yield from pool.map(handle, requests, chunksize=_chunk_size(len(sources), jobs))
+
+
+def _report(sources: list[str], responses: Iterable[dict[str, Any]]) -> Counter:
+    statuses: Counter[int] = Counter()
+    for source, response in zip(sources, responses):
+        statuses[response["status"]] += 1
+        sys.stdout.write(f"==> {source} <==\n")
+        sys.stdout.flush()
+        sys.stdout.buffer.write(
+            response["stdout"].encode(OUTPUT_ENCODING, OUTPUT_ERRORS)
+        )
+        sys.stdout.buffer.flush()
+        for line in response["stderr"].splitlines():
+            print(f"{source}: {line}", file=sys.stderr)
+        if response["status"]:
+            print(f"{source}: exit {response['status']}", file=sys.stderr)
+    return statuses
+
+
+def batch(arguments: list[str]) -> int:
+    """
+    Run a command over many files with a pool of --jobs processes, writing
+    each file's output under a header in the order of the files, then a
+    summary. Returns the highest exit status of any file.
+    """
+    try:
+        positional, options = parse_arguments(arguments)
+    except ValueError as error:
+        print(error, file=sys.stderr)
+        return 1
+    if len(positional) < 2:
+        print(USAGE, file=sys.stderr)
+        return 1
+
+    command, target = positional[:2]
+    if command not in COMMANDS:
+        print(f"Unknown command: {command}", file=sys.stderr)
+        return 1
+    if options["format"] is not OutputFormat.TEXT:
+        print("Batch output is text only", file=sys.stderr)
+        return 1
+    try:
+        sources = find_sources(target)
+    except OSError as error:
+        print(error, file=sys.stderr)
+        return 1
+
+    # Files are scanned serially, their workers are the parallelism
+    per_file = [
+        argument
+        for argument in arguments
+        if argument.startswith("--") and not argument.startswith("--jobs")
+    ]
+    statuses = _report(sources, run_files(command, sources, per_file, options["jobs"]))
+
+    failed = sum(count for status, count in statuses.items() if status)
+    summary = f"{len(sources)} files, {len(sources) - failed} ok, {failed} failed"
+    if failed:
+        summary += "".join(
+            f", exit {status}: {count}"
+            for status, count in sorted(statuses.items())
+            if status
+        )
+    print(summary, file=sys.stderr)
+    return max(statuses, default=0)
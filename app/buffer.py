@@ -0,0 +1,142 @@
+from array import array
+from collections.abc import Sequence
+from typing import Any, Iterator, Optional, Union, overload
+
+from app.lines import LineIndex, offset_typecode
+from app.symbols import SymbolTable
+from app.tokenization import NumericMode, Token, TokenType
+
+TOKEN_TYPES: list[TokenType] = list(TokenType)
+TOKEN_TYPE_IDS: dict[TokenType, int] = {
+    token_type: type_id for type_id, token_type in enumerate(TOKEN_TYPES)
+}
+_IDENTIFIER_ID = TOKEN_TYPE_IDS[TokenType.IDENTIFIER]
+_NUMBER_ID = TOKEN_TYPE_IDS[TokenType.NUMBER]
+
+
+class TokenBuffer(Sequence):
+    """
+    Token stream stored as parallel arrays of type id, start offset, length,
+    line number and symbol id. Lexemes and literals are sliced out of the
+    source (or taken from the symbol table) only when a token is actually
+    requested. Offsets, lengths and lines take 2, 4 or 8 bytes depending on
+    the size of the source, so a buffered token costs 11 to 29 bytes instead
+    of a dataclass, a lexeme copy and a literal object.
+    """
+
+    def __init__(
+        self,
+        source: str,
+        symbols: Optional[SymbolTable] = None,
+        numeric: NumericMode = NumericMode.DECIMAL,
+    ):
+        self.source = source
+        self.symbols = symbols if symbols is not None else SymbolTable()
+        self.numeric = numeric
+        typecode = offset_typecode(len(source))
+        self.types = array("B")
+        self.starts = array(typecode)
+        self.lengths = array(typecode)
+        self.lines = array(typecode)
+        # -1 for tokens that are neither identifiers nor strings
+        self.symbol_ids = array("i")
+        # Set by the scanner, or built on first use
+        self.line_index: Optional[LineIndex] = None
+
+    def append(
+        self,
+        token_type: TokenType,
+        start: int,
+        length: int,
+        line: int,
+        symbol: int = -1,
+    ):
+        self.types.append(TOKEN_TYPE_IDS[token_type])
+        self.starts.append(start)
+        self.lengths.append(length)
+        self.lines.append(line)
+        self.symbol_ids.append(symbol)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(
+            column.itemsize * len(column)
+            for column in (
+                self.types,
+                self.starts,
+                self.lengths,
+                self.lines,
+                self.symbol_ids,
+            )
+        )
+
+    def type(self, index: int) -> TokenType:
+        return TOKEN_TYPES[self.types[index]]
+
+    def lexeme(self, index: int) -> str:
+        symbol = self.symbol_ids[index]
+        if symbol >= 0 and self.types[index] == _IDENTIFIER_ID:
+            return self.symbols.names[symbol]
+        start = self.starts[index]
+        return self.source[start : start + self.lengths[index]]
+
+    def literal(self, index: int) -> Any:
+        token_type = TOKEN_TYPES[self.types[index]]
+        if token_type == TokenType.NUMBER:
+            return self.numeric.convert(self.lexeme(index))
+        if token_type == TokenType.STRING:
+            symbol = self.symbol_ids[index]
+            if symbol >= 0:
+                return self.symbols.names[symbol]
+            start = self.starts[index]
+            return self.source[start + 1 : start + self.lengths[index] - 1]
+        return None
+
+    def symbol(self, index: int) -> Optional[int]:
+        symbol = self.symbol_ids[index]
+        return None if symbol < 0 else symbol
+
+    def line(self, index: int) -> int:
+        return self.lines[index]
+
+    def position(self, index: int) -> tuple[int, int]:
+        """Line and column where a token starts."""
+        if self.line_index is None:
+            self.line_index = LineIndex.build(self.source)
+        return self.line_index.position(self.starts[index])
+
+    def __len__(self) -> int:
+        return len(self.types)
+
+    @overload
+    def __getitem__(self, index: int) -> Token: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> list[Token]: ...
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[Token, list[Token]]:
+        if isinstance(index, slice):
+            return [self._token(idx) for idx in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("token index out of range")
+        return self._token(index)
+
+    def __iter__(self) -> Iterator[Token]:
+        for index in range(len(self)):
+            yield self._token(index)
+
+    def _token(self, index: int) -> Token:
+        if self.types[index] == _NUMBER_ID:
+            return Token.number(
+                self.lexeme(index), self.lines[index], self.numeric, self.starts[index]
+            )
+        return Token(
+            TOKEN_TYPES[self.types[index]],
+            self.lexeme(index),
+            self.literal(index),
+            self.lines[index],
+            self.symbol(index),
+            offset=self.starts[index],
+        )
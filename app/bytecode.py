@@ -0,0 +1,678 @@
+import math
+from array import array
+from dataclasses import dataclass, field
+from enum import IntEnum
+from typing import Any, Iterator, Optional
+
+from app.errors import ParseError
+from app.objects import InlineCache
+from app.runtime import stringify, unsupported
+from app.syntax import (
+    Assign,
+    Binary,
+    Block,
+    Call,
+    Class,
+    Expr,
+    Expression,
+    Function,
+    Get,
+    Grouping,
+    If,
+    Literal,
+    Logical,
+    Print,
+    Return,
+    Set,
+    Stmt,
+    Super,
+    This,
+    Unary,
+    Var,
+    Variable,
+    While,
+)
+from app.tokenization import Token, TokenType
+
+# Locals and upvalues are addressed by one byte, constants and jumps by two
+MAX_LOCALS = 1 << 8
+MAX_UPVALUES = 1 << 8
+MAX_CONSTANTS = 1 << 16
+MAX_JUMP = (1 << 16) - 1
+
+
+class OpCode(IntEnum):
+    CONSTANT = 0
+    NIL = 1
+    TRUE = 2
+    FALSE = 3
+    POP = 4
+    GET_LOCAL = 5
+    SET_LOCAL = 6
+    GET_GLOBAL = 7
+    DEFINE_GLOBAL = 8
+    SET_GLOBAL = 9
+    GET_UPVALUE = 10
+    SET_UPVALUE = 11
+    EQUAL = 12
+    NOT_EQUAL = 13
+    GREATER = 14
+    GREATER_EQUAL = 15
+    LESS = 16
+    LESS_EQUAL = 17
+    ADD = 18
+    SUBTRACT = 19
+    MULTIPLY = 20
+    DIVIDE = 21
+    NOT = 22
+    NEGATE = 23
+    PRINT = 24
+    JUMP = 25
+    JUMP_IF_FALSE = 26
+    JUMP_IF_TRUE = 27
+    POP_JUMP_IF_FALSE = 28
+    LOOP = 29
+    CALL = 30
+    CLOSURE = 31
+    CLOSE_UPVALUE = 32
+    RETURN = 33
+    TAIL_CALL = 34
+    CLASS = 35
+    INHERIT = 36
+    METHOD = 37
+    GET_PROPERTY = 38
+    SET_PROPERTY = 39
+    GET_SUPER = 40
+    INVOKE = 41
+
+
+BYTE_OPERAND = (
+    OpCode.GET_LOCAL,
+    OpCode.SET_LOCAL,
+    OpCode.GET_UPVALUE,
+    OpCode.SET_UPVALUE,
+    OpCode.CALL,
+    OpCode.TAIL_CALL,
+)
+CONSTANT_OPERAND = (
+    OpCode.CONSTANT,
+    OpCode.GET_GLOBAL,
+    OpCode.DEFINE_GLOBAL,
+    OpCode.SET_GLOBAL,
+    OpCode.CLASS,
+    OpCode.METHOD,
+    OpCode.GET_PROPERTY,
+    OpCode.SET_PROPERTY,
+    OpCode.GET_SUPER,
+)
+JUMP_OPERAND = (
+    OpCode.JUMP,
+    OpCode.JUMP_IF_FALSE,
+    OpCode.JUMP_IF_TRUE,
+    OpCode.POP_JUMP_IF_FALSE,
+)
+
+BINARY_OPCODES: dict[TokenType, OpCode] = {
+    TokenType.PLUS: OpCode.ADD,
+    TokenType.MINUS: OpCode.SUBTRACT,
+    TokenType.STAR: OpCode.MULTIPLY,
+    TokenType.SLASH: OpCode.DIVIDE,
+    TokenType.EQUAL_EQUAL: OpCode.EQUAL,
+    TokenType.BANG_EQUAL: OpCode.NOT_EQUAL,
+    TokenType.GREATER: OpCode.GREATER,
+    TokenType.GREATER_EQUAL: OpCode.GREATER_EQUAL,
+    TokenType.LESS: OpCode.LESS,
+    TokenType.LESS_EQUAL: OpCode.LESS_EQUAL,
+}
+
+
+class Chunk:
+    """Bytecode of one function: opcodes with inline operands, a constant
+    pool and the source line of every byte."""
+
+    def __init__(self):
+        self.code = array("B")
+        self.lines = array("I")
+        self.constants: list[Any] = []
+        # Copy of code as a list, indexing it is much faster in the VM loop
+        self.ops: list[int] = []
+        # (class, value, sign) -> index, so 1.0 and true never share a slot
+        # and neither do 0.0 and -0.0
+        self._constant_indexes: dict[tuple[type, Any, float], int] = {}
+
+    def write(self, byte: int, line: int) -> None:
+        self.code.append(byte)
+        self.lines.append(line)
+
+    def finish(self) -> None:
+        self.ops = self.code.tolist()
+
+    def add_constant(self, value: Any) -> Optional[int]:
+        """Index of value in the pool, None once the pool is full."""
+        sign = math.copysign(1.0, value) if value.__class__ is float else 1.0
+        key = (value.__class__, value, sign)
+        index = self._constant_indexes.get(key)
+        if index is None:
+            index = len(self.constants)
+            if index >= MAX_CONSTANTS:
+                return None
+            self.constants.append(value)
+            self._constant_indexes[key] = index
+        return index
+
+
+class FunctionProto:
+    __slots__ = ("name", "arity", "chunk", "upvalue_count")
+
+    def __init__(self, name: Optional[str], arity: int = 0):
+        self.name = name
+        self.arity = arity
+        self.chunk = Chunk()
+        self.upvalue_count = 0
+
+    def __str__(self) -> str:
+        return "<script>" if self.name is None else f"<fn {self.name}>"
+
+
+@dataclass(slots=True)
+class Local:
+    name: str
+    # Scope depth, -1 while the initializer is still being compiled
+    depth: int
+    captured: bool = False
+
+
+@dataclass(slots=True)
+class FunctionState:
+    function: FunctionProto
+    enclosing: Optional["FunctionState"]
+    is_script: bool
+    # Slot zero holds the called closure itself, or "this" in methods
+    locals: list[Local] = field(default_factory=lambda: [Local("", 0)])
+    upvalues: list[tuple[int, int]] = field(default_factory=list)
+    scope_depth: int = 0
+    # Initializers return "this" from slot zero
+    is_initializer: bool = False
+
+
+class BytecodeCompiler:
+    """
+    Compiles the AST into clox style bytecode: locals live in stack slots,
+    variables captured by closures are reached through upvalues and
+    everything else is a global looked up by name.
+
+    Property gets, sets and method invocations take an InlineCache from
+    the constant pool as their operand, shared with the closure backend's
+    shapes.
+    """
+
+    def __init__(self):
+        self.state: FunctionState
+        self.line = 1
+        self.token: Token = Token(TokenType.EOF, "", None, 1)
+        # Whether each class being compiled has a superclass
+        self.classes: list[bool] = []
+        # One per property access site compiled, for their hit rates
+        self.inline_caches: list[InlineCache] = []
+
+    def compile_program(self, statements: list[Stmt]) -> FunctionProto:
+        self.state = FunctionState(FunctionProto(None), None, True)
+        for statement in statements:
+            self._statement(statement)
+        self._emit(OpCode.NIL)
+        self._emit(OpCode.RETURN)
+        self.state.function.chunk.finish()
+        return self.state.function
+
+    def compile_expression(self, expression: Expr) -> FunctionProto:
+        """Compile a script returning the value of a single expression."""
+        self.state = FunctionState(FunctionProto(None), None, True)
+        self._expression(expression)
+        self._emit(OpCode.RETURN)
+        self.state.function.chunk.finish()
+        return self.state.function
+
+    def _at(self, token: Token) -> None:
+        self.token = token
+        self.line = token.line
+
+    def _error(self, message: str) -> ParseError:
+        return ParseError(self.token, message)
+
+    def _emit(self, *data: int) -> None:
+        chunk = self.state.function.chunk
+        for byte in data:
+            chunk.write(byte, self.line)
+
+    def _emit_constant(self, opcode: OpCode, value: Any) -> None:
+        index = self.state.function.chunk.add_constant(value)
+        if index is None:
+            raise self._error("Too many constants in one chunk.")
+        self._emit(opcode, index >> 8, index & 0xFF)
+
+    def _emit_jump(self, opcode: OpCode) -> int:
+        self._emit(opcode, 0xFF, 0xFF)
+        return len(self.state.function.chunk.code) - 2
+
+    def _patch_jump(self, offset: int) -> None:
+        code = self.state.function.chunk.code
+        jump = len(code) - offset - 2
+        if jump > MAX_JUMP:
+            raise self._error("Too much code to jump over.")
+        code[offset] = jump >> 8
+        code[offset + 1] = jump & 0xFF
+
+    def _emit_loop(self, loop_start: int) -> None:
+        offset = len(self.state.function.chunk.code) - loop_start + 3
+        if offset > MAX_JUMP:
+            raise self._error("Loop body too large.")
+        self._emit(OpCode.LOOP, offset >> 8, offset & 0xFF)
+
+    def _statement(self, statement: Stmt) -> None:
+        if isinstance(statement, Expression):
+            self._expression(statement.expression)
+            self._emit(OpCode.POP)
+        elif isinstance(statement, Print):
+            self._expression(statement.expression)
+            self._emit(OpCode.PRINT)
+        elif isinstance(statement, Var):
+            self._var(statement)
+        elif isinstance(statement, Block):
+            self._begin_scope()
+            for inner in statement.statements:
+                self._statement(inner)
+            self._end_scope()
+        elif isinstance(statement, If):
+            self._if(statement)
+        elif isinstance(statement, While):
+            self._while(statement)
+        elif isinstance(statement, Function):
+            self._function_declaration(statement)
+        elif isinstance(statement, Class):
+            self._class(statement)
+        elif isinstance(statement, Return):
+            self._return(statement)
+        else:
+            raise unsupported(statement)
+
+    def _var(self, statement: Var) -> None:
+        self._at(statement.name)
+        self._declare(statement.name)
+        if statement.initializer is None:
+            self._emit(OpCode.NIL)
+        else:
+            self._expression(statement.initializer)
+        self._define(statement.name)
+
+    def _if(self, statement: If) -> None:
+        self._expression(statement.condition)
+        then_jump = self._emit_jump(OpCode.POP_JUMP_IF_FALSE)
+        self._statement(statement.then_branch)
+        if statement.else_branch is None:
+            self._patch_jump(then_jump)
+            return
+        else_jump = self._emit_jump(OpCode.JUMP)
+        self._patch_jump(then_jump)
+        self._statement(statement.else_branch)
+        self._patch_jump(else_jump)
+
+    def _while(self, statement: While) -> None:
+        loop_start = len(self.state.function.chunk.code)
+        self._expression(statement.condition)
+        exit_jump = self._emit_jump(OpCode.POP_JUMP_IF_FALSE)
+        self._statement(statement.body)
+        self._emit_loop(loop_start)
+        self._patch_jump(exit_jump)
+
+    def _function_declaration(self, statement: Function) -> None:
+        self._at(statement.name)
+        self._declare(statement.name)
+        # Initialized before the body, so the function can call itself
+        self._mark_initialized()
+        self._function(statement)
+        self._define(statement.name)
+
+    def _function(
+        self, statement: Function, method: bool = False, initializer: bool = False
+    ) -> None:
+        """Compile a function and emit the closure creating it."""
+        name = statement.name.lexeme
+        state = FunctionState(
+            FunctionProto(name, len(statement.params)),
+            self.state,
+            False,
+            [Local("this" if method else "", 0)],
+            is_initializer=initializer,
+        )
+        self.state = state
+        self._begin_scope()
+        for param in statement.params:
+            self._at(param)
+            self._declare(param)
+            self._mark_initialized()
+        for inner in statement.body:
+            self._statement(inner)
+        self._emit_return()
+        state.function.chunk.finish()
+        self.state = state.enclosing
+
+        function = state.function
+        function.upvalue_count = len(state.upvalues)
+        self._at(statement.name)
+        self._emit_constant(OpCode.CLOSURE, function)
+        for is_local, index in state.upvalues:
+            self._emit(is_local, index)
+
+    def _class(self, statement: Class) -> None:
+        name = statement.name
+        self._at(name)
+        self._declare(name)
+        self._emit_constant(OpCode.CLASS, name.lexeme)
+        self._define(name)
+
+        superclass = statement.superclass
+        self.classes.append(superclass is not None)
+        if superclass is not None:
+            # The superclass stays on the stack as the local "super", which
+            # methods capture
+            self._begin_scope()
+            self._variable_access(superclass.name, setter=False)
+            self._add_local("super")
+            self._mark_initialized()
+            self._variable_access(name, setter=False)
+            self._at(superclass.name)
+            self._emit(OpCode.INHERIT)
+
+        self._variable_access(name, setter=False)
+        for method in statement.methods:
+            self._function(method, True, method.name.lexeme == "init")
+            self._at(method.name)
+            self._emit_constant(OpCode.METHOD, method.name.lexeme)
+        self._emit(OpCode.POP)
+        if superclass is not None:
+            self._end_scope()
+        self.classes.pop()
+
+    def _return(self, statement: Return) -> None:
+        self._at(statement.keyword)
+        if self.state.is_script:
+            raise self._error("Can't return from top-level code.")
+        value = statement.value
+        if self.state.is_initializer:
+            if value is not None:
+                raise self._error("Can't return a value from an initializer.")
+            self._emit_return()
+            return
+        if value is None:
+            self._emit(OpCode.NIL)
+        elif isinstance(value, Call):
+            # The callee takes over the frame, RETURN is only reached when
+            # the callee is native
+            self._call(value, OpCode.TAIL_CALL)
+        else:
+            self._expression(value)
+        self._emit(OpCode.RETURN)
+
+    def _emit_return(self) -> None:
+        if self.state.is_initializer:
+            self._emit(OpCode.GET_LOCAL, 0)
+        else:
+            self._emit(OpCode.NIL)
+        self._emit(OpCode.RETURN)
+
+    def _begin_scope(self) -> None:
+        self.state.scope_depth += 1
+
+    def _end_scope(self) -> None:
+        state = self.state
+        state.scope_depth -= 1
+        locals_ = state.locals
+        while locals_ and locals_[-1].depth > state.scope_depth:
+            if locals_.pop().captured:
+                self._emit(OpCode.CLOSE_UPVALUE)
+            else:
+                self._emit(OpCode.POP)
+
+    def _declare(self, name: Token) -> None:
+        state = self.state
+        if state.scope_depth == 0:
+            return
+        for local in reversed(state.locals):
+            if local.depth != -1 and local.depth < state.scope_depth:
+                break
+            if local.name == name.lexeme:
+                raise self._error("Already a variable with this name in this scope.")
+        self._add_local(name.lexeme)
+
+    def _add_local(self, name: str) -> None:
+        state = self.state
+        if len(state.locals) >= MAX_LOCALS:
+            raise self._error("Too many local variables in function.")
+        state.locals.append(Local(name, -1))
+
+    def _mark_initialized(self) -> None:
+        state = self.state
+        if state.scope_depth:
+            state.locals[-1].depth = state.scope_depth
+
+    def _define(self, name: Token) -> None:
+        if self.state.scope_depth:
+            # The value left on the stack becomes the local slot
+            self._mark_initialized()
+            return
+        self._at(name)
+        self._emit_constant(OpCode.DEFINE_GLOBAL, name.lexeme)
+
+    def _resolve_local(
+        self, state: FunctionState, name: Token, setter: bool = False
+    ) -> int:
+        for slot in range(len(state.locals) - 1, -1, -1):
+            local = state.locals[slot]
+            if local.name == name.lexeme:
+                # Resolver lets the initializer assign, but not read, it
+                if local.depth == -1 and not setter:
+                    raise ParseError(
+                        name, "Can't read local variable in its own initializer."
+                    )
+                return slot
+        return -1
+
+    def _resolve_upvalue(self, state: FunctionState, name: Token) -> int:
+        enclosing = state.enclosing
+        if enclosing is None:
+            return -1
+        slot = self._resolve_local(enclosing, name)
+        if slot != -1:
+            enclosing.locals[slot].captured = True
+            return self._add_upvalue(state, 1, slot)
+        index = self._resolve_upvalue(enclosing, name)
+        if index != -1:
+            return self._add_upvalue(state, 0, index)
+        return -1
+
+    def _add_upvalue(self, state: FunctionState, is_local: int, index: int) -> int:
+        upvalue = (is_local, index)
+        if upvalue in state.upvalues:
+            return state.upvalues.index(upvalue)
+        if len(state.upvalues) >= MAX_UPVALUES:
+            raise self._error("Too many closure variables in function.")
+        state.upvalues.append(upvalue)
+        return len(state.upvalues) - 1
+
+    def _variable_access(self, name: Token, setter: bool) -> None:
+        self._at(name)
+        slot = self._resolve_local(self.state, name, setter)
+        if slot != -1:
+            if self.state.locals[slot].depth == -1:
+                # Its slot is not on the stack yet, and the initializer
+                # overwrites the value anyway, so the value is only left
+                return
+            self._emit(OpCode.SET_LOCAL if setter else OpCode.GET_LOCAL, slot)
+            return
+        index = self._resolve_upvalue(self.state, name)
+        if index != -1:
+            self._emit(OpCode.SET_UPVALUE if setter else OpCode.GET_UPVALUE, index)
+            return
+        opcode = OpCode.SET_GLOBAL if setter else OpCode.GET_GLOBAL
+        self._emit_constant(opcode, name.lexeme)
+
+    def _expression(self, expression: Expr) -> None:
+        if isinstance(expression, Binary):
+            self._expression(expression.left)
+            self._expression(expression.right)
+            self._at(expression.operator)
+            self._emit(BINARY_OPCODES[expression.operator.type])
+        elif isinstance(expression, Literal):
+            value = expression.value
+            if value is None:
+                self._emit(OpCode.NIL)
+            elif value is True:
+                self._emit(OpCode.TRUE)
+            elif value is False:
+                self._emit(OpCode.FALSE)
+            else:
+                self._emit_constant(OpCode.CONSTANT, value)
+        elif isinstance(expression, Variable):
+            self._variable_access(expression.name, setter=False)
+        elif isinstance(expression, Grouping):
+            self._expression(expression.expression)
+        elif isinstance(expression, Assign):
+            self._expression(expression.value)
+            self._variable_access(expression.name, setter=True)
+        elif isinstance(expression, Call):
+            self._call(expression, OpCode.CALL)
+        elif isinstance(expression, Get):
+            self._expression(expression.object)
+            self._at(expression.name)
+            cache = self._inline_cache("get", expression.name)
+            self._emit_constant(OpCode.GET_PROPERTY, cache)
+        elif isinstance(expression, Set):
+            self._expression(expression.object)
+            self._expression(expression.value)
+            self._at(expression.name)
+            cache = self._inline_cache("set", expression.name)
+            self._emit_constant(OpCode.SET_PROPERTY, cache)
+        elif isinstance(expression, This):
+            self._at(expression.keyword)
+            if not self.classes:
+                raise self._error("Can't use 'this' outside of a class.")
+            self._variable_access(expression.keyword, setter=False)
+        elif isinstance(expression, Super):
+            self._super(expression)
+        elif isinstance(expression, Unary):
+            self._expression(expression.right)
+            self._at(expression.operator)
+            if expression.operator.type == TokenType.BANG:
+                self._emit(OpCode.NOT)
+            else:
+                self._emit(OpCode.NEGATE)
+        elif isinstance(expression, Logical):
+            self._logical(expression)
+        else:
+            raise unsupported(expression)
+
+    def _call(self, expression: Call, opcode: OpCode) -> None:
+        callee = expression.callee
+        if isinstance(callee, Get):
+            # Methods are invoked without binding them first, never in tail
+            # position
+            self._expression(callee.object)
+        else:
+            self._expression(callee)
+        for argument in expression.arguments:
+            self._expression(argument)
+        self._at(expression.paren)
+        count = len(expression.arguments)
+        if isinstance(callee, Get):
+            cache = self._inline_cache("invoke", callee.name)
+            self._emit_constant(OpCode.INVOKE, cache)
+            self._emit(count)
+        else:
+            self._emit(opcode, count)
+
+    def _super(self, expression: Super) -> None:
+        keyword = expression.keyword
+        self._at(keyword)
+        if not self.classes:
+            raise self._error("Can't use 'super' outside of a class.")
+        if not self.classes[-1]:
+            raise self._error("Can't use 'super' in a class with no superclass.")
+        this = Token(TokenType.THIS, "this", None, keyword.line, offset=keyword.offset)
+        self._variable_access(this, setter=False)
+        self._variable_access(keyword, setter=False)
+        self._at(expression.method)
+        self._emit_constant(OpCode.GET_SUPER, expression.method.lexeme)
+
+    def _inline_cache(self, kind: str, name: Token) -> InlineCache:
+        cache = InlineCache(kind, name.lexeme, name.line)
+        self.inline_caches.append(cache)
+        return cache
+
+    def _logical(self, expression: Logical) -> None:
+        # The left value stays on the stack when it decides the result
+        self._expression(expression.left)
+        self._at(expression.operator)
+        if expression.operator.type == TokenType.OR:
+            end_jump = self._emit_jump(OpCode.JUMP_IF_TRUE)
+        else:
+            end_jump = self._emit_jump(OpCode.JUMP_IF_FALSE)
+        self._emit(OpCode.POP)
+        self._expression(expression.right)
+        self._patch_jump(end_jump)
+
+
+def disassemble(function: FunctionProto) -> Iterator[str]:
+    """Yield a clox style listing of the function and all nested ones."""
+    pending = [function]
+    while pending:
+        function = pending.pop(0)
+        chunk = function.chunk
+        name = "<script>" if function.name is None else function.name
+        yield f"== {name} =="
+        offset = 0
+        while offset < len(chunk.code):
+            text, offset, nested = _instruction(chunk, offset)
+            yield text
+            pending.extend(nested)
+
+
+def _instruction(
+    chunk: Chunk, offset: int
+) -> tuple[str, int, list[FunctionProto]]:
+    code = chunk.code
+    opcode = OpCode(code[offset])
+    line = chunk.lines[offset]
+    if offset and chunk.lines[offset - 1] == line:
+        prefix = f"{offset:04d}    | {opcode.name:<17}"
+    else:
+        prefix = f"{offset:04d} {line:>4} {opcode.name:<17}"
+
+    if opcode in BYTE_OPERAND:
+        return f"{prefix} {code[offset + 1]:4d}", offset + 2, []
+    if opcode in JUMP_OPERAND or opcode == OpCode.LOOP:
+        jump = code[offset + 1] << 8 | code[offset + 2]
+        target = offset + 3 + (-jump if opcode == OpCode.LOOP else jump)
+        return f"{prefix} {offset:4d} -> {target}", offset + 3, []
+
+    if opcode == OpCode.INVOKE:
+        index = code[offset + 1] << 8 | code[offset + 2]
+        name = chunk.constants[index].name
+        return f"{prefix} ({code[offset + 3]} args) {index:4d} '{name}'", offset + 4, []
+
+    if opcode in CONSTANT_OPERAND or opcode == OpCode.CLOSURE:
+        index = code[offset + 1] << 8 | code[offset + 2]
+        value = chunk.constants[index]
+        # Property sites hold their inline cache
+        text = value.name if value.__class__ is InlineCache else stringify(value)
+        text = f"{prefix} {index:4d} '{text}'"
+        offset += 3
+        if opcode != OpCode.CLOSURE:
+            return text, offset, []
+        lines = [text]
+        for _ in range(value.upvalue_count):
+            kind = "local" if code[offset] else "upvalue"
+            lines.append(f"{offset:04d}    |{'':<23}{kind} {code[offset + 1]}")
+            offset += 2
+        return "\n".join(lines), offset, [value]
+
+    return prefix.rstrip(), offset + 1, []
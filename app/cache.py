@@ -0,0 +1,184 @@
+import hashlib
+import os
+import pickle
+import tempfile
+from collections import OrderedDict
+from typing import Any, Optional
+
+INTERPRETER_VERSION = "0.1.0"
+
+MAGIC = b"LOXC"
+# Bumped whenever pickled classes change shape, old artifacts then miss
+FORMAT_VERSION = 3
+HEADER = MAGIC + FORMAT_VERSION.to_bytes(2, "big")
+
+SUFFIX = ".loxc"
+DEFAULT_MAX_BYTES = 64 << 20
+DEFAULT_MEMORY_BYTES = 16 << 20
+
+
+def configured_directory() -> Optional[str]:
+    """Cache directory named by LOX_CACHE_DIR, None leaves caching off."""
+    return os.environ.get("LOX_CACHE_DIR") or None
+
+
+def default_directory() -> str:
+    """Where the cache lives when turned on without naming a directory."""
+    directory = configured_directory()
+    if directory:
+        return directory
+    return os.path.join(os.path.expanduser("~"), ".cache", "lox")
+
+
+class ArtifactCache:
+    """
+    Directory of pickled scan and parse results, one ``<key>.loxc`` file per
+    source. Keys hash the source with the interpreter version and options,
+    so a changed script or interpreter simply misses. Hits refresh the file
+    mtime and the least recently used files are evicted once the directory
+    grows over ``max_bytes``.
+
+    The cache is an optimization only: unreadable, corrupt or unwritable
+    entries are treated as misses and never fail the run. Loading unpickles,
+    so the directory is created private to the user and entries owned by
+    anyone else are misses too.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+    @staticmethod
+    def key(source: str, *parts: str) -> str:
+        digest = hashlib.sha256()
+        for part in (INTERPRETER_VERSION, str(FORMAT_VERSION), *parts):
+            digest.update(part.encode())
+            digest.update(b"\0")
+        digest.update(source.encode())
+        return digest.hexdigest()
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.directory, key + SUFFIX)
+
+    def load(self, key: str) -> Optional[Any]:
+        path = self.path(key)
+        try:
+            with open(path, "rb") as file:
+                if os.fstat(file.fileno()).st_uid != os.getuid():
+                    return None
+                data = file.read()
+        except OSError:
+            return None
+
+        if not data.startswith(HEADER):
+            self._remove(path)
+            return None
+        try:
+            artifact = pickle.loads(memoryview(data)[len(HEADER) :])
+        except Exception:
+            self._remove(path)
+            return None
+
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return artifact
+
+    def store(self, key: str, artifact: Any) -> None:
+        try:
+            data = pickle.dumps(artifact, protocol=pickle.HIGHEST_PROTOCOL)
+        except RecursionError:
+            # Too deeply nested to pickle, such programs are just not cached
+            return
+        if len(HEADER) + len(data) > self.max_bytes:
+            return
+
+        try:
+            os.makedirs(self.directory, mode=0o700, exist_ok=True)
+            # Written aside and renamed, so readers never see partial files
+            descriptor, temporary = tempfile.mkstemp(
+                dir=self.directory, suffix=".tmp"
+            )
+        except OSError:
+            return
+        try:
+            with os.fdopen(descriptor, "wb") as file:
+                file.write(HEADER)
+                file.write(data)
+            os.replace(temporary, self.path(key))
+        except OSError:
+            self._remove(temporary)
+            return
+        self.evict()
+
+    def evict(self) -> None:
+        """Remove least recently used entries until the cap is respected."""
+        entries = []
+        total = 0
+        try:
+            with os.scandir(self.directory) as scan:
+                for entry in scan:
+                    if not entry.name.endswith(SUFFIX):
+                        continue
+                    try:
+                        stat = entry.stat()
+                    except OSError:
+                        continue
+                    entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+                    total += stat.st_size
+        except OSError:
+            return
+
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            self._remove(path)
+            total -= size
+
+    @staticmethod
+    def _remove(path: str) -> None:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+class MemoryCache:
+    """
+    Pickled artifacts kept in memory by the same keys as ArtifactCache, for
+    processes that serve many requests. Artifacts are stored pickled since
+    later passes annotate and rewrite the trees they are given, every load
+    returns a fresh copy. The least recently used entries go first once
+    ``max_bytes`` is exceeded.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_MEMORY_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.entries: OrderedDict[str, bytes] = OrderedDict()
+
+    def load(self, key: str) -> Optional[Any]:
+        data = self.entries.get(key)
+        if data is None:
+            return None
+        self.entries.move_to_end(key)
+        return pickle.loads(data)
+
+    def store(self, key: str, artifact: Any) -> None:
+        try:
+            data = pickle.dumps(artifact, protocol=pickle.HIGHEST_PROTOCOL)
+        except RecursionError:
+            return
+        if len(data) > self.max_bytes:
+            return
+
+        previous = self.entries.pop(key, None)
+        if previous is not None:
+            self.size -= len(previous)
+        self.entries[key] = data
+        self.size += len(data)
+        while self.size > self.max_bytes:
+            _, evicted = self.entries.popitem(last=False)
+            self.size -= len(evicted)
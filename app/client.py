@@ -0,0 +1,54 @@
+"""
+Thin client of the ``serve`` command: sends its command line to the server
+and replays the output and exit status, as if it ran the command itself.
+
+Usage: python -m app.client <command> <filename> [options]
+
+The server is reached at LOX_SOCKET, or the default socket path of serve.
+"""
+
+import os
+import socket
+import sys
+from typing import Any, Optional
+
+from app.protocol import (
+    OUTPUT_ENCODING,
+    OUTPUT_ERRORS,
+    default_address,
+    receive_message,
+    send_message,
+)
+
+
+def request(
+    arguments: list[str], address: Optional[str] = None, cwd: Optional[str] = None
+) -> dict[str, Any]:
+    """Response of the server to a command line: status, stdout and stderr."""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+        connection.connect(address or default_address())
+        with connection.makefile("rwb") as stream:
+            send_message(stream, {"arguments": arguments, "cwd": cwd or os.getcwd()})
+            response = receive_message(stream)
+    if response is None:
+        raise ConnectionError("Server closed the connection")
+    return response
+
+
+def main() -> None:
+    try:
+        response = request(sys.argv[1:])
+    except OSError as error:
+        print(f"Cannot reach the server: {error}", file=sys.stderr)
+        exit(1)
+
+    output = response["stdout"].encode(OUTPUT_ENCODING, OUTPUT_ERRORS)
+    sys.stdout.buffer.write(output)
+    sys.stdout.buffer.flush()
+    sys.stderr.write(response["stderr"])
+    if response["status"]:
+        exit(response["status"])
+
+
+if __name__ == "__main__":
+    main()
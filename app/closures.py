@@ -0,0 +1,780 @@
+import sys
+from typing import Any, Callable, Optional, TextIO
+
+from app.errors import LoxRuntimeError
+from app.objects import InlineCache, LoxClass, LoxInstance
+from app.runtime import (
+    NATIVE_FUNCTIONS,
+    LoxCallable,
+    Scope,
+    check_arity,
+    divide,
+    is_equal,
+    stringify,
+    unsupported,
+)
+from app.syntax import (
+    GLOBAL,
+    Assign,
+    Binary,
+    Block,
+    Call,
+    Class,
+    Expr,
+    Expression,
+    Function,
+    Get,
+    Grouping,
+    If,
+    Literal,
+    Logical,
+    Print,
+    Return,
+    Set,
+    Stmt,
+    Super,
+    This,
+    Unary,
+    Var,
+    Variable,
+    While,
+)
+from app.tokenization import Token, TokenType
+
+# An expression compiles to a function of the environment returning its value.
+# A statement compiles to one returning None, or a 1-tuple carrying the value
+# of an executed return statement up to the enclosing function.
+# Top level code runs with no local scope, None.
+Evaluator = Callable[[Optional[Scope]], Any]
+Executor = Callable[[Optional[Scope]], Optional[tuple[Any]]]
+
+_NUMBER_OPERANDS = "Operands must be numbers."
+# Lox calls recurse in Python here, running out of its stack is reported
+# at the innermost call site that can still raise
+_STACK_OVERFLOW = "Stack overflow."
+
+
+class CompiledFunction(LoxCallable):
+    __slots__ = ("name", "parameter_count", "padding", "body", "closure")
+
+    def __init__(
+        self,
+        name: str,
+        parameter_count: int,
+        slot_count: int,
+        body: Executor,
+        closure: Optional[Scope],
+    ):
+        self.name = name
+        self.parameter_count = parameter_count
+        # Appended to the arguments to fill the slots of the body locals
+        self.padding = [None] * (slot_count - parameter_count)
+        self.body = body
+        self.closure = closure
+
+    def arity(self) -> int:
+        return self.parameter_count
+
+    def call(self, arguments: list[Any]) -> Any:
+        result = self.body(Scope(arguments + self.padding, self.closure))
+        return None if result is None else result[0]
+
+    def bind(self, instance: LoxInstance) -> "CompiledFunction":
+        """The method with "this" bound, in the scope Resolver put it in."""
+        return CompiledFunction(
+            self.name,
+            self.parameter_count,
+            self.parameter_count + len(self.padding),
+            self.body,
+            Scope([instance], self.closure),
+        )
+
+    def __str__(self) -> str:
+        return f"<fn {self.name}>"
+
+
+class ClosureCompiler:
+    """
+    Translates the AST once into a tree of specialized Python closures: each
+    node becomes a function that directly calls the closures of its children,
+    so running the program never dispatches on node types again. Programs
+    must be processed by Resolver: locals are read by index from the slot
+    lists of their scope, only globals are looked up by name.
+
+    Instances keep their fields in a list laid out by their Shape. Every
+    property get, set and method call site owns an InlineCache, so once
+    warm a site checks the shape and indexes the list, without looking the
+    name up.
+    """
+
+    def __init__(self, stdout: TextIO = sys.stdout):
+        self.stdout = stdout
+        self.globals: dict[str, Any] = dict(NATIVE_FUNCTIONS)
+        # One per property access site compiled, for their hit rates
+        self.inline_caches: list[InlineCache] = []
+        self._expression_compilers: dict[type, Callable[[Any], Evaluator]] = {
+            Assign: self._assign,
+            Binary: self._binary,
+            Call: self._call,
+            Get: self._get,
+            Grouping: self._grouping,
+            Literal: self._literal,
+            Logical: self._logical,
+            Set: self._set,
+            Super: self._super,
+            This: self._this,
+            Unary: self._unary,
+            Variable: self._variable,
+        }
+        self._statement_compilers: dict[type, Callable[[Any], Executor]] = {
+            Block: self._block,
+            Class: self._class,
+            Expression: self._expression_statement,
+            Function: self._function,
+            If: self._if,
+            Print: self._print,
+            Return: self._return,
+            Var: self._var,
+            While: self._while,
+        }
+
+    def evaluate(self, expression: Expr) -> Any:
+        return self.compile_expression(expression)(None)
+
+    def run(self, statements: list[Stmt]) -> None:
+        self.compile_program(statements)(None)
+
+    def compile_program(self, statements: list[Stmt]) -> Executor:
+        return self._sequence([self.compile_statement(s) for s in statements])
+
+    def compile_expression(self, expression: Expr) -> Evaluator:
+        compiler = self._expression_compilers.get(type(expression))
+        if compiler is None:
+            return _raise_unsupported(expression)
+        return compiler(expression)
+
+    def compile_statement(self, statement: Stmt) -> Executor:
+        compiler = self._statement_compilers.get(type(statement))
+        if compiler is None:
+            return _raise_unsupported(statement)
+        return compiler(statement)
+
+    def _sequence(self, executors: list[Executor]) -> Executor:
+        if len(executors) == 1:
+            return executors[0]
+
+        def sequence(env):
+            for executor in executors:
+                result = executor(env)
+                if result is not None:
+                    return result
+            return None
+
+        return sequence
+
+    def _literal(self, expression: Literal) -> Evaluator:
+        value = expression.value
+        return lambda env: value
+
+    def _grouping(self, expression: Grouping) -> Evaluator:
+        return self.compile_expression(expression.expression)
+
+    def _variable(self, expression: Variable) -> Evaluator:
+        token = expression.name
+        name = token.lexeme
+        depth = expression.depth
+        slot = expression.slot
+        if depth == GLOBAL:
+            globals_ = self.globals
+
+            def global_variable(env):
+                try:
+                    return globals_[name]
+                except KeyError:
+                    message = f"Undefined variable '{name}'."
+                    raise LoxRuntimeError(token, message) from None
+
+            return global_variable
+
+        return _local(depth, slot)
+
+    def _assign(self, expression: Assign) -> Evaluator:
+        token = expression.name
+        name = token.lexeme
+        depth = expression.depth
+        slot = expression.slot
+        value_of = self.compile_expression(expression.value)
+        if depth == GLOBAL:
+            globals_ = self.globals
+
+            def assign_global(env):
+                value = value_of(env)
+                if name not in globals_:
+                    raise LoxRuntimeError(token, f"Undefined variable '{name}'.")
+                globals_[name] = value
+                return value
+
+            return assign_global
+
+        if depth == 0:
+
+            def assign_local(env):
+                value = env.values[slot] = value_of(env)
+                return value
+
+            return assign_local
+
+        def assign(env):
+            value = value_of(env)
+            for _ in range(depth):
+                env = env.enclosing
+            env.values[slot] = value
+            return value
+
+        return assign
+
+    def _unary(self, expression: Unary) -> Evaluator:
+        operator = expression.operator
+        right = self.compile_expression(expression.right)
+        if operator.type == TokenType.BANG:
+
+            def negate(env):
+                value = right(env)
+                return value is None or value is False
+
+            return negate
+
+        def minus(env):
+            value = right(env)
+            if value.__class__ is float:
+                return -value
+            raise LoxRuntimeError(operator, "Operand must be a number.")
+
+        return minus
+
+    def _logical(self, expression: Logical) -> Evaluator:
+        left = self.compile_expression(expression.left)
+        right = self.compile_expression(expression.right)
+        if expression.operator.type == TokenType.OR:
+
+            def logical_or(env):
+                value = left(env)
+                if value is None or value is False:
+                    return right(env)
+                return value
+
+            return logical_or
+
+        def logical_and(env):
+            value = left(env)
+            if value is None or value is False:
+                return value
+            return right(env)
+
+        return logical_and
+
+    def _binary(self, expression: Binary) -> Evaluator:
+        operator = expression.operator
+        left = self.compile_expression(expression.left)
+        constant = expression.right
+        if isinstance(constant, Literal) and constant.value.__class__ is float:
+            specialize = _CONSTANT_BINARY.get(operator.type)
+            if specialize is not None:
+                return specialize(operator, left, constant.value)
+        right = self.compile_expression(expression.right)
+        return _BINARY[operator.type](operator, left, right)
+
+    def _call(self, expression: Call) -> Evaluator:
+        if isinstance(expression.callee, Get):
+            return self._invoke(expression, expression.callee)
+        paren = expression.paren
+        callee_of = self.compile_expression(expression.callee)
+        arguments_of = [self.compile_expression(a) for a in expression.arguments]
+        count = len(arguments_of)
+
+        def call(env):
+            callee = callee_of(env)
+            arguments = [argument(env) for argument in arguments_of]
+            if callee.__class__ is CompiledFunction:
+                if callee.parameter_count != count:
+                    check_arity(callee, arguments, paren)
+                scope = Scope(arguments + callee.padding, callee.closure)
+                try:
+                    result = callee.body(scope)
+                except RecursionError:
+                    raise LoxRuntimeError(paren, _STACK_OVERFLOW) from None
+                return None if result is None else result[0]
+            if callee.__class__ is LoxClass:
+                return _construct(callee, arguments, paren)
+            if not isinstance(callee, LoxCallable):
+                raise LoxRuntimeError(paren, "Can only call functions and classes.")
+            check_arity(callee, arguments, paren)
+            return callee.call(arguments)
+
+        if count != 1:
+            return call
+
+        # Single argument calls skip building the argument list
+        (argument_of,) = arguments_of
+
+        def call_one(env):
+            callee = callee_of(env)
+            argument = argument_of(env)
+            if callee.__class__ is CompiledFunction and callee.parameter_count == 1:
+                scope = Scope([argument] + callee.padding, callee.closure)
+                try:
+                    result = callee.body(scope)
+                except RecursionError:
+                    raise LoxRuntimeError(paren, _STACK_OVERFLOW) from None
+                return None if result is None else result[0]
+            if callee.__class__ is LoxClass:
+                return _construct(callee, [argument], paren)
+            if not isinstance(callee, LoxCallable):
+                raise LoxRuntimeError(paren, "Can only call functions and classes.")
+            check_arity(callee, [argument], paren)
+            return callee.call([argument])
+
+        return call_one
+
+    def _inline_cache(self, kind: str, name: Token) -> InlineCache:
+        cache = InlineCache(kind, name.lexeme, name.line)
+        self.inline_caches.append(cache)
+        return cache
+
+    def _get(self, expression: Get) -> Evaluator:
+        token = expression.name
+        object_of = self.compile_expression(expression.object)
+        cache = self._inline_cache("get", token)
+
+        def get_property(env):
+            instance = object_of(env)
+            if instance.__class__ is not LoxInstance:
+                raise LoxRuntimeError(token, "Only instances have properties.")
+            shape = instance.shape
+            if shape is cache.shape:
+                cache.hits += 1
+                entry = cache.entry
+            else:
+                entry = cache.resolve(shape)
+                if entry is None:
+                    message = f"Undefined property '{token.lexeme}'."
+                    raise LoxRuntimeError(token, message)
+            if entry.__class__ is int:
+                return instance.fields[entry]
+            return entry.bind(instance)
+
+        return get_property
+
+    def _set(self, expression: Set) -> Evaluator:
+        token = expression.name
+        object_of = self.compile_expression(expression.object)
+        value_of = self.compile_expression(expression.value)
+        cache = self._inline_cache("set", token)
+
+        def set_property(env):
+            instance = object_of(env)
+            if instance.__class__ is not LoxInstance:
+                raise LoxRuntimeError(token, "Only instances have fields.")
+            value = value_of(env)
+            # Read after the value, which may have added fields
+            shape = instance.shape
+            if shape is cache.shape:
+                cache.hits += 1
+                index, next_shape = cache.entry
+            else:
+                index, next_shape = cache.resolve(shape)
+            if next_shape is shape:
+                instance.fields[index] = value
+            else:
+                instance.fields.append(value)
+                instance.shape = next_shape
+            return value
+
+        return set_property
+
+    def _invoke(self, expression: Call, callee: Get) -> Evaluator:
+        """A method call, which runs the method without binding it first."""
+        token = callee.name
+        paren = expression.paren
+        object_of = self.compile_expression(callee.object)
+        arguments_of = [self.compile_expression(a) for a in expression.arguments]
+        count = len(arguments_of)
+        cache = self._inline_cache("invoke", token)
+
+        def invoke(env):
+            instance = object_of(env)
+            if instance.__class__ is not LoxInstance:
+                raise LoxRuntimeError(token, "Only instances have properties.")
+            shape = instance.shape
+            if shape is cache.shape:
+                cache.hits += 1
+                entry = cache.entry
+            else:
+                entry = cache.resolve(shape)
+                if entry is None:
+                    message = f"Undefined property '{token.lexeme}'."
+                    raise LoxRuntimeError(token, message)
+            arguments = [argument(env) for argument in arguments_of]
+
+            if entry.__class__ is CompiledFunction:
+                if entry.parameter_count != count:
+                    check_arity(entry, arguments, paren)
+                this = Scope([instance], entry.closure)
+                try:
+                    result = entry.body(Scope(arguments + entry.padding, this))
+                except RecursionError:
+                    raise LoxRuntimeError(paren, _STACK_OVERFLOW) from None
+                return None if result is None else result[0]
+
+            # A field holding something callable
+            function = instance.fields[entry]
+            if not isinstance(function, LoxCallable):
+                raise LoxRuntimeError(paren, "Can only call functions and classes.")
+            check_arity(function, arguments, paren)
+            try:
+                return function.call(arguments)
+            except RecursionError:
+                raise LoxRuntimeError(paren, _STACK_OVERFLOW) from None
+
+        return invoke
+
+    def _this(self, expression: This) -> Evaluator:
+        return _local(expression.depth, expression.slot)
+
+    def _super(self, expression: Super) -> Evaluator:
+        token = expression.method
+        name = token.lexeme
+        superclass_of = _local(expression.depth, expression.slot)
+        # Resolver puts "this" in the scope right inside the one of "super"
+        this_of = _local(expression.depth - 1, 0)
+
+        def super_method(env):
+            method = superclass_of(env).methods.get(name)
+            if method is None:
+                raise LoxRuntimeError(token, f"Undefined property '{name}'.")
+            return method.bind(this_of(env))
+
+        return super_method
+
+    def _expression_statement(self, statement: Expression) -> Executor:
+        expression = self.compile_expression(statement.expression)
+
+        def expression_statement(env):
+            expression(env)
+
+        return expression_statement
+
+    def _print(self, statement: Print) -> Executor:
+        expression = self.compile_expression(statement.expression)
+        write = self.stdout.write
+
+        def print_statement(env):
+            write(stringify(expression(env)) + "\n")
+
+        return print_statement
+
+    def _var(self, statement: Var) -> Executor:
+        name = statement.name.lexeme
+        slot = statement.slot
+        initializer = self._initializer(statement.initializer)
+        if slot == GLOBAL:
+            globals_ = self.globals
+
+            def define_global(env):
+                globals_[name] = initializer(env)
+
+            return define_global
+
+        def define(env):
+            env.values[slot] = initializer(env)
+
+        return define
+
+    def _initializer(self, initializer: Optional[Expr]) -> Evaluator:
+        if initializer is None:
+            return lambda env: None
+        return self.compile_expression(initializer)
+
+    def _block(self, statement: Block) -> Executor:
+        body = self._sequence([self.compile_statement(s) for s in statement.statements])
+        slot_count = statement.slot_count
+        if not slot_count:
+            # Nothing is declared in the block, Resolver gave it no scope
+            return body
+
+        def block(env):
+            return body(Scope([None] * slot_count, env))
+
+        return block
+
+    def _if(self, statement: If) -> Executor:
+        condition = self.compile_expression(statement.condition)
+        then_branch = self.compile_statement(statement.then_branch)
+        if statement.else_branch is None:
+
+            def if_then(env):
+                value = condition(env)
+                if value is not None and value is not False:
+                    return then_branch(env)
+                return None
+
+            return if_then
+
+        else_branch = self.compile_statement(statement.else_branch)
+
+        def if_else(env):
+            value = condition(env)
+            if value is not None and value is not False:
+                return then_branch(env)
+            return else_branch(env)
+
+        return if_else
+
+    def _while(self, statement: While) -> Executor:
+        condition = self.compile_expression(statement.condition)
+        body = self.compile_statement(statement.body)
+
+        def loop(env):
+            while True:
+                value = condition(env)
+                if value is None or value is False:
+                    return None
+                result = body(env)
+                if result is not None:
+                    return result
+
+        return loop
+
+    def _function(self, statement: Function) -> Executor:
+        name = statement.name.lexeme
+        slot = statement.slot
+        parameter_count = len(statement.params)
+        slot_count = statement.slot_count
+        body = self._sequence([self.compile_statement(s) for s in statement.body])
+
+        def create(env):
+            return CompiledFunction(name, parameter_count, slot_count, body, env)
+
+        if slot == GLOBAL:
+            globals_ = self.globals
+
+            def declare_global(env):
+                globals_[name] = create(env)
+
+            return declare_global
+
+        def declare(env):
+            env.values[slot] = create(env)
+
+        return declare
+
+    def _class(self, statement: Class) -> Executor:
+        name = statement.name.lexeme
+        slot = statement.slot
+        superclass = statement.superclass
+        superclass_of = None
+        if superclass is not None:
+            superclass_of = self.compile_expression(superclass)
+        methods = []
+        for method in statement.methods:
+            body = self._sequence([self.compile_statement(s) for s in method.body])
+            if method.name.lexeme == "init":
+                body = _initializer(body)
+            methods.append(
+                (method.name.lexeme, len(method.params), method.slot_count, body)
+            )
+
+        def create(env):
+            parent = None
+            closure = env
+            if superclass_of is not None:
+                parent = superclass_of(env)
+                if parent.__class__ is not LoxClass:
+                    message = "Superclass must be a class."
+                    raise LoxRuntimeError(superclass.name, message)
+                # Methods of a subclass close over a scope holding "super"
+                closure = Scope([parent], env)
+            functions = {
+                method_name: CompiledFunction(
+                    method_name, parameter_count, slot_count, body, closure
+                )
+                for method_name, parameter_count, slot_count, body in methods
+            }
+            return LoxClass(name, parent, functions)
+
+        if slot == GLOBAL:
+            globals_ = self.globals
+
+            def declare_global(env):
+                globals_[name] = create(env)
+
+            return declare_global
+
+        def declare(env):
+            env.values[slot] = create(env)
+
+        return declare
+
+    def _return(self, statement: Return) -> Executor:
+        if statement.value is None:
+            return lambda env: (None,)
+        value_of = self.compile_expression(statement.value)
+        return lambda env: (value_of(env),)
+
+
+def _local(depth: int, slot: int) -> Evaluator:
+    if depth == 0:
+        return lambda env: env.values[slot]
+    if depth == 1:
+        return lambda env: env.enclosing.values[slot]
+
+    def variable(env):
+        for _ in range(depth):
+            env = env.enclosing
+        return env.values[slot]
+
+    return variable
+
+
+def _construct(klass: LoxClass, arguments: list[Any], paren: Token) -> LoxInstance:
+    """Call a class, running its initializer without binding it first."""
+    instance = LoxInstance(klass.root)
+    initializer = klass.initializer
+    if initializer is None:
+        if arguments:
+            check_arity(klass, arguments, paren)
+        return instance
+    if initializer.parameter_count != len(arguments):
+        check_arity(initializer, arguments, paren)
+    this = Scope([instance], initializer.closure)
+    try:
+        initializer.body(Scope(arguments + initializer.padding, this))
+    except RecursionError:
+        raise LoxRuntimeError(paren, _STACK_OVERFLOW) from None
+    return instance
+
+
+def _initializer(body: Executor) -> Executor:
+    # Initializers return "this", from the scope enclosing their own
+    def initializer(env):
+        body(env)
+        return (env.enclosing.values[0],)
+
+    return initializer
+
+
+def _plus(operator: Token, left: Evaluator, right: Evaluator) -> Evaluator:
+    def plus(env):
+        a = left(env)
+        b = right(env)
+        if a.__class__ is b.__class__ and (a.__class__ is float or a.__class__ is str):
+            return a + b
+        raise LoxRuntimeError(operator, "Operands must be two numbers or two strings.")
+
+    return plus
+
+
+def _minus(operator: Token, left: Evaluator, right: Evaluator) -> Evaluator:
+    def minus(env):
+        a = left(env)
+        b = right(env)
+        if a.__class__ is float and b.__class__ is float:
+            return a - b
+        raise LoxRuntimeError(operator, _NUMBER_OPERANDS)
+
+    return minus
+
+
+def _less(operator: Token, left: Evaluator, right: Evaluator) -> Evaluator:
+    def less(env):
+        a = left(env)
+        b = right(env)
+        if a.__class__ is float and b.__class__ is float:
+            return a < b
+        raise LoxRuntimeError(operator, _NUMBER_OPERANDS)
+
+    return less
+
+
+def _numeric(function: Callable[[float, float], Any]):
+    """Build a compiler of a binary operator defined on numbers only."""
+
+    def compile_numeric(operator: Token, left: Evaluator, right: Evaluator):
+        def numeric(env):
+            a = left(env)
+            b = right(env)
+            if a.__class__ is float and b.__class__ is float:
+                return function(a, b)
+            raise LoxRuntimeError(operator, _NUMBER_OPERANDS)
+
+        return numeric
+
+    return compile_numeric
+
+
+def _equal(operator: Token, left: Evaluator, right: Evaluator) -> Evaluator:
+    return lambda env: is_equal(left(env), right(env))
+
+
+def _not_equal(operator: Token, left: Evaluator, right: Evaluator) -> Evaluator:
+    return lambda env: not is_equal(left(env), right(env))
+
+
+_BINARY: dict[TokenType, Callable[[Token, Evaluator, Evaluator], Evaluator]] = {
+    TokenType.PLUS: _plus,
+    TokenType.MINUS: _minus,
+    TokenType.LESS: _less,
+    TokenType.STAR: _numeric(lambda a, b: a * b),
+    TokenType.SLASH: _numeric(divide),
+    TokenType.GREATER: _numeric(lambda a, b: a > b),
+    TokenType.GREATER_EQUAL: _numeric(lambda a, b: a >= b),
+    TokenType.LESS_EQUAL: _numeric(lambda a, b: a <= b),
+    TokenType.EQUAL_EQUAL: _equal,
+    TokenType.BANG_EQUAL: _not_equal,
+}
+
+
+def _plus_constant(operator: Token, left: Evaluator, constant: float) -> Evaluator:
+    def plus_constant(env):
+        a = left(env)
+        if a.__class__ is float:
+            return a + constant
+        raise LoxRuntimeError(operator, "Operands must be two numbers or two strings.")
+
+    return plus_constant
+
+
+def _minus_constant(operator: Token, left: Evaluator, constant: float) -> Evaluator:
+    def minus_constant(env):
+        a = left(env)
+        if a.__class__ is float:
+            return a - constant
+        raise LoxRuntimeError(operator, _NUMBER_OPERANDS)
+
+    return minus_constant
+
+
+def _less_constant(operator: Token, left: Evaluator, constant: float) -> Evaluator:
+    def less_constant(env):
+        a = left(env)
+        if a.__class__ is float:
+            return a < constant
+        raise LoxRuntimeError(operator, _NUMBER_OPERANDS)
+
+    return less_constant
+
+
+# Operators with a number literal on the right skip evaluating and checking it
+_CONSTANT_BINARY: dict[TokenType, Callable[[Token, Evaluator, float], Evaluator]] = {
+    TokenType.PLUS: _plus_constant,
+    TokenType.MINUS: _minus_constant,
+    TokenType.LESS: _less_constant,
+}
+
+
+def _raise_unsupported(node: Any) -> Callable[[Optional[Scope]], Any]:
+    # Reported when reached at run time, like the tree-walker does
+    def raise_unsupported(env):
+        raise unsupported(node)
+
+    return raise_unsupported
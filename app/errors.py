@@ -1,19 +1,143 @@
+from typing import Iterable, Optional
+
+from app.tokenization import Token, TokenType
+
+
 class InterpretationError(Exception):
-    pass
+    # Line the error is reported on, when it has one
+    line: Optional[int] = None
+    # Offset into the source, when known; a LineIndex turns it into a column
+    offset: Optional[int] = None
 
 
 class TokenError(InterpretationError):
-    def __init__(self, character: str, line_idx: int):
+    def __init__(self, character: str, line_idx: int, offset: Optional[int] = None):
         self.character = character
         self.line_idx = line_idx
+        self.offset = offset
+
+    @property
+    def line(self) -> int:  # type: ignore[override]
+        return self.line_idx
 
     def __str__(self):
         return f"[line {self.line_idx}] Error: Unexpected character: {self.character}"
 
 
 class UnterminatedStringError(InterpretationError):
-    def __init__(self, line_idx: int):
+    def __init__(self, line_idx: int, offset: Optional[int] = None):
         self.line_idx = line_idx
+        self.offset = offset
+
+    @property
+    def line(self) -> int:  # type: ignore[override]
+        return self.line_idx
 
     def __str__(self):
         return f"[line {self.line_idx}] Error: Unterminated string."
+
+
+class ParseError(InterpretationError):
+    def __init__(self, token: Token, message: str):
+        self.token = token
+        self.message = message
+
+    @property
+    def line(self) -> int:  # type: ignore[override]
+        return self.token.line
+
+    @property
+    def offset(self) -> Optional[int]:  # type: ignore[override]
+        return self.token.offset
+
+    def __str__(self):
+        if self.token.type == TokenType.EOF:
+            location = "end"
+        else:
+            location = f"'{self.token.lexeme}'"
+        return f"[line {self.token.line}] Error at {location}: {self.message}"
+
+
+class LoxRuntimeError(InterpretationError):
+    def __init__(
+        self, token: Optional[Token], message: str, line: Optional[int] = None
+    ):
+        # Backends without tokens at run time, like the VM, pass the line only
+        self.token = token
+        self.message = message
+        self.line = token.line if token is not None else line
+
+    def __str__(self):
+        return f"{self.message}\n[line {self.line}]"
+
+
+class ErrorLog(list):
+    """
+    Errors in the order they were found, up to a limit. Past it errors are
+    only counted per class along with the lines they span, so garbage input
+    costs memory bounded by the limit, and only kept errors ever get
+    formatted.
+    """
+
+    def __init__(self, limit: Optional[int] = None):
+        super().__init__()
+        self.limit = limit
+        # Class name -> [count, first line, last line] of errors past the limit
+        self.dropped: dict[str, list[int]] = {}
+
+    @property
+    def full(self) -> bool:
+        return self.limit is not None and len(self) >= self.limit
+
+    @property
+    def total(self) -> int:
+        return len(self) + sum(entry[0] for entry in self.dropped.values())
+
+    def append(self, error: InterpretationError) -> None:
+        if not self.full:
+            super().append(error)
+            return
+        line = error.line or 0
+        self._drop(type(error).__name__, 1, line, line)
+
+    def drop(self, kind: type, count: int, line: int) -> None:
+        """Count errors past the limit on a line without creating them."""
+        self._drop(kind.__name__, count, line, line)
+
+    def extend(self, errors: Iterable[InterpretationError]) -> None:
+        for error in errors:
+            self.append(error)
+        if isinstance(errors, ErrorLog):
+            for name, (count, first, last) in errors.dropped.items():
+                self._drop(name, count, first, last)
+
+    def _drop(self, name: str, count: int, first: int, last: int) -> None:
+        entry = self.dropped.get(name)
+        if entry is None:
+            self.dropped[name] = [count, first, last]
+        else:
+            entry[0] += count
+            entry[1] = min(entry[1], first)
+            entry[2] = max(entry[2], last)
+
+    def __reduce__(self):
+        # Kept errors must not go through append when unpickled
+        return _error_log, (self.limit, list(self), self.dropped)
+
+    def summary(self) -> list[str]:
+        """A line per class of the errors past the limit."""
+        return [
+            f"[lines {first}-{last}] {count} more {name} errors not shown."
+            for name, (count, first, last) in self.dropped.items()
+        ]
+
+
+def _error_log(
+    limit: Optional[int],
+    errors: list[InterpretationError],
+    dropped: dict[str, list[int]],
+) -> ErrorLog:
+    log = ErrorLog(limit)
+    list.extend(log, errors)
+    log.dropped = dropped
+    return log
@@ -0,0 +1,349 @@
+from array import array
+from enum import IntEnum
+from typing import Any, Callable, Iterator, Sequence
+
+from app.errors import ParseError
+from app.parser import (
+    BINARY_PRECEDENCE,
+    LOGICAL_OPERATORS,
+    MAX_ARGUMENTS,
+    UNARY_OPERATORS,
+)
+from app.tokenization import Token, TokenType, format_number
+
+
+class NodeKind(IntEnum):
+    LITERAL = 0
+    VARIABLE = 1
+    THIS = 2
+    SUPER = 3
+    GROUPING = 4
+    UNARY = 5
+    BINARY = 6
+    LOGICAL = 7
+    CALL = 8
+    GET = 9
+    ASSIGN = 10
+    SET = 11
+
+
+LEAF_KINDS: dict[TokenType, NodeKind] = {
+    TokenType.NUMBER: NodeKind.LITERAL,
+    TokenType.STRING: NodeKind.LITERAL,
+    TokenType.TRUE: NodeKind.LITERAL,
+    TokenType.FALSE: NodeKind.LITERAL,
+    TokenType.NIL: NodeKind.LITERAL,
+    TokenType.IDENTIFIER: NodeKind.VARIABLE,
+    TokenType.THIS: NodeKind.THIS,
+}
+
+# Entries of the pending operator stack of FlatParser
+_UNARY, _BINARY, _ASSIGN, _SET, _INVALID, _GROUP, _CALL = range(7)
+_MARKERS = (_GROUP, _CALL)
+_UNARY_PRECEDENCE = max(BINARY_PRECEDENCE.values()) + 1
+
+
+class FlatTree:
+    """
+    Expression AST stored in postorder as parallel arrays of node kind,
+    token index, child count and subtree size. Every traversal is a loop
+    over the arrays or an explicit stack, so depth of nesting never touches
+    the Python stack.
+    """
+
+    def __init__(self, tokens: Sequence[Token]):
+        self.tokens = tokens
+        self.kinds = array("B")
+        self.token_indexes = array("I")
+        self.arities = array("I")
+        self.sizes = array("I")
+
+    def __len__(self) -> int:
+        return len(self.kinds)
+
+    @property
+    def root(self) -> int:
+        return len(self.kinds) - 1
+
+    def kind(self, index: int) -> NodeKind:
+        return NodeKind(self.kinds[index])
+
+    def token(self, index: int) -> Token:
+        return self.tokens[self.token_indexes[index]]
+
+    def children(self, index: int) -> list[int]:
+        children = []
+        child = index - 1
+        for _ in range(self.arities[index]):
+            children.append(child)
+            child -= self.sizes[child]
+        children.reverse()
+        return children
+
+    def postorder(self) -> Iterator[int]:
+        return iter(range(len(self.kinds)))
+
+    def preorder(self) -> Iterator[int]:
+        if not self.kinds:
+            return
+        stack = [self.root]
+        while stack:
+            index = stack.pop()
+            yield index
+            child = index - 1
+            for _ in range(self.arities[index]):
+                stack.append(child)
+                child -= self.sizes[child]
+
+    def fold(
+        self, handlers: Sequence[Callable[["FlatTree", int, list], Any]]
+    ) -> Any:
+        """
+        Visit nodes bottom-up, dispatching on kind id into ``handlers``. Each
+        handler gets the results of the node children and returns its own.
+        """
+        results: list[Any] = []
+        kinds = self.kinds
+        arities = self.arities
+        for index in range(len(kinds)):
+            arity = arities[index]
+            if arity:
+                children = results[-arity:]
+                del results[-arity:]
+            else:
+                children = []
+            results.append(handlers[kinds[index]](self, index, children))
+        return results[-1] if results else None
+
+    def render(self) -> Iterator[str]:
+        """Yield the s-expression of the tree piece by piece, in source order."""
+        if not self.kinds:
+            return
+        kinds = self.kinds
+        arities = self.arities
+        sizes = self.sizes
+        stack: list[Any] = [self.root]
+        while stack:
+            item = stack.pop()
+            if item.__class__ is str:
+                yield item
+                continue
+
+            arity = arities[item]
+            if not arity:
+                yield self._leaf_text(item)
+                continue
+
+            # Children are pushed last to first so they pop in source order
+            opening, separator, closing = self._node_text(item)
+            stack.append(closing)
+            child = item - 1
+            for position in range(arity, 0, -1):
+                stack.append(child)
+                child -= sizes[child]
+                if position > 1:
+                    stack.append(separator)
+            stack.append(opening)
+
+    def __str__(self) -> str:
+        return "".join(self.render())
+
+    def _leaf_text(self, index: int) -> str:
+        kind = self.kinds[index]
+        token = self.token(index)
+        if kind == NodeKind.LITERAL:
+            if token.type == TokenType.NUMBER:
+                return format_number(float(token.lexeme))
+            if token.type == TokenType.STRING:
+                return token.literal
+            return token.lexeme
+        if kind == NodeKind.SUPER:
+            return f"(. super {token.lexeme})"
+        return token.lexeme
+
+    def _node_text(self, index: int) -> tuple[str, str, str]:
+        """Text before, between and after the children of an inner node."""
+        kind = self.kinds[index]
+        if kind == NodeKind.GROUPING:
+            return "(group ", " ", ")"
+        if kind == NodeKind.CALL:
+            return "(call ", " ", ")"
+        if kind == NodeKind.GET:
+            return "(. ", " ", f" {self.token(index).lexeme})"
+        if kind == NodeKind.ASSIGN:
+            return f"(= {self.token(index).lexeme} ", " ", ")"
+        if kind == NodeKind.SET:
+            return "(= (. ", f" {self.token(index).lexeme}) ", ")"
+        return f"({self.token(index).lexeme} ", " ", ")"
+
+
+class FlatParser:
+    """
+    Operator precedence parser that builds a ``FlatTree`` with explicit
+    operand and operator stacks instead of recursion. It accepts the same
+    expressions as ``Parser.parse`` and reports the same errors.
+    """
+
+    def __init__(self, tokens: Sequence[Token]):
+        self.tokens = tokens
+        self.tree = FlatTree(tokens)
+        # Start offsets of the completed subtrees not yet attached to a parent
+        self.operands: list[int] = []
+        self.operators: list[list[int]] = []
+
+    def parse(self) -> FlatTree:
+        tokens = self.tokens
+        operators = self.operators
+        position = 0
+        expect_operand = True
+        while True:
+            token = tokens[position]
+            token_type = token.type
+
+            if expect_operand:
+                if token_type in UNARY_OPERATORS:
+                    operators.append([_UNARY, position, _UNARY_PRECEDENCE])
+                elif token_type == TokenType.LEFT_PAREN:
+                    operators.append([_GROUP, position, 0])
+                elif token_type in LEAF_KINDS:
+                    self._emit(LEAF_KINDS[token_type], position, 0)
+                    expect_operand = False
+                elif token_type == TokenType.SUPER:
+                    self._expect(
+                        position + 1, TokenType.DOT, "Expect '.' after 'super'."
+                    )
+                    position += 2
+                    self._expect(
+                        position,
+                        TokenType.IDENTIFIER,
+                        "Expect superclass method name.",
+                    )
+                    self._emit(NodeKind.SUPER, position, 0)
+                    expect_operand = False
+                else:
+                    raise ParseError(token, "Expect expression.")
+                position += 1
+                continue
+
+            if token_type == TokenType.LEFT_PAREN:
+                if tokens[position + 1].type == TokenType.RIGHT_PAREN:
+                    position += 1
+                    self._emit(NodeKind.CALL, position, 1)
+                else:
+                    operators.append([_CALL, position, 1])
+                    expect_operand = True
+                position += 1
+                continue
+
+            if token_type == TokenType.DOT:
+                position += 1
+                self._expect(
+                    position, TokenType.IDENTIFIER, "Expect property name after '.'."
+                )
+                self._emit(NodeKind.GET, position, 1)
+                position += 1
+                continue
+
+            precedence = BINARY_PRECEDENCE.get(token_type)
+            if precedence is not None:
+                self._reduce(precedence)
+                operators.append([_BINARY, position, precedence])
+                expect_operand = True
+                position += 1
+                continue
+
+            if token_type == TokenType.EQUAL:
+                self._reduce(1)
+                self._assignment_target(position)
+                expect_operand = True
+                position += 1
+                continue
+
+            self._reduce(0)
+            top = operators[-1] if operators else None
+            if token_type == TokenType.RIGHT_PAREN and top is not None:
+                operators.pop()
+                if top[0] == _GROUP:
+                    self._emit(NodeKind.GROUPING, top[1], 1)
+                else:
+                    self._emit(NodeKind.CALL, position, top[2] + 1)
+                position += 1
+                continue
+
+            if token_type == TokenType.COMMA and top is not None and top[0] == _CALL:
+                if top[2] >= MAX_ARGUMENTS:
+                    raise ParseError(
+                        tokens[position + 1],
+                        f"Can't have more than {MAX_ARGUMENTS} arguments.",
+                    )
+                top[2] += 1
+                expect_operand = True
+                position += 1
+                continue
+
+            if top is None:
+                return self.tree
+            if top[0] == _GROUP:
+                raise ParseError(token, "Expect ')' after expression.")
+            raise ParseError(token, "Expect ')' after arguments.")
+
+    def _expect(self, position: int, token_type: TokenType, message: str) -> None:
+        if self.tokens[position].type != token_type:
+            raise ParseError(self.tokens[position], message)
+
+    def _emit(self, kind: NodeKind, token_index: int, arity: int) -> None:
+        tree = self.tree
+        index = len(tree.kinds)
+        start = index
+        for _ in range(arity):
+            start = self.operands.pop()
+        tree.kinds.append(kind)
+        tree.token_indexes.append(token_index)
+        tree.arities.append(arity)
+        tree.sizes.append(index - start + 1)
+        self.operands.append(start)
+
+    def _reduce(self, min_precedence: int) -> None:
+        """Apply pending operators binding at least as tight as min_precedence."""
+        operators = self.operators
+        while operators:
+            operator, token_index, precedence = operators[-1]
+            if operator in _MARKERS or precedence < min_precedence:
+                return
+            operators.pop()
+            if operator == _UNARY:
+                self._emit(NodeKind.UNARY, token_index, 1)
+            elif operator == _BINARY:
+                if self.tokens[token_index].type in LOGICAL_OPERATORS:
+                    self._emit(NodeKind.LOGICAL, token_index, 2)
+                else:
+                    self._emit(NodeKind.BINARY, token_index, 2)
+            elif operator == _ASSIGN:
+                self._emit(NodeKind.ASSIGN, token_index, 1)
+            elif operator == _SET:
+                self._emit(NodeKind.SET, token_index, 2)
+            else:
+                raise ParseError(
+                    self.tokens[token_index], "Invalid assignment target."
+                )
+
+    def _assignment_target(self, equals: int) -> None:
+        # The target was emitted as a variable or property access; it is
+        # unwound and replaced by a pending right-associative assignment
+        tree = self.tree
+        kind = tree.kinds[-1]
+        if kind == NodeKind.VARIABLE:
+            operator = _ASSIGN
+            self.operands.pop()
+        elif kind == NodeKind.GET:
+            operator = _SET
+        else:
+            # Like Parser, report it only once the assigned value is parsed
+            self.operators.append([_INVALID, equals, 0])
+            return
+
+        name = tree.token_indexes.pop()
+        tree.kinds.pop()
+        tree.arities.pop()
+        tree.sizes.pop()
+        self.operators.append([operator, name, 0])
@@ -0,0 +1,282 @@
+from bisect import bisect_left
+from dataclasses import dataclass
+from typing import Callable, Iterable, Optional
+
+from app.errors import InterpretationError, ParseError
+from app.lines import LINE_BREAK_PATTERN
+from app.parser import Parser
+from app.scanner import Scanner, ScanEngine
+from app.syntax import Stmt
+from app.tokenization import NumericMode, Token, TokenType
+
+# Position of a token as (line index, index in the tokens of that line)
+Position = tuple[int, int]
+
+
+@dataclass(slots=True, frozen=True)
+class TextEdit:
+    """
+    Replacement of the text between two ``(line, column)`` positions, both
+    0-based like editors send them. The end position is exclusive.
+    """
+
+    start: tuple[int, int]
+    end: tuple[int, int]
+    text: str
+
+
+@dataclass(slots=True, frozen=True)
+class Update:
+    # Line indexes scanned again, in the edited document
+    lines: range
+    # Indexes into Document.statements of the statements parsed again
+    statements: range
+
+
+@dataclass(slots=True)
+class _Span:
+    start: Position
+    # Line index of the last token
+    last_line: int
+
+    def shift(self, delta: int) -> None:
+        self.start = (self.start[0] + delta, self.start[1])
+        self.last_line += delta
+
+
+class _TokenStream:
+    """
+    Tokens of a document from a position on, flattened only as far as the
+    parser reads them. Remembers where every token it handed out came from.
+    """
+
+    def __init__(self, document: "Document", start: Position):
+        self.document = document
+        self.tokens: list[Token] = []
+        self.positions: list[Position] = []
+        self._line, self._index = start
+
+    def __getitem__(self, index: int) -> Token:
+        while index >= len(self.tokens):
+            self._extend()
+        return self.tokens[index]
+
+    def _extend(self) -> None:
+        line_tokens = self.document.line_tokens
+        while self._line < len(line_tokens):
+            self.document._renumber(self._line)
+            tokens = line_tokens[self._line]
+            if self._index < len(tokens):
+                self.tokens.extend(tokens[self._index :])
+                line = self._line
+                self.positions.extend(
+                    (line, index) for index in range(self._index, len(tokens))
+                )
+                self._line += 1
+                self._index = 0
+                return
+            self._line += 1
+            self._index = 0
+        self.tokens.append(self.document.eof())
+        self.positions.append((len(line_tokens), 0))
+
+
+class Document:
+    """
+    Source being edited, with its tokens kept per line and its program per
+    top level statement, so edits only redo the work near them.
+
+    No token spans lines, so an edit rescans the lines it touches and
+    nothing else. When the edit adds or removes lines, tokens below get
+    their line number fixed when next read, and the spans of statements
+    past the last edit count lines from the end of the document, so neither
+    is walked on every edit. Parsing restarts at the statement before
+    the edit, which a new token could extend (think of a dangling
+    ``else``), and stops at the first statement boundary past the edit
+    where an old statement started: the old statements from there on are
+    kept as they are.
+    """
+
+    def __init__(
+        self,
+        source: str = "",
+        numeric: NumericMode = NumericMode.DECIMAL,
+        engine: ScanEngine = ScanEngine.REGEX,
+    ):
+        self.scanner = Scanner(numeric=numeric, engine=engine)
+        self.symbols = self.scanner.symbols
+        # Split on every line break, so a trailing one leaves an empty line
+        self.lines: list[str] = LINE_BREAK_PATTERN.split(source)
+        self.line_tokens: list[list[Token]] = []
+        self.line_errors: list[list[InterpretationError]] = []
+        for line_idx, line in enumerate(self.lines):
+            tokens, errors = self.scanner.scan_line(line_idx, line)
+            self.line_tokens.append(tokens)
+            self.line_errors.append(errors)
+
+        # Lines from this one on may have tokens with stale line numbers
+        self._stale = len(self.lines)
+
+        self._statements: list[Stmt] = []
+        # Spans from the gap on count lines from the end of the document,
+        # as len(self.lines) less than the line index
+        self.spans: list[_Span] = []
+        self._gap = 0
+        # First error stopping the parse, statements only go up to it
+        self.parse_error: Optional[ParseError] = None
+        self._parse_from(0, (0, 0), 0, 0)
+
+    @property
+    def source(self) -> str:
+        return "\n".join(self.lines)
+
+    @property
+    def statements(self) -> list[Stmt]:
+        self._renumber_all()
+        return self._statements
+
+    @property
+    def tokens(self) -> list[Token]:
+        self._renumber_all()
+        tokens = [token for line in self.line_tokens for token in line]
+        tokens.append(self.eof())
+        return tokens
+
+    @property
+    def errors(self) -> list[InterpretationError]:
+        self._renumber_all()
+        errors = [error for line in self.line_errors for error in line]
+        if self.parse_error is not None:
+            errors.append(self.parse_error)
+        return errors
+
+    def eof(self) -> Token:
+        # A trailing line break does not start a line, as in str.splitlines
+        count = len(self.lines) - (self.lines[-1] == "")
+        return Token(TokenType.EOF, "", None, count)
+
+    def apply(self, edits: Iterable[TextEdit]) -> list[Update]:
+        """Apply edits in order, each one to the result of the previous."""
+        return [self.edit(edit) for edit in edits]
+
+    def edit(self, edit: TextEdit) -> Update:
+        (start_line, start_column), (end_line, end_column) = edit.start, edit.end
+        first = self.lines[start_line][:start_column]
+        last = self.lines[end_line][end_column:]
+        new_lines = LINE_BREAK_PATTERN.split(first + edit.text + last)
+        delta = len(new_lines) - (end_line + 1 - start_line)
+
+        # Statements ending before the edited lines stay as they are, but for
+        # the last of them: the edit may extend it
+        first_statement = self._find_span(start_line, lambda span: span.last_line)
+        first_statement = max(first_statement - 1, 0)
+        # Statements starting below the edited lines may be kept; counting
+        # their lines from the end makes them right after the edit too
+        reusable = self._find_span(
+            end_line + 1, lambda span: span.start[0], first_statement
+        )
+        self._move_gap(reusable)
+        start = self.spans[first_statement].start if first_statement else (0, 0)
+
+        tokens = []
+        errors = []
+        for line_idx, line in enumerate(new_lines, start_line):
+            line_tokens, line_errors = self.scanner.scan_line(line_idx, line)
+            tokens.append(line_tokens)
+            errors.append(line_errors)
+        self.lines[start_line : end_line + 1] = new_lines
+        self.line_tokens[start_line : end_line + 1] = tokens
+        self.line_errors[start_line : end_line + 1] = errors
+        end = start_line + len(new_lines)
+        if delta:
+            self._stale = min(self._stale, end)
+
+        parsed = self._parse_from(first_statement, start, reusable, end)
+        return Update(
+            range(start_line, end), range(first_statement, first_statement + parsed)
+        )
+
+    def _find_span(self, line: int, key: Callable[[_Span], int], lo: int = 0) -> int:
+        """Index of the first span whose key is at least line."""
+        gap = self._gap
+        if lo < gap:
+            index = bisect_left(self.spans, line, lo, gap, key=key)
+            if index < gap:
+                return index
+        return bisect_left(
+            self.spans, line - len(self.lines), max(lo, gap), key=key
+        )
+
+    def _move_gap(self, gap: int) -> None:
+        # Only the spans between the old and the new gap change how they count
+        spans = self.spans
+        count = len(self.lines)
+        for index in range(gap, self._gap):
+            spans[index].shift(-count)
+        for index in range(self._gap, gap):
+            spans[index].shift(count)
+        self._gap = gap
+
+    def _renumber(self, line_idx: int) -> None:
+        if line_idx < self._stale:
+            return
+        # Tokens and errors of a line are all numbered alike
+        tokens = self.line_tokens[line_idx]
+        if tokens and tokens[0].line != line_idx + 1:
+            for token in tokens:
+                token.line = line_idx + 1
+        for error in self.line_errors[line_idx]:
+            error.line_idx = line_idx + 1  # type: ignore[attr-defined]
+
+    def _renumber_all(self) -> None:
+        for line_idx in range(self._stale, len(self.lines)):
+            self._renumber(line_idx)
+        self._stale = len(self.lines)
+
+    def _parse_from(
+        self, index: int, start: Position, reusable: int, edited_end: int
+    ) -> int:
+        """
+        Parse statements from position start on, replacing the statements
+        from index on. Stops at an old statement starting past the edited
+        lines, keeping it and those after it. Returns how many were parsed.
+        """
+        old_spans = self.spans
+        # Old statements from kept on start past the edit and may be reused,
+        # none can be after a parse error as the old program ended there
+        kept = reusable if self.parse_error is None else len(old_spans)
+        replaced = len(old_spans)
+        # Kept spans count lines from the end
+        count = len(self.lines)
+
+        stream = _TokenStream(self, start)
+        parser = Parser(stream, self.symbols)  # type: ignore[arg-type]
+        statements: list[Stmt] = []
+        spans: list[_Span] = []
+        self.parse_error = None
+        while parser.token.type != TokenType.EOF:
+            line, column = stream.positions[parser.current]
+            position = (line - count, column)
+            while kept < len(old_spans) and old_spans[kept].start < position:
+                kept += 1
+            if (
+                line >= edited_end
+                and kept < len(old_spans)
+                and old_spans[kept].start == position
+            ):
+                replaced = kept
+                break
+            begin = parser.current
+            try:
+                statement = parser.parse_declaration()
+            except ParseError as error:
+                self.parse_error = error
+                break
+            last = stream.positions[parser.current - 1]
+            statements.append(statement)
+            spans.append(_Span(stream.positions[begin], last[0]))
+
+        self._statements[index:replaced] = statements
+        self.spans[index:replaced] = spans
+        self._gap = index + len(spans)
+        return len(spans)
@@ -0,0 +1,262 @@
+import sys
+from typing import Any, Callable, TextIO
+
+from app.errors import LoxRuntimeError
+from app.runtime import (
+    NATIVE_FUNCTIONS,
+    Environment,
+    LoxCallable,
+    check_arity,
+    divide,
+    is_equal,
+    is_truthy,
+    stringify,
+    unsupported,
+)
+from app.syntax import (
+    GLOBAL,
+    Assign,
+    Binary,
+    Block,
+    Call,
+    Expr,
+    Expression,
+    Function,
+    Grouping,
+    If,
+    Literal,
+    Logical,
+    Print,
+    Return,
+    Stmt,
+    Unary,
+    Var,
+    Variable,
+    While,
+)
+from app.tokenization import Token, TokenType
+
+
+class ReturnSignal(Exception):
+    def __init__(self, value: Any):
+        self.value = value
+
+
+class LoxFunction(LoxCallable):
+    __slots__ = ("declaration", "closure", "interpreter")
+
+    def __init__(
+        self, declaration: Function, closure: Environment, interpreter: "Interpreter"
+    ):
+        self.declaration = declaration
+        self.closure = closure
+        self.interpreter = interpreter
+
+    def arity(self) -> int:
+        return len(self.declaration.params)
+
+    def call(self, arguments: list[Any]) -> Any:
+        environment = Environment(self.closure)
+        for param, argument in zip(self.declaration.params, arguments):
+            environment.define(param.lexeme, argument)
+        try:
+            self.interpreter.execute_block(self.declaration.body, environment)
+        except ReturnSignal as signal:
+            return signal.value
+        return None
+
+    def __str__(self) -> str:
+        return f"<fn {self.declaration.name.lexeme}>"
+
+
+class Interpreter:
+    """
+    Straightforward tree-walking interpreter: every evaluation dispatches on
+    the node type again and scopes are dictionaries keyed by name. It runs
+    programs processed by Resolver and is the reference the other backends
+    are checked and benchmarked against.
+    """
+
+    def __init__(self, stdout: TextIO = sys.stdout):
+        self.stdout = stdout
+        self.globals = Environment()
+        for name, function in NATIVE_FUNCTIONS.items():
+            self.globals.define(name, function)
+        self.environment = self.globals
+        self._evaluators: dict[type, Callable[[Any], Any]] = {
+            Assign: self._assign,
+            Binary: self._binary,
+            Call: self._call,
+            Grouping: self._grouping,
+            Literal: self._literal,
+            Logical: self._logical,
+            Unary: self._unary,
+            Variable: self._variable,
+        }
+        self._executors: dict[type, Callable[[Any], None]] = {
+            Block: self._block,
+            Expression: self._expression_statement,
+            Function: self._function,
+            If: self._if,
+            Print: self._print,
+            Return: self._return,
+            Var: self._var,
+            While: self._while,
+        }
+
+    def evaluate(self, expression: Expr) -> Any:
+        evaluator = self._evaluators.get(type(expression))
+        if evaluator is None:
+            raise unsupported(expression)
+        return evaluator(expression)
+
+    def execute(self, statement: Stmt) -> None:
+        executor = self._executors.get(type(statement))
+        if executor is None:
+            raise unsupported(statement)
+        executor(statement)
+
+    def run(self, statements: list[Stmt]) -> None:
+        for statement in statements:
+            self.execute(statement)
+
+    def execute_block(self, statements: list[Stmt], environment: Environment):
+        previous = self.environment
+        try:
+            self.environment = environment
+            for statement in statements:
+                self.execute(statement)
+        finally:
+            self.environment = previous
+
+    def _assign(self, expression: Assign) -> Any:
+        value = self.evaluate(expression.value)
+        if expression.depth == GLOBAL:
+            self.globals.assign(expression.name, value)
+        else:
+            environment = self.environment.ancestor(expression.depth)
+            environment.values[expression.name.lexeme] = value
+        return value
+
+    def _binary(self, expression: Binary) -> Any:
+        left = self.evaluate(expression.left)
+        right = self.evaluate(expression.right)
+        operator = expression.operator
+        token_type = operator.type
+
+        if token_type == TokenType.EQUAL_EQUAL:
+            return is_equal(left, right)
+        if token_type == TokenType.BANG_EQUAL:
+            return not is_equal(left, right)
+        if token_type == TokenType.PLUS:
+            if isinstance(left, float) and isinstance(right, float):
+                return left + right
+            if isinstance(left, str) and isinstance(right, str):
+                return left + right
+            raise LoxRuntimeError(
+                operator, "Operands must be two numbers or two strings."
+            )
+
+        _check_number_operands(operator, left, right)
+        if token_type == TokenType.MINUS:
+            return left - right
+        if token_type == TokenType.STAR:
+            return left * right
+        if token_type == TokenType.SLASH:
+            return divide(left, right)
+        if token_type == TokenType.GREATER:
+            return left > right
+        if token_type == TokenType.GREATER_EQUAL:
+            return left >= right
+        if token_type == TokenType.LESS:
+            return left < right
+        return left <= right
+
+    def _call(self, expression: Call) -> Any:
+        callee = self.evaluate(expression.callee)
+        arguments = [self.evaluate(argument) for argument in expression.arguments]
+        if not isinstance(callee, LoxCallable):
+            raise LoxRuntimeError(
+                expression.paren, "Can only call functions and classes."
+            )
+        check_arity(callee, arguments, expression.paren)
+        try:
+            return callee.call(arguments)
+        except RecursionError:
+            # Reported at the innermost call that can still raise
+            raise LoxRuntimeError(expression.paren, "Stack overflow.") from None
+
+    def _grouping(self, expression: Grouping) -> Any:
+        return self.evaluate(expression.expression)
+
+    def _literal(self, expression: Literal) -> Any:
+        return expression.value
+
+    def _logical(self, expression: Logical) -> Any:
+        left = self.evaluate(expression.left)
+        if expression.operator.type == TokenType.OR:
+            if is_truthy(left):
+                return left
+        elif not is_truthy(left):
+            return left
+        return self.evaluate(expression.right)
+
+    def _unary(self, expression: Unary) -> Any:
+        right = self.evaluate(expression.right)
+        if expression.operator.type == TokenType.BANG:
+            return not is_truthy(right)
+        if not isinstance(right, float):
+            raise LoxRuntimeError(expression.operator, "Operand must be a number.")
+        return -right
+
+    def _variable(self, expression: Variable) -> Any:
+        if expression.depth == GLOBAL:
+            return self.globals.get(expression.name)
+        environment = self.environment.ancestor(expression.depth)
+        return environment.values[expression.name.lexeme]
+
+    def _block(self, statement: Block) -> None:
+        if statement.slot_count:
+            environment = Environment(self.environment)
+        else:
+            # Resolver gave the block no scope, it declares nothing
+            environment = self.environment
+        self.execute_block(statement.statements, environment)
+
+    def _expression_statement(self, statement: Expression) -> None:
+        self.evaluate(statement.expression)
+
+    def _function(self, statement: Function) -> None:
+        function = LoxFunction(statement, self.environment, self)
+        self.environment.define(statement.name.lexeme, function)
+
+    def _if(self, statement: If) -> None:
+        if is_truthy(self.evaluate(statement.condition)):
+            self.execute(statement.then_branch)
+        elif statement.else_branch is not None:
+            self.execute(statement.else_branch)
+
+    def _print(self, statement: Print) -> None:
+        self.stdout.write(stringify(self.evaluate(statement.expression)) + "\n")
+
+    def _return(self, statement: Return) -> None:
+        value = None
+        if statement.value is not None:
+            value = self.evaluate(statement.value)
+        raise ReturnSignal(value)
+
+    def _var(self, statement: Var) -> None:
+        value = None
+        if statement.initializer is not None:
+            value = self.evaluate(statement.initializer)
+        self.environment.define(statement.name.lexeme, value)
+
+    def _while(self, statement: While) -> None:
+        while is_truthy(self.evaluate(statement.condition)):
+            self.execute(statement.body)
+
+
+def _check_number_operands(operator: Token, left: Any, right: Any) -> None:
+    if not isinstance(left, float) or not isinstance(right, float):
+        raise LoxRuntimeError(operator, "Operands must be numbers.")
+
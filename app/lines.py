@@ -0,0 +1,61 @@
+import re
+from array import array
+from bisect import bisect_right
+
+# What str.splitlines breaks lines at
+LINE_BREAKS = "\n\r\x0b\x0c\x1c\x1d\x1e\x85\u2028\u2029"
+LINE_BREAK_PATTERN = re.compile(f"\r\n|[{LINE_BREAKS}]")
+
+
+def offset_typecode(size: int) -> str:
+    """
+    Typecode of the narrowest array holding any offset, length or line
+    number of a source of the given size.
+    """
+    # A source of size characters has at most size + 1 lines
+    if size < (1 << 16) - 1:
+        return "H"
+    if size < (1 << 32) - 1:
+        return "I"
+    return "Q"
+
+
+class LineIndex:
+    """
+    Offsets at which the lines of a source start, 8 bytes per line. The
+    line and column of any offset are found by binary search, so tokens and
+    errors only need to keep their offset. Lines and columns count from 1,
+    columns in characters.
+    """
+
+    __slots__ = ("starts",)
+
+    def __init__(self, starts: array):
+        # Always starts with 0, an empty source has one empty line
+        self.starts = starts
+
+    @classmethod
+    def build(cls, source: str) -> "LineIndex":
+        starts = array("Q", [0])
+        starts.extend(match.end() for match in LINE_BREAK_PATTERN.finditer(source))
+        # A break at the very end starts no line
+        if len(starts) > 1 and starts[-1] == len(source):
+            starts.pop()
+        return cls(starts)
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def line(self, offset: int) -> int:
+        return bisect_right(self.starts, offset)
+
+    def column(self, offset: int) -> int:
+        return offset - self.starts[bisect_right(self.starts, offset) - 1] + 1
+
+    def position(self, offset: int) -> tuple[int, int]:
+        """Line and column of an offset."""
+        line = bisect_right(self.starts, offset)
+        return line, offset - self.starts[line - 1] + 1
+
+    def offset(self, line: int, column: int = 1) -> int:
+        return self.starts[line - 1] + column - 1
@@ -1,51 +1,505 @@
 import sys
+from enum import Enum
+from typing import Any, Callable, Optional, TextIO
 
+from app.bytecode import BytecodeCompiler, disassemble
+from app.cache import (
+    ArtifactCache,
+    MemoryCache,
+    configured_directory,
+    default_directory,
+)
+from app.closures import ClosureCompiler
+from app.errors import ErrorLog, InterpretationError, LoxRuntimeError, ParseError
+from app.flat import FlatParser, FlatTree
+from app.interpreter import Interpreter
+from app.optimizer import PassManager
 from app.parser import Parser
+from app.protocol import default_address
+from app.records import jsonl_tokens, jsonl_tree, write_binary
+from app.resolver import Resolver
+from app.runtime import stringify
 from app.scanner import Scanner
+from app.stats import DISABLED, Stats
+from app.streams import LineWriter, read_chunks, read_source, write_batched
+from app.tokenization import NumericMode
+from app.transpiler import PythonEngine, Transpiler
+from app.vm import VirtualMachine
+
+USAGE = (
+    "Usage: ./your_program.sh <command> <filename> [options]\n"
+    "       ./your_program.sh serve [<socket>|-] [--jobs=<processes>]\n"
+    "       ./your_program.sh batch <command> <directory>|<glob>|<manifest>"
+    " [options]\n"
+    " Available commands: tokenize, parse, evaluate, run, disassemble, transpile\n"
+    " Options: --numeric=decimal|float --backend=vm|closure|tree|python"
+    " (classes run on vm and closure only)"
+    " --cache[=<directory>|off] --optimize=on|off --warnings=on|off"
+    " --jobs=<processes> --format=text|jsonl|binary --stats[=<file>]"
+    " --max-errors=<count> --max-depth=<calls> (vm backend only)"
+)
+
+
+class Backend(Enum):
+    CLOSURE = "closure"
+    TREE = "tree"
+    VM = "vm"
+    PYTHON = "python"
+
+
+class OutputFormat(Enum):
+    TEXT = "text"
+    JSONL = "jsonl"
+    BINARY = "binary"
+
+
+BACKENDS: dict[Backend, Callable[[TextIO], Any]] = {
+    Backend.CLOSURE: ClosureCompiler,
+    Backend.TREE: Interpreter,
+    Backend.VM: VirtualMachine,
+    Backend.PYTHON: PythonEngine,
+}
+
+
+def cache_directory(value: str) -> Optional[str]:
+    # A bare --cache turns the cache on in its default directory
+    if not value:
+        return default_directory()
+    return None if value == "off" else value
+
+
+def positive(value: str) -> int:
+    number = int(value)
+    if number < 1:
+        raise ValueError(value)
+    return number
+
+
+def stats_target(value: str) -> str:
+    # A bare --stats reports to stderr
+    return value or "-"
+
+
+def switch(value: str) -> bool:
+    if value not in ("on", "off"):
+        raise ValueError(value)
+    return value == "on"
+
+
+# Option name -> converter of its value, unknown values raise ValueError
+OPTIONS: dict[str, Callable[[str], Any]] = {
+    "numeric": NumericMode,
+    "backend": Backend,
+    "cache": cache_directory,
+    "optimize": switch,
+    "warnings": switch,
+    "jobs": positive,
+    "format": OutputFormat,
+    "stats": stats_target,
+    "max-errors": positive,
+    "max-depth": positive,
+}
+
+# Reported when nesting exhausts the Python stack of a recursive stage
+NESTED_TOO_DEEPLY = "Expression nested too deeply."
+
+COMMANDS = ("tokenize", "parse", "evaluate", "run", "disassemble", "transpile")
+
+DEFAULT_OPTIONS: dict[str, Any] = {
+    "numeric": NumericMode.DECIMAL,
+    # Its frames live on the heap, so Lox recursion can go deep
+    "backend": Backend.VM,
+    # Off unless LOX_CACHE_DIR or --cache turns it on
+    "cache": configured_directory(),
+    "optimize": False,
+    "warnings": False,
+    "jobs": 1,
+    "format": OutputFormat.TEXT,
+    "stats": None,
+    # Without a limit the first syntax error ends parsing
+    "max-errors": None,
+    # Frames of the vm backend, the others are bound by the Python stack
+    "max-depth": None,
+}
+
+
+def parse_arguments(arguments: list[str]) -> tuple[list[str], dict[str, Any]]:
+    """Split command line arguments into positional ones and --name=value options."""
+    positional = []
+    options = dict(DEFAULT_OPTIONS)
+    for argument in arguments:
+        if not argument.startswith("--"):
+            positional.append(argument)
+            continue
+
+        name, _, value = argument[2:].partition("=")
+        if name not in OPTIONS:
+            raise ValueError(f"Unknown option: --{name}")
+        try:
+            options[name] = OPTIONS[name](value)
+        except ValueError:
+            raise ValueError(f"Invalid value for --{name}: {value}") from None
+    if options["max-depth"] is not None and options["backend"] is not Backend.VM:
+        raise ValueError("Option --max-depth needs --backend=vm")
+    return positional, options
+
+
+def write_records(
+    output_format: OutputFormat, tokens: Any, tree: Optional[FlatTree] = None
+) -> None:
+    """Write tokens, or the tree over them, in one of the machine formats."""
+    if output_format is OutputFormat.BINARY:
+        sys.stdout.flush()
+        write_binary(sys.stdout.buffer, tokens, tree)
+        sys.stdout.buffer.flush()
+    else:
+        lines = jsonl_tokens(tokens) if tree is None else jsonl_tree(tree)
+        LineWriter(sys.stdout).writelines(lines)
+
+
+def tokenize(
+    filename: str,
+    numeric: NumericMode,
+    jobs: int = 1,
+    output_format: OutputFormat = OutputFormat.TEXT,
+    stats: Stats = DISABLED,
+    error_limit: Optional[int] = None,
+) -> int:
+    """
+    Stream tokens of a file to stdout without reading it into memory at once,
+    or read it whole and scan it with several processes when jobs > 1 or
+    into a buffer for the machine formats. Errors past error_limit are only
+    summarized.
+    """
+    with LineWriter(sys.stdout) as output, LineWriter(sys.stderr) as log:
+        if jobs > 1 or output_format is not OutputFormat.TEXT:
+            with stats.phase("read"):
+                scanner = Scanner(
+                    read_source(filename), numeric=numeric, error_limit=error_limit
+                )
+            with stats.phase("scan"):
+                tokens, errors = scanner.scan_parallel(jobs)
+            stats.count_tokens(tokens)
+            stats.count_errors(errors)
+            with stats.phase("output"):
+                log.writelines(map(str, errors))
+                log.writelines(errors.summary())
+                if output_format is OutputFormat.TEXT:
+                    output.writelines(map(str, tokens))
+                else:
+                    write_records(output_format, tokens)
+            return 65 if errors else 0
+
+        reported = ErrorLog(error_limit)
+
+        def report(error: InterpretationError) -> None:
+            if not reported.full:
+                log.write(str(error))
+            reported.append(error)
+
+        # Reading, scanning and writing take turns, so they are one phase
+        with stats.phase("tokenize"):
+            scanner = Scanner(numeric=numeric)
+            tokens = scanner.iter_tokens(read_chunks(filename), on_error=report)
+            output.writelines(map(str, stats.count_stream(tokens)))
+        stats.count_errors(reported)
+        log.writelines(reported.summary())
+
+    return 65 if reported else 0
+
+
+def scan_and_parse(
+    command: str,
+    source: str,
+    numeric: NumericMode,
+    jobs: int = 1,
+    stats: Stats = DISABLED,
+    error_limit: Optional[int] = None,
+) -> Any:
+    """
+    Syntax tree the command works on, exits with 65 on any error. Given an
+    error limit, programs are parsed on past errors until that many are found.
+    """
+    scanner = Scanner(source, numeric=numeric, error_limit=error_limit)
+    with stats.phase("scan"):
+        tokens, errors = scanner.scan_parallel(jobs)
+    stats.count_tokens(tokens)
+    stats.count_errors(errors)
+    for error in errors:
+        print(error, file=sys.stderr)
+    for line in errors.summary():
+        print(line, file=sys.stderr)
+
+    recovering = error_limit is not None and command not in ("parse", "evaluate")
+    parser = Parser(tokens, scanner.symbols)
+    try:
+        with stats.phase("parse"):
+            if command == "parse":
+                syntax = FlatParser(tokens).parse()
+            elif command == "evaluate":
+                syntax = parser.parse()
+            elif recovering:
+                # Scan errors count against the same limit
+                parse_errors = ErrorLog(max(error_limit - len(errors), 1))
+                syntax = parser.parse_program(parse_errors)
+            else:
+                syntax = parser.parse_program()
+    except ParseError as error:
+        stats.count_errors((error,))
+        print(error, file=sys.stderr)
+        exit(65)
+    except RecursionError:
+        # Reported at the token the parser had got to
+        error = ParseError(parser.token, NESTED_TOO_DEEPLY)
+        stats.count_errors((error,))
+        print(error, file=sys.stderr)
+        exit(65)
+
+    if recovering and parse_errors:
+        stats.count_errors(parse_errors)
+        for error in parse_errors:
+            print(error, file=sys.stderr)
+        for line in parse_errors.summary():
+            print(line, file=sys.stderr)
+        exit(65)
+    if errors:
+        exit(65)
+    return syntax
+
+
+def load_syntax(
+    command: str,
+    source: str,
+    options: dict[str, Any],
+    stats: Stats = DISABLED,
+    memory: Optional[MemoryCache] = None,
+) -> Any:
+    """
+    Like scan_and_parse, but reuses the artifact cached for this source in
+    memory, then on disk.
+    """
+    directory = options["cache"]
+    numeric, jobs = options["numeric"], options["jobs"]
+    error_limit = options["max-errors"]
+    if directory is None and memory is None:
+        return scan_and_parse(command, source, numeric, jobs, stats, error_limit)
+
+    cache = None if directory is None else ArtifactCache(directory)
+    # run, disassemble and transpile share the same parsed program
+    kind = "program" if command in ("run", "disassemble", "transpile") else command
+    with stats.phase("cache"):
+        key = ArtifactCache.key(source, kind, numeric.value)
+        syntax = None if memory is None else memory.load(key)
+        if syntax is None and cache is not None:
+            syntax = cache.load(key)
+            if syntax is not None and memory is not None:
+                memory.store(key, syntax)
+    if syntax is None:
+        syntax = scan_and_parse(command, source, numeric, jobs, stats, error_limit)
+        with stats.phase("cache"):
+            if cache is not None:
+                cache.store(key, syntax)
+            if memory is not None:
+                memory.store(key, syntax)
+    return syntax
+
+
+def resolve(command: str, syntax: Any) -> Resolver:
+    resolver = Resolver()
+    if command == "evaluate":
+        resolver.resolve_expression(syntax)
+    else:
+        resolver.resolve(syntax)
+    return resolver
+
+
+def analyze(
+    command: str, syntax: Any, options: dict[str, Any], stats: Stats = DISABLED
+) -> Any:
+    """Resolve and optionally optimize the program, exits with 65 on errors."""
+    with stats.phase("resolve"):
+        resolver = resolve(command, syntax)
+    if options["warnings"]:
+        for warning in resolver.warnings:
+            print(warning, file=sys.stderr)
+    if resolver.errors:
+        stats.count_errors(resolver.errors)
+        for error in resolver.errors:
+            print(error, file=sys.stderr)
+        exit(65)
+
+    if not options["optimize"]:
+        return syntax
+
+    with stats.phase("optimize"):
+        optimizer = PassManager()
+        if command == "evaluate":
+            syntax = optimizer.run_expression(syntax)
+        else:
+            syntax = optimizer.run(syntax)
+        # Removed declarations shift slots, so bindings are computed again
+        resolve(command, syntax)
+    for report in optimizer.reports:
+        print(f"optimize {report}", file=sys.stderr)
+    return syntax
 
 
 def main():
     print("Logs from your program will appear here!", file=sys.stderr)
 
-    if len(sys.argv) < 3:
-        print(
-            "Usage: ./your_program.sh <command> <filename>\n Available commands: tokenize, parse",
-            file=sys.stderr,
-        )
-        exit(1)
+    if sys.argv[1:2] == ["serve"]:
+        try:
+            arguments, options = parse_arguments(sys.argv[2:])
+        except ValueError as error:
+            print(error, file=sys.stderr)
+            exit(1)
+        # Imported here, the server imports this module
+        from app.server import serve
+
+        serve(arguments[0] if arguments else default_address(), options["jobs"])
+        return
+
+    if sys.argv[1:2] == ["batch"]:
+        from app.batch import batch
+
+        status = batch(sys.argv[2:])
+    else:
+        status = run_arguments(sys.argv[1:])
+    if status:
+        exit(status)
 
-    command = sys.argv[1]
-    filename = sys.argv[2]
 
-    if command not in ("tokenize", "parse"):
+def run_arguments(arguments: list[str], memory: Optional[MemoryCache] = None) -> int:
+    """Run a command line, without the program name, returns the exit status."""
+    try:
+        arguments, options = parse_arguments(arguments)
+    except ValueError as error:
+        print(error, file=sys.stderr)
+        return 1
+
+    if len(arguments) < 2:
+        print(USAGE, file=sys.stderr)
+        return 1
+
+    command, filename = arguments[:2]
+
+    if command not in COMMANDS:
         print(f"Unknown command: {command}", file=sys.stderr)
-        exit(1)
+        return 1
 
-    with open(filename) as file:
-        file_contents = file.read()
+    stats = DISABLED if options["stats"] is None else Stats()
+    stats.start()
+    try:
+        return execute(command, filename, options, stats, memory)
+    except SystemExit as error:
+        # Static errors exit from deep in the pipeline
+        return error.code if isinstance(error.code, int) else 1
+    finally:
+        stats.stop()
+        if stats.enabled:
+            write_stats(stats, options["stats"])
 
-    exit_code = 0
-    scanner = Scanner(file_contents)
-    tokens, errors = scanner.scan_tokens()
 
-    if errors:
-        exit_code = 65
-        for error in errors:
-            print(error, file=sys.stderr)
+def write_stats(stats: Stats, target: str) -> None:
+    if target == "-":
+        sys.stdout.flush()
+        stats.write(sys.stderr)
+        return
+    with open(target, "w") as file:
+        stats.write(file)
+
 
+def execute(
+    command: str,
+    filename: str,
+    options: dict[str, Any],
+    stats: Stats = DISABLED,
+    memory: Optional[MemoryCache] = None,
+) -> int:
+    """Run a command on a file, returns the exit status."""
     if command == "tokenize":
-        for token in tokens:
-            print(token)
+        return tokenize(
+            filename,
+            options["numeric"],
+            options["jobs"],
+            options["format"],
+            stats,
+            options["max-errors"],
+        )
+
+    with stats.phase("read"):
+        source = read_source(filename)
+    syntax = load_syntax(command, source, options, stats, memory)
+    stats.count_nodes(syntax)
+    try:
+        return process(command, syntax, options, stats)
+    except RecursionError:
+        # Calls overflow as Lox runtime errors, what is left is nesting that
+        # resolving, compiling or evaluating could not recurse through
+        sys.stdout.flush()
+        print(f"Error: {NESTED_TOO_DEEPLY}", file=sys.stderr)
+        return 65
 
+
+def process(
+    command: str, syntax: Any, options: dict[str, Any], stats: Stats = DISABLED
+) -> int:
+    """Run a command on the syntax tree it loaded, returns the exit status."""
     if command == "parse":
-        parser = Parser(tokens)
-        expression = parser.parse().traverse()
-        for element in expression:
-            if element.value: print(element.value)
+        with stats.phase("output"):
+            if options["format"] is not OutputFormat.TEXT:
+                write_records(options["format"], syntax.tokens, syntax)
+            else:
+                # Rendered piece by piece, so arbitrarily deep nesting prints fine
+                write_batched(sys.stdout, syntax.render())
+                print()
+        return 0
+
+    syntax = analyze(command, syntax, options, stats)
+
+    if command == "disassemble":
+        try:
+            with stats.phase("compile"):
+                function = BytecodeCompiler().compile_program(syntax)
+        except ParseError as error:
+            stats.count_errors((error,))
+            print(error, file=sys.stderr)
+            return 65
+        with stats.phase("output"):
+            LineWriter(sys.stdout).writelines(disassemble(function))
+        return 0
 
+    if command == "transpile":
+        with stats.phase("compile"):
+            source = Transpiler().transpile_program(syntax).source
+        with stats.phase("output"):
+            sys.stdout.write(source)
+        return 0
 
-    if exit_code != 0:
-        exit(exit_code)
+    # The stream of the moment, serve swaps it per request
+    engine = BACKENDS[options["backend"]](sys.stdout)
+    if options["max-depth"] is not None:
+        engine.max_depth = options["max-depth"]
+    try:
+        with stats.phase("execute"):
+            if command == "evaluate":
+                print(stringify(engine.evaluate(syntax)))
+            else:
+                engine.run(syntax)
+    except ParseError as error:
+        # Backends that compile ahead of time report static errors here
+        stats.count_errors((error,))
+        print(error, file=sys.stderr)
+        return 65
+    except LoxRuntimeError as error:
+        stats.count_errors((error,))
+        sys.stdout.flush()
+        print(error, file=sys.stderr)
+        return 70
+    finally:
+        if isinstance(engine, (ClosureCompiler, VirtualMachine)):
+            stats.count_inline_caches(engine.inline_caches)
+    return 0
 
 
 if __name__ == "__main__":
@@ -0,0 +1,174 @@
+from typing import Any, Optional
+
+from app.runtime import LoxCallable
+
+# Shapes an inline cache remembers before its site is deemed megamorphic
+POLYMORPHIC_LIMIT = 4
+
+
+class Shape:
+    """
+    Hidden class of instances: which field lives in which slot of their
+    field list. Instances of one class that gained the same fields in the
+    same order share a shape, so a shape check stands for a whole lookup.
+    Adding a field moves an instance along a transition to the next shape.
+    """
+
+    __slots__ = ("klass", "fields", "transitions")
+
+    def __init__(self, klass: "LoxClass", fields: dict[str, int]):
+        self.klass = klass
+        self.fields = fields
+        self.transitions: dict[str, Shape] = {}
+
+    def with_field(self, name: str) -> "Shape":
+        shape = self.transitions.get(name)
+        if shape is None:
+            fields = dict(self.fields)
+            fields[name] = len(fields)
+            shape = self.transitions[name] = Shape(self.klass, fields)
+        return shape
+
+    def lookup(self, name: str) -> Any:
+        """
+        Slot of a field, else the unbound method of that name, else None.
+        Fields shadow methods, as both only depend on the shape.
+        """
+        index = self.fields.get(name)
+        if index is not None:
+            return index
+        return self.klass.methods.get(name)
+
+
+class LoxClass(LoxCallable):
+    __slots__ = ("name", "superclass", "methods", "initializer", "root")
+
+    def __init__(
+        self,
+        name: str,
+        superclass: Optional["LoxClass"],
+        methods: dict[str, Any],
+    ):
+        self.name = name
+        self.superclass = superclass
+        # Inherited methods copied in, so lookups never walk superclasses
+        self.methods = {} if superclass is None else dict(superclass.methods)
+        self.methods.update(methods)
+        self.initializer = self.methods.get("init")
+        # Shape of new instances, without fields
+        self.root = Shape(self, {})
+
+    def inherit(self, superclass: "LoxClass") -> None:
+        """Take the methods of a superclass, before any of the class's own."""
+        self.superclass = superclass
+        self.methods.update(superclass.methods)
+        self.initializer = self.methods.get("init")
+
+    def add_method(self, name: str, method: Any) -> None:
+        self.methods[name] = method
+        if name == "init":
+            self.initializer = method
+
+    def arity(self) -> int:
+        initializer = self.initializer
+        return 0 if initializer is None else initializer.arity()
+
+    def call(self, arguments: list[Any]) -> Any:
+        instance = LoxInstance(self.root)
+        if self.initializer is not None:
+            self.initializer.bind(instance).call(arguments)
+        return instance
+
+    def __str__(self) -> str:
+        return self.name
+
+
+class LoxInstance:
+    __slots__ = ("shape", "fields")
+
+    def __init__(self, shape: Shape):
+        self.shape = shape
+        self.fields: list[Any] = []
+
+    def __str__(self) -> str:
+        return f"{self.shape.klass.name} instance"
+
+
+class InlineCache:
+    """
+    What a property access site found for the shapes it saw: a field slot
+    or an unbound method for gets and calls, the slot and the shape after
+    the store for sets. Sites compare the first shape inline and only call
+    ``resolve`` for others; past POLYMORPHIC_LIMIT shapes new ones are
+    looked up every time without being cached.
+    """
+
+    __slots__ = (
+        "kind",
+        "name",
+        "line",
+        "shape",
+        "entry",
+        "shapes",
+        "entries",
+        "hits",
+        "misses",
+    )
+
+    def __init__(self, kind: str, name: str, line: int):
+        self.kind = kind
+        self.name = name
+        self.line = line
+        # First shape seen and its entry, the monomorphic case
+        self.shape: Optional[Shape] = None
+        self.entry: Any = None
+        self.shapes: list[Shape] = []
+        self.entries: list[Any] = []
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def megamorphic(self) -> bool:
+        """Whether the site saw more shapes than it could cache."""
+        return self.misses > len(self.shapes) + (self.shape is not None)
+
+    def resolve(self, shape: Shape) -> Any:
+        """Entry for a shape other than the first, None if there is none."""
+        shapes = self.shapes
+        for index in range(len(shapes)):
+            if shapes[index] is shape:
+                self.hits += 1
+                return self.entries[index]
+
+        self.misses += 1
+        entry = self._lookup(shape)
+        if entry is None:
+            return None
+        if self.shape is None:
+            self.shape, self.entry = shape, entry
+        elif len(shapes) + 1 < POLYMORPHIC_LIMIT:
+            shapes.append(shape)
+            self.entries.append(entry)
+        return entry
+
+    def _lookup(self, shape: Shape) -> Any:
+        if self.kind != "set":
+            return shape.lookup(self.name)
+        index = shape.fields.get(self.name)
+        if index is None:
+            return len(shape.fields), shape.with_field(self.name)
+        return index, shape
+
+
+def cache_statistics(caches: list[InlineCache]) -> dict[str, dict[str, int]]:
+    """Sites, hits, misses and megamorphic sites by kind of access."""
+    statistics: dict[str, dict[str, int]] = {}
+    for cache in caches:
+        totals = statistics.setdefault(
+            cache.kind, {"sites": 0, "hits": 0, "misses": 0, "megamorphic": 0}
+        )
+        totals["sites"] += 1
+        totals["hits"] += cache.hits
+        totals["misses"] += cache.misses
+        totals["megamorphic"] += cache.megamorphic
+    return statistics
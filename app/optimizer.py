@@ -0,0 +1,343 @@
+import math
+from dataclasses import dataclass
+from typing import Any, Callable, Optional, Sequence
+
+from app.runtime import divide, is_equal, is_truthy
+from app.syntax import (
+    Binary,
+    Block,
+    Expr,
+    Expression,
+    Grouping,
+    If,
+    Literal,
+    Logical,
+    Return,
+    Stmt,
+    Unary,
+    While,
+)
+from app.tokenization import Token, TokenType, format_number
+
+Node = Any
+
+
+def make_literal(value: Any) -> Literal:
+    if value is None:
+        text = "nil"
+    elif value is True or value is False:
+        text = str(value).lower()
+    elif value.__class__ is float:
+        text = format_number(value)
+    else:
+        text = value
+    return Literal(value, text)
+
+
+def count_nodes(nodes: Sequence[Node]) -> int:
+    """Number of expression and statement nodes reachable from nodes."""
+    count = 0
+    stack = list(nodes)
+    while stack:
+        node = stack.pop()
+        count += 1
+        for name in type(node).__slots__:
+            value = getattr(node, name)
+            if isinstance(value, (Expr, Stmt)):
+                stack.append(value)
+            elif isinstance(value, list):
+                stack.extend(v for v in value if isinstance(v, (Expr, Stmt)))
+    return count
+
+
+class Pass:
+    """
+    Bottom-up rewrite of a program. Children of a node are rewritten first,
+    then ``expression`` or ``statement`` may replace the node itself. A
+    statement replaced with None is dropped.
+    """
+
+    name = ""
+
+    def run(self, statements: list[Stmt]) -> list[Stmt]:
+        return self._statements(statements)
+
+    def run_expression(self, expression: Expr) -> Expr:
+        return self._expression(expression)
+
+    def expression(self, expression: Expr) -> Expr:
+        return expression
+
+    def statement(self, statement: Stmt) -> Optional[Stmt]:
+        return statement
+
+    def statements(self, statements: list[Stmt]) -> list[Stmt]:
+        return statements
+
+    def _expression(self, expression: Expr) -> Expr:
+        self._children(expression)
+        return self.expression(expression)
+
+    def _statement(self, statement: Stmt) -> Optional[Stmt]:
+        self._children(statement)
+        return self.statement(statement)
+
+    def _statements(self, statements: list[Stmt]) -> list[Stmt]:
+        result = []
+        for statement in statements:
+            rewritten = self._statement(statement)
+            if rewritten is not None:
+                result.append(rewritten)
+        return self.statements(result)
+
+    def _children(self, node: Node) -> None:
+        for name in type(node).__slots__:
+            value = getattr(node, name)
+            if isinstance(value, Expr):
+                setattr(node, name, self._expression(value))
+            elif isinstance(value, Stmt):
+                # A branch or loop body still needs a statement in its place
+                setattr(node, name, self._statement(value) or Block([]))
+            elif value and isinstance(value, list):
+                if isinstance(value[0], Stmt):
+                    setattr(node, name, self._statements(value))
+                elif isinstance(value[0], Expr):
+                    setattr(node, name, [self._expression(v) for v in value])
+
+
+def _add(left: Any, right: Any) -> Any:
+    if left.__class__ is right.__class__ and left.__class__ in (float, str):
+        return left + right
+    return None
+
+
+# Operators folded when both operands are numbers, and equality on anything
+NUMBER_OPERATIONS: dict[TokenType, Callable[[float, float], Any]] = {
+    TokenType.MINUS: lambda a, b: a - b,
+    TokenType.STAR: lambda a, b: a * b,
+    TokenType.SLASH: divide,
+    TokenType.GREATER: lambda a, b: a > b,
+    TokenType.GREATER_EQUAL: lambda a, b: a >= b,
+    TokenType.LESS: lambda a, b: a < b,
+    TokenType.LESS_EQUAL: lambda a, b: a <= b,
+}
+
+
+class ConstantFolding(Pass):
+    """
+    Evaluates operators whose operands are literals and drops groupings.
+    Operations that would raise a runtime error are left in place, so the
+    error still happens at the same point.
+    """
+
+    name = "fold"
+
+    def expression(self, expression: Expr) -> Expr:
+        if isinstance(expression, Grouping):
+            return expression.expression
+
+        if isinstance(expression, Unary):
+            right = expression.right
+            if not isinstance(right, Literal):
+                return expression
+            if expression.operator.type == TokenType.BANG:
+                return make_literal(not is_truthy(right.value))
+            if right.value.__class__ is float:
+                return make_literal(-right.value)
+            return expression
+
+        if isinstance(expression, Logical):
+            left = expression.left
+            if not isinstance(left, Literal):
+                return expression
+            if (expression.operator.type == TokenType.OR) == is_truthy(left.value):
+                return left
+            return expression.right
+
+        if isinstance(expression, Binary):
+            left, right = expression.left, expression.right
+            if not isinstance(left, Literal) or not isinstance(right, Literal):
+                return expression
+            token_type = expression.operator.type
+            if token_type == TokenType.EQUAL_EQUAL:
+                return make_literal(is_equal(left.value, right.value))
+            if token_type == TokenType.BANG_EQUAL:
+                return make_literal(not is_equal(left.value, right.value))
+            if token_type == TokenType.PLUS:
+                value = _add(left.value, right.value)
+                return expression if value is None else make_literal(value)
+            if left.value.__class__ is float and right.value.__class__ is float:
+                operation = NUMBER_OPERATIONS[token_type]
+                return make_literal(operation(left.value, right.value))
+        return expression
+
+
+class DeadCodeElimination(Pass):
+    """
+    Removes branches decided by a literal condition, loops that never run,
+    statements following a return and expression statements without any
+    effect.
+    """
+
+    name = "dead-code"
+
+    def statement(self, statement: Stmt) -> Optional[Stmt]:
+        if isinstance(statement, If) and isinstance(statement.condition, Literal):
+            if is_truthy(statement.condition.value):
+                return statement.then_branch
+            return statement.else_branch
+        if isinstance(statement, While) and isinstance(statement.condition, Literal):
+            if not is_truthy(statement.condition.value):
+                return None
+        if isinstance(statement, Expression) and isinstance(
+            statement.expression, Literal
+        ):
+            return None
+        if isinstance(statement, Block) and not statement.statements:
+            return None
+        return statement
+
+    def statements(self, statements: list[Stmt]) -> list[Stmt]:
+        for index, statement in enumerate(statements):
+            if isinstance(statement, Return):
+                return statements[: index + 1]
+        return statements
+
+
+def is_number(expression: Expr) -> bool:
+    """Whether the expression can only produce a number, or raise."""
+    if isinstance(expression, Literal):
+        return expression.value.__class__ is float
+    if isinstance(expression, Grouping):
+        return is_number(expression.expression)
+    if isinstance(expression, Unary):
+        return expression.operator.type == TokenType.MINUS
+    if isinstance(expression, Binary):
+        token_type = expression.operator.type
+        if token_type in (TokenType.MINUS, TokenType.STAR, TokenType.SLASH):
+            return True
+        if token_type == TokenType.PLUS:
+            return is_number(expression.left) and is_number(expression.right)
+    return False
+
+
+def _ungroup(expression: Expr) -> Expr:
+    while isinstance(expression, Grouping):
+        expression = expression.expression
+    return expression
+
+
+def _is_constant(expression: Expr, value: float) -> bool:
+    return (
+        isinstance(expression, Literal)
+        and expression.value.__class__ is float
+        and expression.value == value
+    )
+
+
+def _exact_reciprocal(value: Any) -> Optional[float]:
+    """1 / value when it is exact, which holds for powers of two only."""
+    if value.__class__ is not float or value == 0 or not math.isfinite(value):
+        return None
+    if abs(math.frexp(value)[0]) != 0.5:
+        return None
+    reciprocal = 1 / value
+    if not math.isfinite(reciprocal) or abs(math.frexp(reciprocal)[0]) != 0.5:
+        return None
+    return reciprocal
+
+
+class StrengthReduction(Pass):
+    """
+    Replaces division by a power of two with an exact multiplication and
+    drops arithmetic identities on operands known to be numbers:
+    ``x * 1``, ``1 * x``, ``x / 1``, ``x - 0`` and ``-(-x)``. ``x + 0`` is
+    kept as it turns -0 into 0.
+    """
+
+    name = "strength"
+
+    def expression(self, expression: Expr) -> Expr:
+        if isinstance(expression, Unary):
+            right = _ungroup(expression.right)
+            if (
+                expression.operator.type == TokenType.MINUS
+                and isinstance(right, Unary)
+                and right.operator.type == TokenType.MINUS
+                and is_number(right.right)
+            ):
+                return right.right
+            return expression
+
+        if not isinstance(expression, Binary):
+            return expression
+        left, operator, right = expression.left, expression.operator, expression.right
+        token_type = operator.type
+        if token_type == TokenType.STAR:
+            if _is_constant(right, 1.0) and is_number(left):
+                return left
+            if _is_constant(left, 1.0) and is_number(right):
+                return right
+        elif token_type == TokenType.SLASH and isinstance(right, Literal):
+            if right.value == 1.0 and is_number(left):
+                return left
+            reciprocal = _exact_reciprocal(right.value)
+            if reciprocal is not None:
+                # Same "Operands must be numbers." error on the same line
+                star = Token(TokenType.STAR, "*", None, operator.line)
+                return Binary(left, star, make_literal(reciprocal))
+        elif token_type == TokenType.MINUS:
+            if _is_constant(right, 0.0) and is_number(left):
+                return left
+        return expression
+
+
+DEFAULT_PASSES: tuple[type[Pass], ...] = (
+    ConstantFolding,
+    StrengthReduction,
+    DeadCodeElimination,
+)
+
+
+@dataclass(slots=True)
+class PassReport:
+    name: str
+    nodes_before: int
+    nodes_after: int
+
+    @property
+    def removed(self) -> int:
+        return self.nodes_before - self.nodes_after
+
+    def __str__(self) -> str:
+        return (
+            f"{self.name}: removed {self.removed} of {self.nodes_before} nodes"
+        )
+
+
+class PassManager:
+    """Runs optimization passes in order and records what each one removed."""
+
+    def __init__(self, passes: Optional[Sequence[Pass]] = None):
+        if passes is None:
+            passes = [factory() for factory in DEFAULT_PASSES]
+        self.passes = list(passes)
+        self.reports: list[PassReport] = []
+
+    def run(self, statements: list[Stmt]) -> list[Stmt]:
+        for optimization in self.passes:
+            before = count_nodes(statements)
+            statements = optimization.run(statements)
+            self.reports.append(
+                PassReport(optimization.name, before, count_nodes(statements))
+            )
+        return statements
+
+    def run_expression(self, expression: Expr) -> Expr:
+        for optimization in self.passes:
+            before = count_nodes([expression])
+            expression = optimization.run_expression(expression)
+            self.reports.append(
+                PassReport(optimization.name, before, count_nodes([expression]))
+            )
+        return expression
@@ -1,13 +1,377 @@
-from app.tokenization import Token
-from app.tree import Tree
+from typing import Optional, Sequence
+
+from app.errors import ErrorLog, ParseError
+from app.symbols import SymbolTable
+from app.syntax import (
+    Assign,
+    Binary,
+    Block,
+    Call,
+    Class,
+    Expr,
+    Expression,
+    Function,
+    Get,
+    Grouping,
+    If,
+    Literal,
+    Logical,
+    Print,
+    Return,
+    Set,
+    Stmt,
+    Super,
+    This,
+    Unary,
+    Var,
+    Variable,
+    While,
+)
+from app.tokenization import Token, TokenType, format_number
+
+MAX_ARGUMENTS = 255
+
+# Binding power of binary and logical operators, higher binds tighter
+BINARY_PRECEDENCE: dict[TokenType, int] = {
+    TokenType.OR: 1,
+    TokenType.AND: 2,
+    TokenType.BANG_EQUAL: 3,
+    TokenType.EQUAL_EQUAL: 3,
+    TokenType.GREATER: 4,
+    TokenType.GREATER_EQUAL: 4,
+    TokenType.LESS: 4,
+    TokenType.LESS_EQUAL: 4,
+    TokenType.MINUS: 5,
+    TokenType.PLUS: 5,
+    TokenType.SLASH: 6,
+    TokenType.STAR: 6,
+}
+LOGICAL_OPERATORS = (TokenType.AND, TokenType.OR)
+UNARY_OPERATORS = (TokenType.BANG, TokenType.MINUS)
+# Tokens that start a statement, where parsing resumes after an error
+STATEMENT_STARTS = (
+    TokenType.CLASS,
+    TokenType.FUN,
+    TokenType.VAR,
+    TokenType.FOR,
+    TokenType.IF,
+    TokenType.WHILE,
+    TokenType.PRINT,
+    TokenType.RETURN,
+)
+
+KEYWORD_LITERALS: dict[TokenType, tuple[object, str]] = {
+    TokenType.TRUE: (True, "true"),
+    TokenType.FALSE: (False, "false"),
+    TokenType.NIL: (None, "nil"),
+}
 
 
 class Parser:
-    def __init__(self, tokens: list[Token]):
+    """
+    Recursive descent parser for statements with precedence climbing for
+    binary operators: every left-associative level is consumed by a loop, so
+    recursion depth only grows with nesting of groups, calls and unary
+    operators.
+    """
+
+    def __init__(
+        self, tokens: Sequence[Token], symbols: Optional[SymbolTable] = None
+    ):
         self.tokens = tokens
+        # Interned identifiers and string literals shared with the scanner
+        self.symbols = symbols if symbols is not None else SymbolTable()
+        self.current = 0
+        self.token = tokens[0]
+
+    def parse(self) -> Expr:
+        """Parse a single expression."""
+        return self._expression()
+
+    def parse_program(self, errors: Optional[ErrorLog] = None) -> list[Stmt]:
+        """
+        Parse statements up to the end. Without an error log the first
+        error is raised; with one, errors go to the log and parsing goes on
+        from the next statement boundary.
+        """
+        statements = []
+        while self.token.type != TokenType.EOF:
+            if errors is None:
+                statements.append(self._declaration())
+                continue
+            try:
+                statements.append(self._declaration())
+            except ParseError as error:
+                errors.append(error)
+                self._synchronize()
+        return statements
+
+    def parse_declaration(self) -> Stmt:
+        """Parse the next top level statement only."""
+        return self._declaration()
+
+    def _synchronize(self) -> None:
+        """Skip tokens to the likely start of the next statement."""
+        token = self._advance()
+        while self.token.type != TokenType.EOF:
+            if token.type == TokenType.SEMICOLON:
+                return
+            if self.token.type in STATEMENT_STARTS:
+                return
+            token = self._advance()
+
+    def _advance(self) -> Token:
+        token = self.token
+        if token.type != TokenType.EOF:
+            self.current += 1
+            self.token = self.tokens[self.current]
+        return token
+
+    def _match(self, token_type: TokenType) -> bool:
+        if self.token.type == token_type:
+            self._advance()
+            return True
+        return False
+
+    def _consume(self, token_type: TokenType, message: str) -> Token:
+        if self.token.type == token_type:
+            return self._advance()
+        raise ParseError(self.token, message)
+
+    def _declaration(self) -> Stmt:
+        if self._match(TokenType.CLASS):
+            return self._class_declaration()
+        if self._match(TokenType.FUN):
+            return self._function("function")
+        if self._match(TokenType.VAR):
+            return self._var_declaration()
+        return self._statement()
+
+    def _class_declaration(self) -> Class:
+        name = self._consume(TokenType.IDENTIFIER, "Expect class name.")
+        superclass = None
+        if self._match(TokenType.LESS):
+            superclass = Variable(
+                self._consume(TokenType.IDENTIFIER, "Expect superclass name.")
+            )
+
+        self._consume(TokenType.LEFT_BRACE, "Expect '{' before class body.")
+        methods = []
+        while self.token.type not in (TokenType.RIGHT_BRACE, TokenType.EOF):
+            methods.append(self._function("method"))
+        self._consume(TokenType.RIGHT_BRACE, "Expect '}' after class body.")
+        return Class(name, superclass, methods)
+
+    def _function(self, kind: str) -> Function:
+        name = self._consume(TokenType.IDENTIFIER, f"Expect {kind} name.")
+        self._consume(TokenType.LEFT_PAREN, f"Expect '(' after {kind} name.")
+        params = []
+        if self.token.type != TokenType.RIGHT_PAREN:
+            while True:
+                if len(params) >= MAX_ARGUMENTS:
+                    raise ParseError(
+                        self.token, f"Can't have more than {MAX_ARGUMENTS} parameters."
+                    )
+                params.append(
+                    self._consume(TokenType.IDENTIFIER, "Expect parameter name.")
+                )
+                if not self._match(TokenType.COMMA):
+                    break
+        self._consume(TokenType.RIGHT_PAREN, "Expect ')' after parameters.")
+        self._consume(TokenType.LEFT_BRACE, f"Expect '{{' before {kind} body.")
+        return Function(name, params, self._block())
+
+    def _var_declaration(self) -> Var:
+        name = self._consume(TokenType.IDENTIFIER, "Expect variable name.")
+        initializer = None
+        if self._match(TokenType.EQUAL):
+            initializer = self._expression()
+        self._consume(TokenType.SEMICOLON, "Expect ';' after variable declaration.")
+        return Var(name, initializer)
+
+    def _statement(self) -> Stmt:
+        token_type = self.token.type
+        if token_type == TokenType.PRINT:
+            self._advance()
+            value = self._expression()
+            self._consume(TokenType.SEMICOLON, "Expect ';' after value.")
+            return Print(value)
+        if token_type == TokenType.LEFT_BRACE:
+            self._advance()
+            return Block(self._block())
+        if token_type == TokenType.IF:
+            self._advance()
+            return self._if_statement()
+        if token_type == TokenType.WHILE:
+            self._advance()
+            return self._while_statement()
+        if token_type == TokenType.FOR:
+            self._advance()
+            return self._for_statement()
+        if token_type == TokenType.RETURN:
+            return self._return_statement()
+
+        expression = self._expression()
+        self._consume(TokenType.SEMICOLON, "Expect ';' after expression.")
+        return Expression(expression)
+
+    def _block(self) -> list[Stmt]:
+        statements = []
+        while self.token.type not in (TokenType.RIGHT_BRACE, TokenType.EOF):
+            statements.append(self._declaration())
+        self._consume(TokenType.RIGHT_BRACE, "Expect '}' after block.")
+        return statements
+
+    def _if_statement(self) -> If:
+        self._consume(TokenType.LEFT_PAREN, "Expect '(' after 'if'.")
+        condition = self._expression()
+        self._consume(TokenType.RIGHT_PAREN, "Expect ')' after if condition.")
+        then_branch = self._statement()
+        else_branch = None
+        if self._match(TokenType.ELSE):
+            else_branch = self._statement()
+        return If(condition, then_branch, else_branch)
+
+    def _while_statement(self) -> While:
+        self._consume(TokenType.LEFT_PAREN, "Expect '(' after 'while'.")
+        condition = self._expression()
+        self._consume(TokenType.RIGHT_PAREN, "Expect ')' after condition.")
+        return While(condition, self._statement())
+
+    def _for_statement(self) -> Stmt:
+        # for loops are desugared into a while loop inside a block
+        self._consume(TokenType.LEFT_PAREN, "Expect '(' after 'for'.")
+        initializer: Optional[Stmt]
+        if self._match(TokenType.SEMICOLON):
+            initializer = None
+        elif self._match(TokenType.VAR):
+            initializer = self._var_declaration()
+        else:
+            expression = self._expression()
+            self._consume(TokenType.SEMICOLON, "Expect ';' after expression.")
+            initializer = Expression(expression)
+
+        condition = None
+        if self.token.type != TokenType.SEMICOLON:
+            condition = self._expression()
+        self._consume(TokenType.SEMICOLON, "Expect ';' after loop condition.")
+
+        increment = None
+        if self.token.type != TokenType.RIGHT_PAREN:
+            increment = self._expression()
+        self._consume(TokenType.RIGHT_PAREN, "Expect ')' after for clauses.")
+
+        body = self._statement()
+        if increment is not None:
+            body = Block([body, Expression(increment)])
+        if condition is None:
+            condition = Literal(True, "true")
+        loop: Stmt = While(condition, body)
+        if initializer is not None:
+            loop = Block([initializer, loop])
+        return loop
+
+    def _return_statement(self) -> Return:
+        keyword = self._advance()
+        value = None
+        if self.token.type != TokenType.SEMICOLON:
+            value = self._expression()
+        self._consume(TokenType.SEMICOLON, "Expect ';' after return value.")
+        return Return(keyword, value)
+
+    def _expression(self) -> Expr:
+        return self._assignment()
+
+    def _assignment(self) -> Expr:
+        expression = self._binary(1)
+        if self.token.type != TokenType.EQUAL:
+            return expression
+
+        equals = self._advance()
+        value = self._assignment()
+        if isinstance(expression, Variable):
+            return Assign(expression.name, value)
+        if isinstance(expression, Get):
+            return Set(expression.object, expression.name, value)
+        raise ParseError(equals, "Invalid assignment target.")
+
+    def _binary(self, min_precedence: int) -> Expr:
+        left = self._unary()
+        while True:
+            precedence = BINARY_PRECEDENCE.get(self.token.type)
+            if precedence is None or precedence < min_precedence:
+                return left
+            operator = self._advance()
+            right = self._binary(precedence + 1)
+            if operator.type in LOGICAL_OPERATORS:
+                left = Logical(left, operator, right)
+            else:
+                left = Binary(left, operator, right)
+
+    def _unary(self) -> Expr:
+        if self.token.type in UNARY_OPERATORS:
+            operator = self._advance()
+            return Unary(operator, self._unary())
+        return self._call()
+
+    def _call(self) -> Expr:
+        expression = self._primary()
+        while True:
+            if self._match(TokenType.LEFT_PAREN):
+                expression = self._finish_call(expression)
+            elif self._match(TokenType.DOT):
+                name = self._consume(
+                    TokenType.IDENTIFIER, "Expect property name after '.'."
+                )
+                expression = Get(expression, name)
+            else:
+                return expression
+
+    def _finish_call(self, callee: Expr) -> Call:
+        arguments = []
+        if self.token.type != TokenType.RIGHT_PAREN:
+            while True:
+                if len(arguments) >= MAX_ARGUMENTS:
+                    raise ParseError(
+                        self.token, f"Can't have more than {MAX_ARGUMENTS} arguments."
+                    )
+                arguments.append(self._expression())
+                if not self._match(TokenType.COMMA):
+                    break
+        paren = self._consume(TokenType.RIGHT_PAREN, "Expect ')' after arguments.")
+        return Call(callee, paren, arguments)
+
+    def _primary(self) -> Expr:
+        token = self.token
+        token_type = token.type
+        if token_type == TokenType.NUMBER:
+            self._advance()
+            value = float(token.lexeme)
+            return Literal(value, format_number(value))
+        if token_type == TokenType.STRING:
+            self._advance()
+            return Literal(token.literal, token.literal)
+        if token_type in KEYWORD_LITERALS:
+            self._advance()
+            value, text = KEYWORD_LITERALS[token_type]
+            return Literal(value, text)
+        if token_type == TokenType.IDENTIFIER:
+            self._advance()
+            return Variable(token)
+        if token_type == TokenType.LEFT_PAREN:
+            self._advance()
+            expression = self._expression()
+            self._consume(TokenType.RIGHT_PAREN, "Expect ')' after expression.")
+            return Grouping(expression)
+        if token_type == TokenType.THIS:
+            self._advance()
+            return This(token)
+        if token_type == TokenType.SUPER:
+            self._advance()
+            self._consume(TokenType.DOT, "Expect '.' after 'super'.")
+            method = self._consume(
+                TokenType.IDENTIFIER, "Expect superclass method name."
+            )
+            return Super(token, method)
 
-    def parse(self) -> Tree:
-        tree = Tree(None, True) # create a root node
-        for token in self.tokens:
-            tree.add_child(token)
-        return tree
+        raise ParseError(token, "Expect expression.")
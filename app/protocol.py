@@ -0,0 +1,55 @@
+import json
+import os
+import struct
+import tempfile
+from typing import Any, BinaryIO, Optional
+
+# Messages are JSON objects, each sent as a little endian u32 byte length
+# followed by the UTF-8 encoded JSON
+FRAME = struct.Struct("<I")
+# Larger messages are refused rather than read into memory
+MAX_MESSAGE_SIZE = 1 << 30
+# Program output bytes travel as text, bytes that are not UTF-8 are escaped
+OUTPUT_ENCODING = "utf-8"
+OUTPUT_ERRORS = "surrogateescape"
+
+
+def default_address() -> str:
+    """Socket path from LOX_SOCKET, else a per user one in a runtime directory."""
+    address = os.environ.get("LOX_SOCKET")
+    if address:
+        return address
+    directory = os.environ.get("XDG_RUNTIME_DIR") or tempfile.gettempdir()
+    return os.path.join(directory, f"lox-{os.getuid()}.sock")
+
+
+def send_message(stream: BinaryIO, message: dict[str, Any]) -> None:
+    data = json.dumps(message).encode()
+    stream.write(FRAME.pack(len(data)) + data)
+    stream.flush()
+
+
+def _read_exactly(stream: BinaryIO, size: int) -> bytes:
+    data = stream.read(size)
+    while data and len(data) < size:
+        more = stream.read(size - len(data))
+        if not more:
+            break
+        data += more
+    return data
+
+
+def receive_message(stream: BinaryIO) -> Optional[dict[str, Any]]:
+    """The next message, None once the stream ends between messages."""
+    header = _read_exactly(stream, FRAME.size)
+    if not header:
+        return None
+    if len(header) < FRAME.size:
+        raise ValueError("Truncated message header")
+    (size,) = FRAME.unpack(header)
+    if size > MAX_MESSAGE_SIZE:
+        raise ValueError(f"Message too large: {size} bytes")
+    data = _read_exactly(stream, size)
+    if len(data) < size:
+        raise ValueError("Truncated message")
+    return json.loads(data)
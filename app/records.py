@@ -0,0 +1,206 @@
+import json
+import math
+import struct
+from array import array
+from dataclasses import dataclass, field
+from typing import Any, BinaryIO, Iterator, Optional
+
+from app.buffer import TOKEN_TYPES, TokenBuffer
+from app.flat import FlatTree, NodeKind
+from app.symbols import SymbolTable
+from app.tokenization import (
+    RESERVED_WORDS,
+    TOKEN_MAPPING,
+    NumericMode,
+    Token,
+    TokenType,
+)
+
+# Binary record stream: a header, then records of a little endian u32
+# payload length followed by the payload, whose first byte tells its kind.
+# Readers skip payloads of kinds they do not know. Offsets count characters
+# of the decoded source, like TokenBuffer does.
+MAGIC = b"LOXR"
+VERSION = 1
+HEADER = struct.Struct("<4sH")
+LENGTH = struct.Struct("<I")
+TOKEN_RECORD, NODE_RECORD = range(2)
+# Kind, token type id, line, start offset, length, then the token text
+TOKEN = struct.Struct("<BBIQI")
+# Kind, node kind, token index, child count, subtree size
+NODE = struct.Struct("<BBIII")
+
+# Records of these token types carry no text, their lexeme never changes
+FIXED_LEXEMES: dict[TokenType, str] = {
+    token_type: lexeme
+    for lexeme, token_type in (TOKEN_MAPPING | RESERVED_WORDS).items()
+}
+FIXED_LEXEMES[TokenType.EOF] = ""
+
+# Output size gathered before each write
+_WRITE_SIZE = 1 << 16
+
+
+def _text(tokens: TokenBuffer, index: int) -> str:
+    """Name of an identifier, lexeme of a number, value of a string."""
+    token_type = tokens.type(index)
+    if token_type == TokenType.STRING:
+        return tokens.literal(index)
+    if token_type in FIXED_LEXEMES:
+        return ""
+    return tokens.lexeme(index)
+
+
+def write_binary(
+    stream: BinaryIO, tokens: TokenBuffer, tree: Optional[FlatTree] = None
+) -> None:
+    """
+    Write a record per token and, given a tree over the same tokens, a
+    record per node after them, in postorder.
+    """
+    output = bytearray(HEADER.pack(MAGIC, VERSION))
+    for index in range(len(tokens)):
+        text = _text(tokens, index).encode()
+        output += LENGTH.pack(TOKEN.size + len(text))
+        output += TOKEN.pack(
+            TOKEN_RECORD,
+            tokens.types[index],
+            tokens.lines[index],
+            tokens.starts[index],
+            tokens.lengths[index],
+        )
+        output += text
+        if len(output) >= _WRITE_SIZE:
+            stream.write(output)
+            output.clear()
+
+    if tree is not None:
+        node_length = LENGTH.pack(NODE.size)
+        for index in range(len(tree)):
+            output += node_length
+            output += NODE.pack(
+                NODE_RECORD,
+                tree.kinds[index],
+                tree.token_indexes[index],
+                tree.arities[index],
+                tree.sizes[index],
+            )
+            if len(output) >= _WRITE_SIZE:
+                stream.write(output)
+                output.clear()
+    stream.write(output)
+
+
+@dataclass(slots=True)
+class Records:
+    """Tokens read back from a record stream, with their place in the source."""
+
+    tokens: list[Token] = field(default_factory=list)
+    starts: array = field(default_factory=lambda: array("Q"))
+    lengths: array = field(default_factory=lambda: array("I"))
+    symbols: SymbolTable = field(default_factory=SymbolTable)
+    # Only when the stream has node records
+    tree: Optional[FlatTree] = None
+
+
+def read_binary(data: bytes, numeric: NumericMode = NumericMode.DECIMAL) -> Records:
+    """
+    Decode a record stream written by ``write_binary``. Identifiers and
+    strings are interned into the result's symbol table like the scanner
+    does, so the tokens can be handed to the parser as they are.
+    """
+    view = memoryview(data)
+    if len(view) < HEADER.size:
+        raise ValueError("Not a Lox record stream")
+    magic, version = HEADER.unpack_from(view)
+    if magic != MAGIC:
+        raise ValueError("Not a Lox record stream")
+    if version != VERSION:
+        raise ValueError(f"Unsupported record stream version: {version}")
+
+    records = Records()
+    tokens = records.tokens
+    intern = records.symbols.intern
+    names = records.symbols.names
+    position = HEADER.size
+    while position < len(view):
+        (length,) = LENGTH.unpack_from(view, position)
+        position += LENGTH.size
+        kind = view[position]
+        if kind == TOKEN_RECORD:
+            _, type_id, line, start, size = TOKEN.unpack_from(view, position)
+            text = str(view[position + TOKEN.size : position + length], "utf-8")
+            token_type = TOKEN_TYPES[type_id]
+            if token_type == TokenType.NUMBER:
+                token = Token.number(text, line, numeric, start)
+            elif token_type == TokenType.IDENTIFIER:
+                symbol = intern(text)
+                token = Token(
+                    token_type, names[symbol], None, line, symbol, offset=start
+                )
+            elif token_type == TokenType.STRING:
+                symbol = intern(text)
+                token = Token(
+                    token_type, f'"{text}"', names[symbol], line, symbol, offset=start
+                )
+            else:
+                token = Token(
+                    token_type, FIXED_LEXEMES[token_type], None, line, offset=start
+                )
+            tokens.append(token)
+            records.starts.append(start)
+            records.lengths.append(size)
+        elif kind == NODE_RECORD:
+            if records.tree is None:
+                records.tree = FlatTree(tokens)
+            tree = records.tree
+            _, node_kind, token_index, arity, subtree = NODE.unpack_from(
+                view, position
+            )
+            tree.kinds.append(node_kind)
+            tree.token_indexes.append(token_index)
+            tree.arities.append(arity)
+            tree.sizes.append(subtree)
+        position += length
+    return records
+
+
+def _token_object(tokens: TokenBuffer, index: int) -> dict[str, Any]:
+    token_type = tokens.type(index)
+    if token_type == TokenType.NUMBER:
+        literal: Any = float(tokens.lexeme(index))
+        # JSON has no infinity, overflowing literals keep their digits
+        if not math.isfinite(literal):
+            literal = tokens.lexeme(index)
+    else:
+        literal = tokens.literal(index)
+    return {
+        "type": token_type.name,
+        "lexeme": tokens.lexeme(index),
+        "literal": literal,
+        "line": tokens.lines[index],
+        "start": tokens.starts[index],
+        "length": tokens.lengths[index],
+    }
+
+
+def jsonl_tokens(tokens: TokenBuffer) -> Iterator[str]:
+    """A JSON object per token, one per line."""
+    for index in range(len(tokens)):
+        yield json.dumps(_token_object(tokens, index), allow_nan=False)
+
+
+def jsonl_tree(tree: FlatTree) -> Iterator[str]:
+    """
+    A JSON object per node in postorder, so the root comes last. Children
+    are given as line indexes of earlier nodes, the token is inlined.
+    """
+    for index in range(len(tree)):
+        yield json.dumps(
+            {
+                "kind": NodeKind(tree.kinds[index]).name,
+                "token": _token_object(tree.tokens, tree.token_indexes[index]),
+                "children": tree.children(index),
+            },
+            allow_nan=False,
+        )
@@ -0,0 +1,296 @@
+from dataclasses import dataclass
+from enum import Enum
+
+from app.errors import ParseError
+from app.runtime import NATIVE_FUNCTIONS
+from app.syntax import (
+    GLOBAL,
+    Assign,
+    Binary,
+    Block,
+    Call,
+    Class,
+    Expr,
+    Expression,
+    Function,
+    Get,
+    Grouping,
+    If,
+    Logical,
+    Print,
+    Return,
+    Set,
+    Stmt,
+    Super,
+    This,
+    Unary,
+    Var,
+    Variable,
+    While,
+)
+from app.tokenization import Token
+
+DECLARATIONS = (Var, Function, Class)
+
+
+class FunctionType(Enum):
+    NONE = "none"
+    FUNCTION = "function"
+    INITIALIZER = "initializer"
+    METHOD = "method"
+
+
+class ClassType(Enum):
+    NONE = "none"
+    CLASS = "class"
+    SUBCLASS = "subclass"
+
+
+@dataclass(slots=True)
+class Binding:
+    slot: int
+    token: Token
+    # False between the declaration and the end of its initializer
+    defined: bool = False
+    used: bool = False
+    # Only plain local variables are reported when never read
+    reported: bool = False
+
+
+@dataclass(slots=True)
+class StaticWarning:
+    token: Token
+    message: str
+
+    def __str__(self) -> str:
+        location = f"'{self.token.lexeme}'"
+        return f"[line {self.token.line}] Warning at {location}: {self.message}"
+
+
+class Resolver:
+    """
+    Binds every variable reference to the scope declaring it, as the number
+    of scopes to walk out (``depth``) and the index in that scope
+    (``slot``), and records how many slots each scope needs. References
+    found in no local scope are globals, looked up by name at run time.
+
+    Only blocks declaring something get a scope, matching the backends,
+    which skip creating empty ones. Errors are collected like the scanner
+    does; undefined globals and unused locals are reported as warnings.
+    """
+
+    def __init__(self):
+        self.scopes: list[dict[str, Binding]] = []
+        self.function_type = FunctionType.NONE
+        self.class_type = ClassType.NONE
+        self.errors: list[ParseError] = []
+        self.warnings: list[StaticWarning] = []
+        self.global_names: set[str] = set(NATIVE_FUNCTIONS)
+        self.global_references: list[Token] = []
+
+    def resolve(self, statements: list[Stmt]) -> list[ParseError]:
+        self._statements(statements)
+        self._check_globals()
+        return self.errors
+
+    def resolve_expression(self, expression: Expr) -> list[ParseError]:
+        self._expression(expression)
+        self._check_globals()
+        return self.errors
+
+    def _error(self, token: Token, message: str) -> None:
+        self.errors.append(ParseError(token, message))
+
+    def _check_globals(self) -> None:
+        for token in self.global_references:
+            if token.lexeme not in self.global_names:
+                self.warnings.append(
+                    StaticWarning(token, f"Undefined variable '{token.lexeme}'.")
+                )
+
+    def _begin_scope(self) -> None:
+        self.scopes.append({})
+
+    def _end_scope(self) -> int:
+        """Close the innermost scope, returning how many slots it needs."""
+        scope = self.scopes.pop()
+        for binding in scope.values():
+            if binding.reported and not binding.used:
+                name = binding.token.lexeme
+                self.warnings.append(
+                    StaticWarning(binding.token, f"Unused local variable '{name}'.")
+                )
+        return len(scope)
+
+    def _declare(self, name: Token, reported: bool = False) -> int:
+        if not self.scopes:
+            self.global_names.add(name.lexeme)
+            return GLOBAL
+        scope = self.scopes[-1]
+        if name.lexeme in scope:
+            self._error(name, "Already a variable with this name in this scope.")
+            return scope[name.lexeme].slot
+        slot = len(scope)
+        scope[name.lexeme] = Binding(slot, name, reported=reported)
+        return slot
+
+    def _define(self, name: Token) -> None:
+        if self.scopes:
+            self.scopes[-1][name.lexeme].defined = True
+
+    def _resolve_local(self, name: Token) -> tuple[int, int]:
+        for depth, scope in enumerate(reversed(self.scopes)):
+            binding = scope.get(name.lexeme)
+            if binding is not None:
+                return depth, binding.slot
+        self.global_references.append(name)
+        return GLOBAL, -1
+
+    def _statements(self, statements: list[Stmt]) -> None:
+        for statement in statements:
+            self._statement(statement)
+
+    def _statement(self, statement: Stmt) -> None:
+        if isinstance(statement, Expression):
+            self._expression(statement.expression)
+        elif isinstance(statement, Print):
+            self._expression(statement.expression)
+        elif isinstance(statement, Var):
+            statement.slot = self._declare(statement.name, reported=True)
+            if statement.initializer is not None:
+                self._expression(statement.initializer)
+            self._define(statement.name)
+        elif isinstance(statement, Block):
+            if not any(isinstance(s, DECLARATIONS) for s in statement.statements):
+                # Nothing is declared, so the backends create no scope either
+                statement.slot_count = 0
+                self._statements(statement.statements)
+                return
+            self._begin_scope()
+            self._statements(statement.statements)
+            statement.slot_count = self._end_scope()
+        elif isinstance(statement, If):
+            self._expression(statement.condition)
+            self._statement(statement.then_branch)
+            if statement.else_branch is not None:
+                self._statement(statement.else_branch)
+        elif isinstance(statement, While):
+            self._expression(statement.condition)
+            self._statement(statement.body)
+        elif isinstance(statement, Function):
+            statement.slot = self._declare(statement.name)
+            self._define(statement.name)
+            self._function(statement, FunctionType.FUNCTION)
+        elif isinstance(statement, Return):
+            self._return(statement)
+        elif isinstance(statement, Class):
+            self._class(statement)
+
+    def _function(self, function: Function, function_type: FunctionType) -> None:
+        enclosing = self.function_type
+        self.function_type = function_type
+        self._begin_scope()
+        for param in function.params:
+            self._declare(param)
+            self._define(param)
+        self._statements(function.body)
+        function.slot_count = self._end_scope()
+        self.function_type = enclosing
+
+    def _return(self, statement: Return) -> None:
+        if self.function_type == FunctionType.NONE:
+            self._error(statement.keyword, "Can't return from top-level code.")
+        if statement.value is None:
+            return
+        if self.function_type == FunctionType.INITIALIZER:
+            self._error(
+                statement.keyword, "Can't return a value from an initializer."
+            )
+        self._expression(statement.value)
+
+    def _class(self, statement: Class) -> None:
+        enclosing = self.class_type
+        self.class_type = ClassType.CLASS
+        statement.slot = self._declare(statement.name)
+        self._define(statement.name)
+
+        superclass = statement.superclass
+        if superclass is not None:
+            if superclass.name.lexeme == statement.name.lexeme:
+                self._error(superclass.name, "A class can't inherit from itself.")
+            self.class_type = ClassType.SUBCLASS
+            self._expression(superclass)
+            # Methods of a subclass close over a scope holding "super"
+            self._begin_scope()
+            self.scopes[-1]["super"] = Binding(0, statement.name, defined=True)
+
+        self._begin_scope()
+        self.scopes[-1]["this"] = Binding(0, statement.name, defined=True)
+        for method in statement.methods:
+            if method.name.lexeme == "init":
+                function_type = FunctionType.INITIALIZER
+            else:
+                function_type = FunctionType.METHOD
+            self._function(method, function_type)
+        self.scopes.pop()
+
+        if superclass is not None:
+            self.scopes.pop()
+        self.class_type = enclosing
+
+    def _expression(self, expression: Expr) -> None:
+        if isinstance(expression, Variable):
+            name = expression.name
+            if self.scopes:
+                binding = self.scopes[-1].get(name.lexeme)
+                if binding is not None and not binding.defined:
+                    self._error(
+                        name, "Can't read local variable in its own initializer."
+                    )
+            expression.depth, expression.slot = self._resolve_local(name)
+            self._mark_used(expression.depth, name)
+        elif isinstance(expression, Assign):
+            self._expression(expression.value)
+            expression.depth, expression.slot = self._resolve_local(expression.name)
+        elif isinstance(expression, (Binary, Logical)):
+            self._expression(expression.left)
+            self._expression(expression.right)
+        elif isinstance(expression, Unary):
+            self._expression(expression.right)
+        elif isinstance(expression, Grouping):
+            self._expression(expression.expression)
+        elif isinstance(expression, Call):
+            self._expression(expression.callee)
+            for argument in expression.arguments:
+                self._expression(argument)
+        elif isinstance(expression, Get):
+            self._expression(expression.object)
+        elif isinstance(expression, Set):
+            self._expression(expression.value)
+            self._expression(expression.object)
+        elif isinstance(expression, This):
+            if self.class_type == ClassType.NONE:
+                self._error(expression.keyword, "Can't use 'this' outside of a class.")
+                return
+            expression.depth, expression.slot = self._resolve_local(
+                expression.keyword
+            )
+        elif isinstance(expression, Super):
+            if self.class_type == ClassType.NONE:
+                self._error(
+                    expression.keyword, "Can't use 'super' outside of a class."
+                )
+                return
+            if self.class_type != ClassType.SUBCLASS:
+                self._error(
+                    expression.keyword,
+                    "Can't use 'super' in a class with no superclass.",
+                )
+                return
+            expression.depth, expression.slot = self._resolve_local(
+                expression.keyword
+            )
+
+    def _mark_used(self, depth: int, name: Token) -> None:
+        if depth != GLOBAL:
+            self.scopes[-1 - depth][name.lexeme].used = True
@@ -0,0 +1,148 @@
+import math
+import time
+from typing import Any, Callable, Optional
+
+from app.errors import LoxRuntimeError
+from app.syntax import Class, Get, Set, Super, This
+from app.tokenization import Token, TokenType
+
+
+class Environment:
+    __slots__ = ("values", "enclosing")
+
+    def __init__(self, enclosing: Optional["Environment"] = None):
+        self.values: dict[str, Any] = {}
+        self.enclosing = enclosing
+
+    def define(self, name: str, value: Any) -> None:
+        self.values[name] = value
+
+    def ancestor(self, depth: int) -> "Environment":
+        environment = self
+        for _ in range(depth):
+            environment = environment.enclosing  # type: ignore[assignment]
+        return environment
+
+    def get(self, name: Token) -> Any:
+        environment: Optional[Environment] = self
+        while environment is not None:
+            values = environment.values
+            if name.lexeme in values:
+                return values[name.lexeme]
+            environment = environment.enclosing
+        raise LoxRuntimeError(name, f"Undefined variable '{name.lexeme}'.")
+
+    def assign(self, name: Token, value: Any) -> None:
+        environment: Optional[Environment] = self
+        while environment is not None:
+            values = environment.values
+            if name.lexeme in values:
+                values[name.lexeme] = value
+                return
+            environment = environment.enclosing
+        raise LoxRuntimeError(name, f"Undefined variable '{name.lexeme}'.")
+
+
+class Scope:
+    """
+    Local scope of a resolved program: a fixed list of slots, indexed with
+    the slot numbers assigned by Resolver.
+    """
+
+    __slots__ = ("values", "enclosing")
+
+    def __init__(self, values: list[Any], enclosing: Optional["Scope"]):
+        self.values = values
+        self.enclosing = enclosing
+
+
+class LoxCallable:
+    """Anything a Lox call expression can invoke."""
+
+    __slots__ = ()
+
+    def arity(self) -> int:
+        raise NotImplementedError
+
+    def call(self, arguments: list[Any]) -> Any:
+        raise NotImplementedError
+
+
+class NativeFunction(LoxCallable):
+    __slots__ = ("name", "function", "parameter_count")
+
+    def __init__(self, name: str, parameter_count: int, function: Callable[..., Any]):
+        self.name = name
+        self.parameter_count = parameter_count
+        self.function = function
+
+    def arity(self) -> int:
+        return self.parameter_count
+
+    def call(self, arguments: list[Any]) -> Any:
+        return self.function(*arguments)
+
+    def __str__(self) -> str:
+        return "<native fn>"
+
+
+NATIVE_FUNCTIONS: dict[str, NativeFunction] = {
+    "clock": NativeFunction("clock", 0, lambda: float(time.time())),
+}
+
+
+def is_truthy(value: Any) -> bool:
+    return value is not None and value is not False
+
+
+def is_equal(left: Any, right: Any) -> bool:
+    # Python would consider 1.0 == true, Lox values of different types differ
+    return left.__class__ is right.__class__ and left == right
+
+
+def divide(left: float, right: float) -> float:
+    """IEEE 754 division, Lox numbers are doubles and never raise on zero."""
+    try:
+        return left / right
+    except ZeroDivisionError:
+        if left == 0 or math.isnan(left):
+            return math.nan
+        return math.copysign(math.inf, left) * math.copysign(1.0, right)
+
+
+def stringify(value: Any) -> str:
+    if value is None:
+        return "nil"
+    if value is True:
+        return "true"
+    if value is False:
+        return "false"
+    if value.__class__ is float:
+        if value.is_integer():
+            text = repr(value)
+            return text[:-2] if text.endswith(".0") else str(int(value))
+        if math.isinf(value):
+            return "Infinity" if value > 0 else "-Infinity"
+        if math.isnan(value):
+            return "NaN"
+        return repr(value)
+    return str(value)
+
+
+def check_arity(callee: LoxCallable, arguments: list[Any], paren: Token) -> None:
+    if len(arguments) != callee.arity():
+        raise LoxRuntimeError(
+            paren,
+            f"Expected {callee.arity()} arguments but got {len(arguments)}.",
+        )
+
+
+def unsupported(node: Any) -> LoxRuntimeError:
+    """Error for syntax a backend cannot execute yet."""
+    if isinstance(node, (Class, Get, Set)):
+        token = node.name
+    elif isinstance(node, (Super, This)):
+        token = node.keyword
+    else:
+        token = Token(TokenType.EOF, "", None, 0)
+    return LoxRuntimeError(token, f"{type(node).__name__} is not supported yet.")
@@ -1,40 +1,368 @@
-from decimal import Decimal
-from typing import Optional
+import re
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from enum import Enum
+from typing import Callable, Iterable, Iterator, Optional
 
-from app.errors import TokenError, UnterminatedStringError, InterpretationError
+from app.buffer import TokenBuffer
+from app.lines import LINE_BREAK_PATTERN, LINE_BREAKS, LineIndex
+from app.symbols import SymbolTable
+from app.errors import (
+    ErrorLog,
+    TokenError,
+    UnterminatedStringError,
+    InterpretationError,
+)
 from app.tokenization import (
+    NumericMode,
     Token,
     TOKEN_MAPPING,
     TokenType,
     COMMENT,
-    SPACE,
-    TAB,
     QUOTE,
-    BORDER_CHARS,
     WHITESPACE_CHARS,
     RESERVED_WORDS,
+    DIGITS,
+    IDENTIFIER_START,
+    IDENTIFIER_CHARS,
+)
+
+
+class ScanEngine(Enum):
+    # Character by character state machine
+    CLASSIC = "classic"
+    # Single master regular expression consuming whole lexemes
+    REGEX = "regex"
+
+
+# Leading whitespace is consumed together with the lexeme that follows it and
+# every alternative is a group, ordered by how often it shows up in real code
+TOKEN_PATTERN = re.compile(
+    r"""
+    [ \t]*
+    (?:
+        ([A-Za-z_][A-Za-z0-9_]*)    # identifier or reserved word
+        |(//.*)                     # comment
+        |([!=<>]=?|[(){},.\-+;/*])  # one or two character token
+        |([0-9]+(?:\.[0-9]+)?)      # number
+        |("[^"]*")                  # string
+        |(".*)                      # unterminated string
+        |([^ \t])                   # unexpected character
+    )
+    """,
+    re.VERBOSE | re.DOTALL,
 )
+_WORD, _COMMENT, _OPERATOR, _NUMBER, _STRING, _UNTERMINATED, _UNEXPECTED = range(1, 8)
+# Characters that are unexpected wherever they are, skipped in one go once
+# the error log is full
+UNEXPECTED_RUN = re.compile(r'[^A-Za-z0-9_ \t/!=<>(){},.\-+;*"]+')
+
+# Sources are split into this many chunks per worker, so a slow chunk does
+# not leave the other workers idle, but chunks stay at least this long
+CHUNKS_PER_JOB = 4
+MIN_CHUNK_SIZE = 1 << 20
+
+
+def iter_lines(chunks: Iterable[str], keepends: bool = False) -> Iterator[str]:
+    """
+    Split an iterable of text chunks into lines exactly like ``str.splitlines``
+    would split their concatenation, without ever joining the whole input.
+    """
+    pending: list[str] = []
+    for chunk in chunks:
+        if not chunk:
+            continue
+        last_char = chunk[-1]
+        if not any(char in chunk for char in LINE_BREAKS):
+            pending.append(chunk)
+            continue
+
+        pending.append(chunk)
+        lines = "".join(pending).splitlines(keepends)
+        pending.clear()
+        if last_char == "\r":
+            # "\r" may be the first half of a "\r\n" split across chunks
+            line = lines.pop()
+            pending.append(line if keepends else line + last_char)
+        elif last_char not in LINE_BREAKS:
+            pending.append(lines.pop())
+        yield from lines
+
+    if pending:
+        yield from "".join(pending).splitlines(keepends)
+
+
+def split_lines(source: str, count: int) -> list[tuple[int, int]]:
+    """
+    Offsets of up to count chunks of about the same size covering source.
+    Every chunk but the last ends right after a line break.
+    """
+    bounds = []
+    start = 0
+    for index in range(1, count):
+        # Start a character early so a "\r\n" is never cut in two
+        target = max(len(source) * index // count - 1, start)
+        line_break = LINE_BREAK_PATTERN.search(source, target)
+        if line_break is None:
+            break
+        if line_break.end() > start:
+            bounds.append((start, line_break.end()))
+            start = line_break.end()
+    bounds.append((start, len(source)))
+    return bounds
+
+
+def count_line_breaks(text: str) -> int:
+    """Number of lines ended by a break, the way ``str.splitlines`` splits."""
+    return sum(map(text.count, LINE_BREAKS)) - text.count("\r\n")
+
+
+@dataclass(slots=True)
+class _ScannedChunk:
+    # TokenBuffer columns without the EOF token, offsets and lines absolute
+    types: array
+    starts: array
+    lengths: array
+    lines: array
+    # Ids in the chunk's own symbol table, names
+    symbol_ids: array
+    names: list[str]
+    errors: ErrorLog
+    line_count: int
+    # Absolute offsets of the chunk's lines
+    line_starts: array
+
+
+def _scan_chunk(
+    chunk: str,
+    offset: int,
+    line_base: int,
+    numeric: NumericMode,
+    typecode: str,
+    error_limit: Optional[int] = None,
+) -> _ScannedChunk:
+    """
+    Scan a chunk of whole lines in a worker, starting at the given offset
+    and after line_base lines of the source. Symbol ids stay local to the
+    chunk, only the parent knows which symbols came before. Columns sized
+    by the source take its typecode, the chunk's may be narrower.
+    """
+    scanner = Scanner(chunk, numeric=numeric, error_limit=error_limit)
+    buffer, errors = scanner.scan_buffer()
+    line_count = buffer.lines.pop()
+    for column in (buffer.types, buffer.starts, buffer.lengths, buffer.symbol_ids):
+        column.pop()
+    for error in errors:
+        error.line_idx += line_base  # type: ignore[attr-defined]
+        error.offset += offset  # type: ignore[operator]
+    for lines in errors.dropped.values():
+        lines[1] += line_base
+        lines[2] += line_base
+    return _ScannedChunk(
+        buffer.types,
+        array(typecode, map(offset.__add__, buffer.starts)),
+        array(typecode, buffer.lengths),
+        array(typecode, map(line_base.__add__, buffer.lines)),
+        buffer.symbol_ids,
+        scanner.symbols.names,
+        errors,
+        line_count,
+        array("Q", map(offset.__add__, buffer.line_index.starts)),
+    )
 
 
 class Scanner:
-    def __init__(self, source: str):
+    def __init__(
+        self,
+        source: str = "",
+        engine: ScanEngine = ScanEngine.CLASSIC,
+        numeric: NumericMode = NumericMode.DECIMAL,
+        error_limit: Optional[int] = None,
+    ):
+        self.source = source
         self.source_lines: list[str] = source.splitlines()
+        self.engine = engine
+        # Number literals are only converted when Token.literal is read
+        self.numeric = numeric
         self.position_start: int = 0
+        # Offset of the line being scanned, None when not known
+        self.line_start: Optional[int] = 0
         self.tokens: list[Token] = []
-        self.errors: list[InterpretationError] = []
+        # Errors past the limit are only counted, see ErrorLog
+        self.error_limit = error_limit
+        self.errors = ErrorLog(error_limit)
         self.quote_start: Optional[int] = None
         self.digits: str = ""
         self.identifier: str = ""
+        self.symbols = SymbolTable()
 
     def scan_tokens(self) -> tuple[list[Token], list[InterpretationError]]:
+        scan_line = self._line_scanner()
+        starts = LineIndex.build(self.source).starts
         for line_idx, line in enumerate(self.source_lines):
             self.position_start = 0
             self.quote_start = None
-            self._scan_line(line_idx, line)
+            self.line_start = starts[line_idx]
+            scan_line(line_idx, line)
 
-        self.tokens.append(Token(TokenType.EOF, "", None, len(self.source_lines)))
+        self.tokens.append(
+            Token(
+                TokenType.EOF,
+                "",
+                None,
+                len(self.source_lines),
+                offset=len(self.source),
+            )
+        )
         return self.tokens, self.errors
 
+    def scan_line(
+        self, line_idx: int, line: str, line_start: Optional[int] = None
+    ) -> tuple[list[Token], list[InterpretationError]]:
+        """
+        Tokens and errors of a single line. No token spans lines, so callers
+        can rescan any line on its own and get what a full scan would. Offsets
+        are only set when the offset of the line is given.
+        """
+        self.position_start = 0
+        self.quote_start = None
+        self.line_start = line_start
+        self.tokens = []
+        self.errors = ErrorLog(self.error_limit)
+        self._line_scanner()(line_idx, line)
+        return self.tokens, self.errors
+
+    def scan_buffer(self) -> tuple[TokenBuffer, list[InterpretationError]]:
+        """
+        Scan the source into a compact ``TokenBuffer`` of offsets into it,
+        indexing where its lines start on the way.
+
+        The buffer is always filled by the regex engine, the only one that
+        knows where each lexeme starts; both engines produce the same tokens.
+        """
+        buffer = TokenBuffer(self.source, self.symbols, self.numeric)
+        line_starts = array("Q", [0])
+        line_number = 0
+        line_start = 0
+        for line_break in LINE_BREAK_PATTERN.finditer(self.source):
+            line_number += 1
+            self._match_spans(buffer, line_start, line_break.start(), line_number)
+            line_start = line_break.end()
+            line_starts.append(line_start)
+
+        if line_start < len(self.source):
+            line_number += 1
+            self._match_spans(buffer, line_start, len(self.source), line_number)
+        elif line_number:
+            # The source ends with a break, which starts no line
+            line_starts.pop()
+
+        buffer.append(TokenType.EOF, len(self.source), 0, line_number)
+        buffer.line_index = LineIndex(line_starts)
+        return buffer, self.errors
+
+    def scan_parallel(
+        self, jobs: int
+    ) -> tuple[TokenBuffer, list[InterpretationError]]:
+        """
+        Same as ``scan_buffer``, with chunks of lines scanned by a pool of
+        jobs processes. No token spans lines, so chunks split at line breaks
+        scan on their own once told how many lines came before them; merging
+        them in order interns their symbols in the order a single scan would.
+        """
+        count = min(jobs * CHUNKS_PER_JOB, len(self.source) // MIN_CHUNK_SIZE)
+        if jobs < 2 or count < 2:
+            return self.scan_buffer()
+
+        bounds = split_lines(self.source, count)
+        chunks = [self.source[start:end] for start, end in bounds]
+        line_bases = []
+        line_base = 0
+        for chunk in chunks:
+            line_bases.append(line_base)
+            line_base += count_line_breaks(chunk)
+
+        buffer = TokenBuffer(self.source, self.symbols, self.numeric)
+        line_starts = array("Q")
+        intern = self.symbols.intern
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            results = executor.map(
+                _scan_chunk,
+                chunks,
+                [start for start, _ in bounds],
+                line_bases,
+                [self.numeric] * len(chunks),
+                [buffer.starts.typecode] * len(chunks),
+                [self.error_limit] * len(chunks),
+            )
+            for scanned in results:
+                # Chunk symbol id -> id in this table, -1 stays -1
+                symbols = [intern(name) for name in scanned.names]
+                symbols.append(-1)
+                buffer.types.extend(scanned.types)
+                buffer.starts.extend(scanned.starts)
+                buffer.lengths.extend(scanned.lengths)
+                buffer.lines.extend(scanned.lines)
+                buffer.symbol_ids.extend(map(symbols.__getitem__, scanned.symbol_ids))
+                self.errors.extend(scanned.errors)
+                line_starts.extend(scanned.line_starts)
+
+        # An empty last chunk starts at the final break, which starts no line
+        if len(line_starts) > 1 and line_starts[-1] == len(self.source):
+            line_starts.pop()
+        # Only the last chunk may end with a line without a break
+        line_base = line_bases[-1] + scanned.line_count
+        buffer.append(TokenType.EOF, len(self.source), 0, line_base)
+        buffer.line_index = LineIndex(line_starts)
+        return buffer, self.errors
+
+    def iter_tokens(
+        self,
+        chunks: Iterable[str],
+        on_error: Optional[Callable[[InterpretationError], None]] = None,
+        intern: bool = False,
+    ) -> Iterator[Token]:
+        """
+        Lazily scan a file object or any iterable of text chunks.
+
+        Tokens are yielded line by line and never accumulated, so memory stays
+        bounded by the longest line. Errors are passed to ``on_error`` as soon
+        as the line containing them is scanned; without a callback they are
+        collected in ``self.errors`` like ``scan_tokens`` does. Names are only
+        kept in ``self.symbols`` with ``intern``, otherwise tokens carry no
+        symbol ids.
+        """
+        scan_line = self._line_scanner()
+        line_count = 0
+        line_start = 0
+        for line_idx, line in enumerate(iter_lines(chunks, keepends=True)):
+            self.position_start = 0
+            self.quote_start = None
+            self.line_start = line_start
+            # A line ends with at most one break, "\r\n" included
+            scan_line(line_idx, line.rstrip(LINE_BREAKS))
+            line_count = line_idx + 1
+            line_start += len(line)
+            if not intern and self.symbols:
+                self.symbols = SymbolTable()
+                for token in self.tokens:
+                    token.symbol = None
+
+            yield from self.tokens
+            self.tokens.clear()
+            if on_error is not None and self.errors:
+                for error in self.errors:
+                    on_error(error)
+                self.errors.clear()
+
+        yield Token(TokenType.EOF, "", None, line_count, offset=line_start)
+
+    def _line_scanner(self) -> Callable[[int, str], None]:
+        if self.engine is ScanEngine.REGEX:
+            return self._match_line
+        return self._scan_line
+
     def _scan_line(self, line_idx: int, line: str):
         while self.position_start < len(line):
             character = line[self.position_start]
@@ -50,10 +378,6 @@ class Scanner:
                 continue
 
             if self._extract_identifier(character, line_idx, line):
-                if self.digits:
-                    # If there is no gap between the number and the identifier
-                    # we just add a number token, so we don't need to process it later
-                    self._add_number(line_idx)
                 continue
 
             if self._extract_number(character, line_idx, line):
@@ -64,6 +388,124 @@ class Scanner:
 
             self.position_start += 1
 
+    def _match_line(self, line_idx: int, line: str):
+        line_number = line_idx + 1
+        append = self.tokens.append
+        intern = self.symbols.intern
+        names = self.symbols.names
+        numeric = self.numeric
+        errors = self.errors
+        line_start = self.line_start
+        # Only blanks come between two lexemes, so the next one is found
+        # right after the previous one
+        find = line.find
+        position = 0
+        offset = None
+        dropped = 0
+        for word, comment, operator, number, string, unterminated, unexpected in (
+            TOKEN_PATTERN.findall(line)
+        ):
+            if line_start is not None:
+                lexeme = word or operator or number or string or unterminated
+                position = find(lexeme or unexpected or comment, position)
+                offset = line_start + position
+                position += len(lexeme)
+            if word:
+                token_type = RESERVED_WORDS.get(word)
+                if token_type is None:
+                    symbol = intern(word)
+                    append(
+                        Token(
+                            TokenType.IDENTIFIER,
+                            names[symbol],
+                            None,
+                            line_number,
+                            symbol,
+                            offset=offset,
+                        )
+                    )
+                else:
+                    append(Token(token_type, word, None, line_number, offset=offset))
+            elif operator:
+                append(
+                    Token(
+                        TOKEN_MAPPING[operator], operator, None, line_number, offset=offset
+                    )
+                )
+            elif number:
+                append(Token.number(number, line_number, numeric, offset))
+            elif string:
+                symbol = intern(string[1:-1])
+                append(
+                    Token(
+                        TokenType.STRING,
+                        string,
+                        names[symbol],
+                        line_number,
+                        symbol,
+                        offset=offset,
+                    )
+                )
+            elif unterminated:
+                errors.append(UnterminatedStringError(line_number, offset))
+            elif unexpected:
+                if errors.full:
+                    dropped += 1
+                else:
+                    errors.append(TokenError(unexpected, line_number, offset))
+                position += 1
+        if dropped:
+            errors.drop(TokenError, dropped, line_number)
+
+    def _match_spans(
+        self, buffer: TokenBuffer, start: int, end: int, line_number: int
+    ) -> None:
+        source = self.source
+        errors = self.errors
+        matches = TOKEN_PATTERN.finditer(source, start, end)
+        for match in matches:
+            kind = match.lastindex
+            lexeme_start, lexeme_end = match.span(kind)
+            symbol = -1
+            if kind == _WORD:
+                word = source[lexeme_start:lexeme_end]
+                token_type = RESERVED_WORDS.get(word, TokenType.IDENTIFIER)
+                if token_type == TokenType.IDENTIFIER:
+                    symbol = self.symbols.intern(word)
+            elif kind == _OPERATOR:
+                token_type = TOKEN_MAPPING[source[lexeme_start:lexeme_end]]
+            elif kind == _NUMBER:
+                token_type = TokenType.NUMBER
+            elif kind == _STRING:
+                token_type = TokenType.STRING
+                symbol = self.symbols.intern(source[lexeme_start + 1 : lexeme_end - 1])
+            elif kind == _UNTERMINATED:
+                errors.append(UnterminatedStringError(line_number, lexeme_start))
+                continue
+            elif kind == _UNEXPECTED:
+                if not errors.full:
+                    errors.append(
+                        TokenError(source[lexeme_start], line_number, lexeme_start)
+                    )
+                    continue
+                # Past the limit a whole run is only counted, then matching
+                # resumes after it
+                run_end = UNEXPECTED_RUN.match(source, lexeme_start, end).end()
+                errors.drop(TokenError, run_end - lexeme_start, line_number)
+                self._match_spans(buffer, run_end, end, line_number)
+                return
+            else:
+                continue
+            buffer.append(
+                token_type, lexeme_start, lexeme_end - lexeme_start, line_number, symbol
+            )
+
+    def _flush_pending(self, line_idx: int) -> None:
+        if self.digits:
+            self._add_number(line_idx)
+        if self.identifier:
+            self._add_identifier(line_idx)
+
     def _is_last_character(self, line: str) -> bool:
         return self.position_start == len(line) - 1
 
@@ -72,47 +514,46 @@ class Scanner:
             if self._is_last_character_digital(character, line_idx, line):
                 return True
 
-            if self._is_digit_in_middle(character):
+            if self._is_digit_in_middle(character, line):
                 return True
 
-            if self._is_number_border_character(character, line_idx, line):
+            if self._is_number_border_character(character, line_idx):
                 return True
         return False
 
     def _is_last_character_digital(
         self, character: str, line_idx: int, line: str
     ) -> bool:
-        if (character.isdigit() and self._is_last_character(line)) or (
-            self.digits
-            and (character.isdigit() or character == ".")
-            and self._is_last_character(line)
-        ):
+        if character in DIGITS and self._is_last_character(line):
             # the last or the only digit character in the line
             self.digits += character
-            self._add_number(line_idx)
             self.position_start += 1
+            self._add_number(line_idx)
             return True
         return False
 
     def _is_last_character_identifierable(
         self, character: str, line_idx: int, line: str
     ) -> bool:
-        if (
-            (character.isalpha() or character == "_") and self._is_last_character(line)
-        ) or (
+        if (character in IDENTIFIER_START and self._is_last_character(line)) or (
             self.identifier
-            and (character.isalnum() or character == "_")
+            and character in IDENTIFIER_CHARS
             and self._is_last_character(line)
         ):
             self.identifier += character
-            self._add_identifier(line_idx)
             self.position_start += 1
+            self._add_identifier(line_idx)
             return True
         return False
 
-    def _is_digit_in_middle(self, character: str) -> bool:
-        if character.isdigit() or (
-            self.digits and (character.isdigit() or character == ".")
+    def _is_digit_in_middle(self, character: str, line: str) -> bool:
+        # A dot belongs to the number only once and only when a digit follows it
+        if character in DIGITS or (
+            self.digits
+            and character == "."
+            and "." not in self.digits
+            and not self._is_last_character(line)
+            and line[self.position_start + 1] in DIGITS
         ):
             self.digits += character
             self.position_start += 1
@@ -120,38 +561,26 @@ class Scanner:
         return False
 
     def _is_identifier_in_middle(self, character: str) -> bool:
-        if (
-            character.isalpha()
-            or character == "_"
-            or (self.identifier and character.isalnum())
+        if character in IDENTIFIER_START or (
+            self.identifier and character in IDENTIFIER_CHARS
         ):
             self.identifier += character
             self.position_start += 1
             return True
         return False
 
-    def _is_number_border_character(
-        self, character: str, line_idx: int, line: str
-    ) -> bool:
-        if self.digits and (
-            character in BORDER_CHARS + WHITESPACE_CHARS
-            or self._is_last_character(line)
-            or character.isalpha()
-            or character == "_"
-        ):
+    def _is_number_border_character(self, character: str, line_idx: int) -> bool:
+        # Any character that cannot continue the number terminates it
+        if self.digits:
             self._add_number(line_idx)
             if character in WHITESPACE_CHARS:
                 self.position_start += 1
             return True
         return False
 
-    def _is_identifier_border_character(
-        self, character: str, line_idx: int, line: str
-    ) -> bool:
-        if self.identifier and (
-            character in BORDER_CHARS + WHITESPACE_CHARS
-            or self._is_last_character(line)
-        ):
+    def _is_identifier_border_character(self, character: str, line_idx: int) -> bool:
+        # Any character that cannot continue the identifier terminates it
+        if self.identifier:
             self._add_identifier(line_idx)
             if character in WHITESPACE_CHARS:
                 self.position_start += 1
@@ -160,13 +589,18 @@ class Scanner:
 
     def _extract_identifier(self, character: str, line_idx: int, line: str) -> bool:
         if self.quote_start is None:
+            if self.digits and character in IDENTIFIER_START:
+                # If there is no gap between the number and the identifier
+                # the number ends here
+                self._add_number(line_idx)
+
             if self._is_last_character_identifierable(character, line_idx, line):
                 return True
 
             if self._is_identifier_in_middle(character):
                 return True
 
-            if self._is_identifier_border_character(character, line_idx, line):
+            if self._is_identifier_border_character(character, line_idx):
                 return True
         return False
 
@@ -178,11 +612,19 @@ class Scanner:
             two_chars = character + line[self.position_start + 1]
             if two_chars == COMMENT:
                 # If we see the comment we ignore the whole remaining line
+                self._flush_pending(line_idx)
                 return None
 
             if two_chars in TOKEN_MAPPING:
+                self._flush_pending(line_idx)
                 self.tokens.append(
-                    Token(TOKEN_MAPPING[two_chars], two_chars, None, line_idx + 1)
+                    Token(
+                        TOKEN_MAPPING[two_chars],
+                        two_chars,
+                        None,
+                        line_idx + 1,
+                        offset=self._offset(self.position_start),
+                    )
                 )
                 self.position_start += 2
                 return True
@@ -194,40 +636,72 @@ class Scanner:
         # Handle single-character tokens
         if self.quote_start is None and character == QUOTE:
             self.quote_start = self.position_start
+            if self._is_last_character(line):
+                self.errors.append(
+                    UnterminatedStringError(
+                        line_idx + 1, self._offset(self.quote_start)
+                    )
+                )
         elif self.quote_start is None:
             if character in TOKEN_MAPPING:
                 self.tokens.append(
-                    Token(TOKEN_MAPPING[character], character, None, line_idx + 1)
+                    Token(
+                        TOKEN_MAPPING[character],
+                        character,
+                        None,
+                        line_idx + 1,
+                        offset=self._offset(self.position_start),
+                    )
                 )
-            elif character in [SPACE, TAB]:
+            elif character in WHITESPACE_CHARS:
                 pass  # Ignore whitespace characters
+            elif self.errors.full:
+                self.errors.drop(TokenError, 1, line_idx + 1)
             else:
-                self.errors.append(TokenError(character, line_idx + 1))
+                self.errors.append(
+                    TokenError(
+                        character, line_idx + 1, self._offset(self.position_start)
+                    )
+                )
         # Extracting a string here
         elif self.quote_start is not None and character == QUOTE:
             lexeme = line[self.quote_start : self.position_start + 1]
-            literal = lexeme[1:-1]
-            self.tokens.append(Token(TokenType.STRING, lexeme, literal, line_idx + 1))
+            symbol = self.symbols.intern(lexeme[1:-1])
+            self.tokens.append(
+                Token(
+                    TokenType.STRING,
+                    lexeme,
+                    self.symbols.names[symbol],
+                    line_idx + 1,
+                    symbol,
+                    offset=self._offset(self.quote_start),
+                )
+            )
             self.quote_start = None
         elif (
             self.quote_start is not None
             and self._is_last_character(line)
             and character != QUOTE
         ):
-            self.errors.append(UnterminatedStringError(line_idx + 1))
+            self.errors.append(
+                UnterminatedStringError(line_idx + 1, self._offset(self.quote_start))
+            )
+
+    def _offset(self, position: int) -> Optional[int]:
+        if self.line_start is None:
+            return None
+        return self.line_start + position
 
     def _add_number(self, line_idx: int) -> None:
+        # Numbers and identifiers are added once the position is past them
+        offset = self._offset(self.position_start - len(self.digits))
         self.tokens.append(
-            Token(
-                TokenType.NUMBER,
-                self.digits,
-                Decimal(str(float(self.digits))),
-                line_idx + 1,
-            )
+            Token.number(self.digits, line_idx + 1, self.numeric, offset)
         )
         self.digits = ""
 
     def _add_identifier(self, line_idx: int) -> None:
+        offset = self._offset(self.position_start - len(self.identifier))
         if self.identifier in RESERVED_WORDS:
             self.tokens.append(
                 Token(
@@ -235,15 +709,20 @@ class Scanner:
                     self.identifier,
                     None,
                     line_idx + 1,
+                    offset=offset,
                 )
             )
         else:
+            symbol = self.symbols.intern(self.identifier)
             self.tokens.append(
                 Token(
                     TokenType.IDENTIFIER,
-                    self.identifier,
+                    self.symbols.names[symbol],
                     None,
                     line_idx + 1,
+                    symbol,
+                    offset=offset,
                 )
             )
         self.identifier = ""
+
@@ -0,0 +1,161 @@
+import io
+import os
+import signal
+import socketserver
+import sys
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from contextlib import redirect_stderr, redirect_stdout
+from typing import Any, BinaryIO, Optional
+
+from app.cache import MemoryCache
+from app.main import run_arguments
+from app.protocol import (
+    OUTPUT_ENCODING,
+    OUTPUT_ERRORS,
+    receive_message,
+    send_message,
+)
+from app.streams import ENCODING
+
+# Parsed programs of the worker process, filled by its requests
+_memory: Optional[MemoryCache] = None
+
+
+def start_worker() -> None:
+    """Set up a pool process to handle requests."""
+    global _memory
+    # Ctrl-C reaches the whole process group, only the server shuts down
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    _memory = MemoryCache()
+
+
+def handle(request: dict[str, Any]) -> dict[str, Any]:
+    """
+    Run the command line of a request as the CLI would, in the request's
+    working directory, and capture its output and exit status.
+    """
+    if "cwd" in request:
+        os.chdir(request["cwd"])
+    # Binary output formats write to sys.stdout.buffer
+    output = io.BytesIO()
+    stdout = io.TextIOWrapper(output, encoding=ENCODING, write_through=True)
+    stderr = io.StringIO()
+    with redirect_stdout(stdout), redirect_stderr(stderr):
+        try:
+            status = run_arguments(request["arguments"], _memory)
+        except Exception as error:
+            print(f"Internal error: {error!r}", file=sys.stderr)
+            status = 70
+        stdout.flush()
+    response = {
+        "status": status,
+        "stdout": output.getvalue().decode(OUTPUT_ENCODING, OUTPUT_ERRORS),
+        "stderr": stderr.getvalue(),
+    }
+    if "id" in request:
+        response["id"] = request["id"]
+    return response
+
+
+def _failure(request: Any, error: BaseException) -> dict[str, Any]:
+    response = {"status": 1, "stdout": "", "stderr": f"Request failed: {error}\n"}
+    if isinstance(request, dict) and "id" in request:
+        response["id"] = request["id"]
+    return response
+
+
+def _submit(pool: ProcessPoolExecutor, request: Any) -> "Future[dict[str, Any]]":
+    if not isinstance(request, dict) or not isinstance(
+        request.get("arguments"), list
+    ):
+        future: Future[dict[str, Any]] = Future()
+        future.set_result(_failure(request, ValueError("Expected arguments")))
+        return future
+    return pool.submit(handle, request)
+
+
+def _result(request: Any, future: "Future[dict[str, Any]]") -> dict[str, Any]:
+    try:
+        return future.result()
+    except Exception as error:
+        # A worker died, the pool replaces it for later requests
+        return _failure(request, error)
+
+
+class _Connection(socketserver.StreamRequestHandler):
+    server: "Server"
+
+    def handle(self) -> None:
+        while True:
+            try:
+                request = receive_message(self.rfile)
+            except ValueError:
+                return
+            if request is None:
+                return
+            future = _submit(self.server.pool, request)
+            send_message(self.wfile, _result(request, future))
+
+
+class Server(socketserver.ThreadingUnixStreamServer):
+    """
+    Serves command lines over a Unix socket, a thread per connection and
+    the commands themselves in a pool of warm worker processes. Output is
+    captured per request, so the workers must be processes.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, address: str, jobs: int = 1):
+        self.pool = ProcessPoolExecutor(jobs, initializer=start_worker)
+        # Fork the workers now rather than on the first request
+        for future in [self.pool.submit(os.getpid) for _ in range(jobs)]:
+            future.result()
+        if os.path.exists(address):
+            os.remove(address)
+        super().__init__(address, _Connection)
+
+    def server_close(self) -> None:
+        super().server_close()
+        self.pool.shutdown(cancel_futures=True)
+        try:
+            os.remove(self.server_address)  # type: ignore[arg-type]
+        except OSError:
+            pass
+
+
+def serve_stream(reader: BinaryIO, writer: BinaryIO, jobs: int = 1) -> None:
+    """
+    Serve requests read from a stream, answering each as it completes.
+    Responses carry the id of their request, since they may come out of order.
+    """
+    lock = threading.Lock()
+
+    def respond(request: Any, future: "Future[dict[str, Any]]") -> None:
+        response = _result(request, future)
+        with lock:
+            send_message(writer, response)
+
+    with ProcessPoolExecutor(jobs, initializer=start_worker) as pool:
+        while (request := receive_message(reader)) is not None:
+            future = _submit(pool, request)
+            future.add_done_callback(
+                lambda future, request=request: respond(request, future)
+            )
+
+
+def serve(address: str, jobs: int = 1) -> None:
+    """Serve on a Unix socket until interrupted, or over stdin and stdout for -."""
+    if address == "-":
+        serve_stream(sys.stdin.buffer, sys.stdout.buffer, jobs)
+        return
+
+    with Server(address, jobs) as server:
+        # Terminating cleans up like an interrupt, removing the socket
+        signal.signal(signal.SIGTERM, signal.default_int_handler)
+        print(f"Serving on {address}", file=sys.stderr)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,168 @@
+import json
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+from typing import Any, Callable, ContextManager, Iterable, Iterator, TextIO
+
+from app.buffer import TOKEN_TYPES, TokenBuffer
+from app.errors import ErrorLog, InterpretationError
+from app.flat import FlatTree, NodeKind
+from app.objects import InlineCache, cache_statistics
+from app.syntax import Expr, Stmt
+from app.tokenization import Token
+
+# Called with the name and wall time in seconds of every phase that ends
+PhaseHook = Callable[[str, float], None]
+
+
+class Stats:
+    """
+    Measurements of a run: wall time per phase, tokens by type, errors by
+    class, syntax nodes by kind, inline cache hits by kind of site and the
+    peak of memory allocated while tracing. Phases of the same name add up.
+    """
+
+    enabled = True
+
+    def __init__(self, trace_memory: bool = True):
+        self.phases: dict[str, float] = {}
+        self.tokens: Counter[str] = Counter()
+        self.errors: Counter[str] = Counter()
+        self.nodes: Counter[str] = Counter()
+        self.inline_caches: dict[str, Counter[str]] = {}
+        self.hooks: list[PhaseHook] = []
+        self.trace_memory = trace_memory
+        self.peak_bytes = 0
+        # From start to stop, including what no phase covers
+        self.wall_seconds = 0.0
+        self._started = 0.0
+
+    def add_hook(self, hook: PhaseHook) -> None:
+        self.hooks.append(hook)
+
+    def start(self) -> None:
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        self._started = time.perf_counter()
+
+    def stop(self) -> None:
+        self.wall_seconds += time.perf_counter() - self._started
+        if self.trace_memory and tracemalloc.is_tracing():
+            _, peak = tracemalloc.get_traced_memory()
+            self.peak_bytes = max(self.peak_bytes, peak)
+            tracemalloc.stop()
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            self.phases[name] = self.phases.get(name, 0.0) + elapsed
+            for hook in self.hooks:
+                hook(name, elapsed)
+
+    def count_tokens(self, tokens: Iterable[Token]) -> None:
+        if isinstance(tokens, TokenBuffer):
+            for type_id, count in Counter(tokens.types).items():
+                self.tokens[TOKEN_TYPES[type_id].name] += count
+        else:
+            self.tokens.update(token.type.name for token in tokens)
+
+    def count_stream(self, tokens: Iterator[Token]) -> Iterator[Token]:
+        """Pass tokens through, counting them on the way."""
+        counts = self.tokens
+        for token in tokens:
+            counts[token.type.name] += 1
+            yield token
+
+    def count_errors(self, errors: Iterable[InterpretationError]) -> None:
+        """Count errors by class, those an error log dropped included."""
+        self.errors.update(type(error).__name__ for error in errors)
+        if isinstance(errors, ErrorLog):
+            for name, (count, _, _) in errors.dropped.items():
+                self.errors[name] += count
+
+    def count_nodes(self, syntax: Any) -> None:
+        """Count the nodes of a FlatTree, an expression or statements."""
+        if isinstance(syntax, FlatTree):
+            for kind, count in Counter(syntax.kinds).items():
+                self.nodes[NodeKind(kind).name] += count
+            return
+
+        counts = self.nodes
+        stack = list(syntax) if isinstance(syntax, list) else [syntax]
+        while stack:
+            node = stack.pop()
+            counts[type(node).__name__] += 1
+            for name in type(node).__slots__:
+                value = getattr(node, name)
+                if isinstance(value, (Expr, Stmt)):
+                    stack.append(value)
+                elif isinstance(value, list):
+                    stack.extend(v for v in value if isinstance(v, (Expr, Stmt)))
+
+    def count_inline_caches(self, caches: list[InlineCache]) -> None:
+        for kind, totals in cache_statistics(caches).items():
+            self.inline_caches.setdefault(kind, Counter()).update(totals)
+
+    def report(self) -> dict[str, Any]:
+        return {
+            "phases": self.phases,
+            "wall_seconds": self.wall_seconds,
+            "tokens": dict(self.tokens),
+            "token_count": self.tokens.total(),
+            "errors": dict(self.errors),
+            "nodes": dict(self.nodes),
+            "node_count": self.nodes.total(),
+            "inline_caches": {
+                kind: dict(totals) for kind, totals in self.inline_caches.items()
+            },
+            "peak_bytes": self.peak_bytes if self.trace_memory else None,
+        }
+
+    def write(self, stream: TextIO) -> None:
+        json.dump(self.report(), stream, indent=2)
+        stream.write("\n")
+
+
+class DisabledStats(Stats):
+    """Stats that record nothing, so instrumented code costs a method call."""
+
+    enabled = False
+
+    def __init__(self):
+        super().__init__(trace_memory=False)
+        self._phase = nullcontext()
+
+    def add_hook(self, hook: PhaseHook) -> None:
+        raise ValueError("Hooks need enabled stats")
+
+    def start(self) -> None:
+        pass
+
+    def stop(self) -> None:
+        pass
+
+    def phase(self, name: str) -> ContextManager[None]:  # type: ignore[override]
+        return self._phase
+
+    def count_tokens(self, tokens: Iterable[Token]) -> None:
+        pass
+
+    def count_stream(self, tokens: Iterator[Token]) -> Iterator[Token]:
+        return tokens
+
+    def count_errors(self, errors: Iterable[InterpretationError]) -> None:
+        pass
+
+    def count_nodes(self, syntax: Any) -> None:
+        pass
+
+    def count_inline_caches(self, caches: list[InlineCache]) -> None:
+        pass
+
+
+DISABLED = DisabledStats()
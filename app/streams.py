@@ -0,0 +1,101 @@
+import codecs
+import locale
+import mmap
+import os
+from itertools import batched
+from typing import IO, BinaryIO, Iterable, Iterator
+
+# What open() decodes text files with when no encoding is given
+ENCODING = locale.getpreferredencoding(False)
+# Files at least this large are memory mapped instead of read
+MMAP_THRESHOLD = 1 << 24
+READ_CHUNK_SIZE = 1 << 16
+# Pieces of output joined into a single write call
+WRITE_BATCH_SIZE = 1 << 12
+
+
+def _is_large(file: BinaryIO) -> bool:
+    # Empty files cannot be mapped
+    return os.fstat(file.fileno()).st_size >= max(MMAP_THRESHOLD, 1)
+
+
+def _byte_chunks(file: BinaryIO, chunk_size: int) -> Iterator[bytes]:
+    if not _is_large(file):
+        yield from iter(lambda: file.read(chunk_size), b"")
+        return
+
+    with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        if hasattr(mmap, "MADV_SEQUENTIAL"):
+            mapped.madvise(mmap.MADV_SEQUENTIAL)
+        for start in range(0, len(mapped), chunk_size):
+            yield mapped[start : start + chunk_size]
+
+
+def read_chunks(filename: str, chunk_size: int = READ_CHUNK_SIZE) -> Iterator[str]:
+    """
+    Text of a file in pieces of about chunk_size bytes. Large files are
+    memory mapped, and a character split between two pieces is decoded
+    with the next one.
+    """
+    decoder = codecs.getincrementaldecoder(ENCODING)()
+    with open(filename, "rb") as file:
+        for data in _byte_chunks(file, chunk_size):
+            text = decoder.decode(data)
+            if text:
+                yield text
+    text = decoder.decode(b"", final=True)
+    if text:
+        yield text
+
+
+def read_source(filename: str) -> str:
+    """Whole text of a file, decoded straight out of a memory map if large."""
+    with open(filename, "rb") as file:
+        if not _is_large(file):
+            return file.read().decode(ENCODING)
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            return str(mapped, ENCODING)
+
+
+def write_batched(
+    stream: IO[str], pieces: Iterable[str], batch_size: int = WRITE_BATCH_SIZE
+) -> None:
+    """Write pieces of text joined batch_size at a time."""
+    for batch in batched(pieces, batch_size):
+        stream.write("".join(batch))
+
+
+class LineWriter:
+    """
+    Collects lines for a text stream and writes them in large pieces, so
+    output costs a write call per few thousand lines instead of one each.
+    Used as a context manager, whatever is left is written on exit.
+    """
+
+    def __init__(self, stream: IO[str], batch_size: int = WRITE_BATCH_SIZE):
+        self.stream = stream
+        self.batch_size = batch_size
+        self.lines: list[str] = []
+
+    def write(self, line: str) -> None:
+        self.lines.append(line)
+        if len(self.lines) >= self.batch_size:
+            self.flush()
+
+    def writelines(self, lines: Iterable[str]) -> None:
+        self.flush()
+        for batch in batched(lines, self.batch_size):
+            self.stream.write("\n".join(batch))
+            self.stream.write("\n")
+
+    def flush(self) -> None:
+        if self.lines:
+            self.stream.write("\n".join(self.lines))
+            self.stream.write("\n")
+            self.lines.clear()
+
+    def __enter__(self) -> "LineWriter":
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.flush()
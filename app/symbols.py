@@ -0,0 +1,36 @@
+from typing import Iterator, Optional
+
+
+class SymbolTable:
+    """
+    Interns identifier names and string literals. Every distinct text is
+    stored once and gets a dense integer id, stable for the table lifetime,
+    so later phases can key scopes and dictionaries by small ints.
+    """
+
+    def __init__(self):
+        self.ids: dict[str, int] = {}
+        self.names: list[str] = []
+
+    def intern(self, text: str) -> int:
+        symbol = self.ids.get(text)
+        if symbol is None:
+            symbol = len(self.names)
+            self.ids[text] = symbol
+            self.names.append(text)
+        return symbol
+
+    def lookup(self, text: str) -> Optional[int]:
+        return self.ids.get(text)
+
+    def name(self, symbol: int) -> str:
+        return self.names[symbol]
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def __contains__(self, text: object) -> bool:
+        return text in self.ids
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.names)
@@ -0,0 +1,197 @@
+from dataclasses import dataclass
+from typing import Any, Optional
+
+from app.tokenization import Token
+
+
+# Depth of a variable resolved to the global scope, looked up by name
+GLOBAL = -1
+
+
+class Expr:
+    __slots__ = ()
+
+
+class Stmt:
+    __slots__ = ()
+
+
+@dataclass(slots=True, eq=False)
+class Assign(Expr):
+    name: Token
+    value: Expr
+    # Scopes to walk out and slot in the target scope, set by Resolver
+    depth: int = GLOBAL
+    slot: int = -1
+
+    def __str__(self) -> str:
+        return f"(= {self.name.lexeme} {self.value})"
+
+
+@dataclass(slots=True, eq=False)
+class Binary(Expr):
+    left: Expr
+    operator: Token
+    right: Expr
+
+    def __str__(self) -> str:
+        return f"({self.operator.lexeme} {self.left} {self.right})"
+
+
+@dataclass(slots=True, eq=False)
+class Call(Expr):
+    callee: Expr
+    paren: Token
+    arguments: list[Expr]
+
+    def __str__(self) -> str:
+        arguments = "".join(f" {argument}" for argument in self.arguments)
+        return f"(call {self.callee}{arguments})"
+
+
+@dataclass(slots=True, eq=False)
+class Get(Expr):
+    object: Expr
+    name: Token
+
+    def __str__(self) -> str:
+        return f"(. {self.object} {self.name.lexeme})"
+
+
+@dataclass(slots=True, eq=False)
+class Grouping(Expr):
+    expression: Expr
+
+    def __str__(self) -> str:
+        return f"(group {self.expression})"
+
+
+@dataclass(slots=True, eq=False)
+class Literal(Expr):
+    value: Any
+    # Printable form computed once by the parser
+    text: str
+
+    def __str__(self) -> str:
+        return self.text
+
+
+@dataclass(slots=True, eq=False)
+class Logical(Expr):
+    left: Expr
+    operator: Token
+    right: Expr
+
+    def __str__(self) -> str:
+        return f"({self.operator.lexeme} {self.left} {self.right})"
+
+
+@dataclass(slots=True, eq=False)
+class Set(Expr):
+    object: Expr
+    name: Token
+    value: Expr
+
+    def __str__(self) -> str:
+        return f"(= (. {self.object} {self.name.lexeme}) {self.value})"
+
+
+@dataclass(slots=True, eq=False)
+class Super(Expr):
+    keyword: Token
+    method: Token
+    depth: int = GLOBAL
+    slot: int = -1
+
+    def __str__(self) -> str:
+        return f"(. super {self.method.lexeme})"
+
+
+@dataclass(slots=True, eq=False)
+class This(Expr):
+    keyword: Token
+    depth: int = GLOBAL
+    slot: int = -1
+
+    def __str__(self) -> str:
+        return "this"
+
+
+@dataclass(slots=True, eq=False)
+class Unary(Expr):
+    operator: Token
+    right: Expr
+
+    def __str__(self) -> str:
+        return f"({self.operator.lexeme} {self.right})"
+
+
+@dataclass(slots=True, eq=False)
+class Variable(Expr):
+    name: Token
+    depth: int = GLOBAL
+    slot: int = -1
+
+    def __str__(self) -> str:
+        return self.name.lexeme
+
+
+@dataclass(slots=True, eq=False)
+class Block(Stmt):
+    statements: list[Stmt]
+    # Slots of the block scope, zero when it declares nothing
+    slot_count: int = 0
+
+
+@dataclass(slots=True, eq=False)
+class Function(Stmt):
+    name: Token
+    params: list[Token]
+    body: list[Stmt]
+    # Slot of the name, GLOBAL at top level, and slots of params and locals
+    slot: int = GLOBAL
+    slot_count: int = 0
+
+
+@dataclass(slots=True, eq=False)
+class Class(Stmt):
+    name: Token
+    superclass: Optional[Variable]
+    methods: list[Function]
+    slot: int = GLOBAL
+
+
+@dataclass(slots=True, eq=False)
+class Expression(Stmt):
+    expression: Expr
+
+
+@dataclass(slots=True, eq=False)
+class If(Stmt):
+    condition: Expr
+    then_branch: Stmt
+    else_branch: Optional[Stmt]
+
+
+@dataclass(slots=True, eq=False)
+class Print(Stmt):
+    expression: Expr
+
+
+@dataclass(slots=True, eq=False)
+class Return(Stmt):
+    keyword: Token
+    value: Optional[Expr]
+
+
+@dataclass(slots=True, eq=False)
+class Var(Stmt):
+    name: Token
+    initializer: Optional[Expr]
+    slot: int = GLOBAL
+
+
+@dataclass(slots=True, eq=False)
+class While(Stmt):
+    condition: Expr
+    body: Stmt
@@ -1,6 +1,6 @@
-from dataclasses import dataclass
+from decimal import Decimal
 from enum import Enum, auto
-from typing import Any
+from typing import Any, Optional
 
 
 class TokenType(Enum):
@@ -80,21 +80,9 @@ SPACE = " "
 TAB = "\t"
 QUOTE = '"'
 WHITESPACE_CHARS: list[str] = [SPACE, TAB]
-BORDER_CHARS: list[str] = [
-    "(",
-    ")",
-    "+",
-    "-",
-    "*",
-    "/",
-    ";",
-    ",",
-    "=",
-    ">",
-    "<",
-    "=",
-    "!",
-]
+DIGITS = "0123456789"
+IDENTIFIER_START = "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ_"
+IDENTIFIER_CHARS = IDENTIFIER_START + DIGITS
 
 
 RESERVED_WORDS: dict[str, TokenType] = {
@@ -117,14 +105,116 @@ RESERVED_WORDS: dict[str, TokenType] = {
 }
 
 
-@dataclass
+class NumericMode(Enum):
+    # Native doubles, as Lox defines numbers
+    FLOAT = "float"
+    # Decimal of the shortest float representation, the historical output
+    DECIMAL = "decimal"
+
+    def convert(self, lexeme: str) -> Any:
+        if self is NumericMode.FLOAT:
+            return float(lexeme)
+        return Decimal(str(float(lexeme)))
+
+
+def format_number(value: Any) -> str:
+    """Print a number literal the same way whatever NumericMode produced it."""
+    if isinstance(value, float):
+        text = repr(value)
+        if "e" in text or "n" in text:
+            # Exponents, inf and nan are spelled the Decimal way
+            return str(Decimal(text))
+        return text
+    return str(value)
+
+
+class _Deferred:
+    """Marker of a number literal not converted yet."""
+
+    __slots__ = ()
+
+    def __reduce__(self) -> str:
+        # Unpickled as the module singleton, it is compared by identity
+        return "DEFERRED"
+
+    def __repr__(self) -> str:
+        return "DEFERRED"
+
+
+DEFERRED: Any = _Deferred()
+
+
 class Token:
-    type: TokenType
-    lexeme: str
-    literal: Any
-    line: int
+    __slots__ = ("type", "lexeme", "_literal", "line", "symbol", "numeric", "offset")
+
+    def __init__(
+        self,
+        type: TokenType,
+        lexeme: str,
+        literal: Any,
+        line: int,
+        symbol: Optional[int] = None,
+        numeric: NumericMode = NumericMode.DECIMAL,
+        offset: Optional[int] = None,
+    ):
+        self.type = type
+        self.lexeme = lexeme
+        self._literal = literal
+        self.line = line
+        # Id in the scanner's SymbolTable for identifiers and string literals
+        self.symbol = symbol
+        self.numeric = numeric
+        # Where the lexeme starts in the source, when known; its column comes
+        # from a LineIndex of the source
+        self.offset = offset
+
+    @classmethod
+    def number(
+        cls,
+        lexeme: str,
+        line: int,
+        numeric: NumericMode,
+        offset: Optional[int] = None,
+    ) -> "Token":
+        """Number token whose literal is converted on first access."""
+        return cls(
+            TokenType.NUMBER, lexeme, DEFERRED, line, numeric=numeric, offset=offset
+        )
+
+    @property
+    def literal(self) -> Any:
+        if self._literal is DEFERRED:
+            self._literal = self.numeric.convert(self.lexeme)
+        return self._literal
+
+    @property
+    def printable_literal(self) -> str:
+        literal = self.literal
+        if literal is None:
+            return "null"
+        if self.type == TokenType.NUMBER:
+            return format_number(literal)
+        return str(literal)
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, Token):
+            return NotImplemented
+        return (
+            self.type == other.type
+            and self.lexeme == other.lexeme
+            and self.literal == other.literal
+            and self.line == other.line
+        )
+
+    __hash__ = None  # type: ignore[assignment]
+
+    def __repr__(self) -> str:
+        return (
+            f"Token(type={self.type!r}, lexeme={self.lexeme!r}, "
+            f"literal={self.literal!r}, line={self.line!r}, symbol={self.symbol!r})"
+        )
 
     def __str__(self) -> str:
         if self.type == TokenType.EOF:
             return f"{TokenType.EOF.name}  null"
-        return f"{self.type.name} {self.lexeme} {self.literal if self.literal is not None else 'null'}"
+        return f"{self.type.name} {self.lexeme} {self.printable_literal}"
@@ -0,0 +1,846 @@
+import math
+import sys
+import warnings
+from dataclasses import dataclass, field
+from types import CodeType, FunctionType, TracebackType
+from typing import Any, Callable, Optional, TextIO
+
+from app.closures import ClosureCompiler
+from app.errors import LoxRuntimeError
+from app.optimizer import is_number
+from app.resolver import DECLARATIONS
+from app.runtime import (
+    NATIVE_FUNCTIONS,
+    LoxCallable,
+    divide,
+    is_equal,
+    is_truthy,
+    stringify,
+)
+from app.syntax import (
+    GLOBAL,
+    Assign,
+    Binary,
+    Block,
+    Call,
+    Class,
+    Expr,
+    Expression,
+    Function,
+    Get,
+    Grouping,
+    If,
+    Literal,
+    Logical,
+    Print,
+    Return,
+    Set,
+    Stmt,
+    Super,
+    This,
+    Unary,
+    Var,
+    Variable,
+    While,
+)
+from app.tokenization import TokenType
+
+INDENT = "    "
+
+# Generated line as (indentation, text, Lox line, globals read -> Lox line)
+Line = tuple[int, str, int, dict[str, int]]
+
+# Python operators matching the Lox ones once operands are checked
+OPERATORS: dict[TokenType, str] = {
+    TokenType.PLUS: "+",
+    TokenType.MINUS: "-",
+    TokenType.STAR: "*",
+    TokenType.SLASH: "/",
+    TokenType.GREATER: ">",
+    TokenType.GREATER_EQUAL: ">=",
+    TokenType.LESS: "<",
+    TokenType.LESS_EQUAL: "<=",
+}
+
+COMPARISONS = frozenset(
+    (
+        TokenType.GREATER,
+        TokenType.GREATER_EQUAL,
+        TokenType.LESS,
+        TokenType.LESS_EQUAL,
+        TokenType.EQUAL_EQUAL,
+        TokenType.BANG_EQUAL,
+    )
+)
+
+# Messages of CPython compile limits, such programs run on ClosureCompiler
+_COMPILE_LIMITS = ("too many nested parentheses", "too many statically nested")
+
+
+@dataclass(slots=True)
+class PythonProgram:
+    filename: str
+    source: str
+    # Lox line of every generated line, index 0 holds line 1
+    lines: list[int]
+    # (generated line, Python name) -> Lox line of the global read there
+    reads: dict[tuple[int, str], int]
+
+    def line(self, lineno: int, name: Optional[str] = None) -> int:
+        if name is not None and (lineno, name) in self.reads:
+            return self.reads[lineno, name]
+        if 0 < lineno <= len(self.lines):
+            return self.lines[lineno - 1]
+        return 0
+
+
+@dataclass(slots=True, eq=False)
+class _Local:
+    # Python name, unique in the program
+    name: str
+    # Lox function declaring it, closures of other functions capture it
+    function: int
+    captured: bool = False
+    owner: Optional["_Def"] = None
+
+
+class _Bindings:
+    """
+    Maps every resolved local to its declaration, replaying the scopes
+    Resolver creates, and finds the locals captured by closures.
+    """
+
+    def __init__(self):
+        self.declarations: dict[int, _Local] = {}
+        self.references: dict[int, _Local] = {}
+        self._scopes: list[list[_Local]] = []
+        self._functions = 0
+        self._function = 0
+
+    def statements(self, statements: list[Stmt]) -> None:
+        for statement in statements:
+            self._statement(statement)
+
+    def expression(self, expression: Expr) -> None:
+        if isinstance(expression, (Variable, Assign)):
+            if isinstance(expression, Assign):
+                self.expression(expression.value)
+            if expression.depth != GLOBAL:
+                local = self._scopes[-1 - expression.depth][expression.slot]
+                if local.function != self._function:
+                    local.captured = True
+                self.references[id(expression)] = local
+        elif isinstance(expression, (Binary, Logical)):
+            self.expression(expression.left)
+            self.expression(expression.right)
+        elif isinstance(expression, Unary):
+            self.expression(expression.right)
+        elif isinstance(expression, Grouping):
+            self.expression(expression.expression)
+        elif isinstance(expression, Call):
+            self.expression(expression.callee)
+            for argument in expression.arguments:
+                self.expression(argument)
+
+    def _declare(self, key: int, lexeme: str, slot: int) -> None:
+        if slot == GLOBAL:
+            return
+        local = _Local(f"l_{lexeme}_{len(self.declarations)}", self._function)
+        self.declarations[key] = local
+        self._scopes[-1].append(local)
+
+    def _statement(self, statement: Stmt) -> None:
+        if isinstance(statement, (Expression, Print)):
+            self.expression(statement.expression)
+        elif isinstance(statement, Var):
+            # Declared first, like Resolver does, the initializer may assign it
+            self._declare(id(statement), statement.name.lexeme, statement.slot)
+            if statement.initializer is not None:
+                self.expression(statement.initializer)
+        elif isinstance(statement, Block):
+            if not statement.slot_count:
+                self.statements(statement.statements)
+                return
+            self._scopes.append([])
+            self.statements(statement.statements)
+            self._scopes.pop()
+        elif isinstance(statement, If):
+            self.expression(statement.condition)
+            self._statement(statement.then_branch)
+            if statement.else_branch is not None:
+                self._statement(statement.else_branch)
+        elif isinstance(statement, While):
+            self.expression(statement.condition)
+            self._statement(statement.body)
+        elif isinstance(statement, Return):
+            if statement.value is not None:
+                self.expression(statement.value)
+        elif isinstance(statement, Function):
+            self._declare(id(statement), statement.name.lexeme, statement.slot)
+            enclosing = self._function
+            self._functions += 1
+            self._function = self._functions
+            self._scopes.append([])
+            for index, param in enumerate(statement.params):
+                self._declare(id(param), param.lexeme, index)
+            self.statements(statement.body)
+            self._scopes.pop()
+            self._function = enclosing
+        elif isinstance(statement, Class):
+            # Classes only raise when executed, their methods are not compiled
+            self._declare(id(statement), statement.name.lexeme, statement.slot)
+
+
+@dataclass(slots=True, eq=False)
+class _Def:
+    """Python function being generated, with its own indentation."""
+
+    # "main", "function" or "block"
+    kind: str
+    parent: Optional["_Def"]
+    lines: list[Line] = field(default_factory=list)
+    globals: set[str] = field(default_factory=set)
+    nonlocals: set[str] = field(default_factory=set)
+    indent: int = 0
+    # Loops entered in this function, fresh Python frames reset it
+    loops: int = 0
+    # A Lox return statement happened in this block function
+    returns: bool = False
+
+
+class Transpiler:
+    """
+    Translates a resolved program into the source of a Python module, so
+    CPython's own compiler and bytecode interpreter do the work.
+
+    Top level code becomes the ``_main`` function and each Lox function a
+    nested ``def``. Globals are module globals named ``g_<name>``, every
+    local gets a unique ``l_<name>_<n>`` name in the Python function running
+    it, so blocks need no scopes at all. The exception is a block inside a
+    loop declaring variables captured by a closure: it becomes a function
+    called on every iteration, giving each closure its own variables.
+
+    Operand types are checked inline, with walrus temporaries so operands
+    are evaluated once, and skipped when the optimizer's ``is_number`` proves
+    an operand is a number. Runtime errors carry the line of their token,
+    ``PythonProgram.lines`` maps generated lines back to Lox lines for the
+    errors raised by CPython itself.
+    """
+
+    def __init__(self, filename: str = "<lox>"):
+        self.filename = filename
+        self._bindings = _Bindings()
+        self._def = _Def("main", None)
+        self._temporaries = 0
+        self._blocks = 0
+        # Lox functions entered, only top level code runs in program order
+        self._functions = 0
+        # Globals declared by top level statements emitted so far
+        self._declared: set[str] = set()
+        # Globals read by the expression being emitted, name -> Lox line
+        self._reads: dict[str, int] = {}
+        self._expressions: dict[type, Callable[[Any], str]] = {
+            Assign: self._assign,
+            Binary: self._binary,
+            Call: self._call,
+            Grouping: self._grouping,
+            Literal: self._literal,
+            Logical: self._logical,
+            Unary: self._unary,
+            Variable: self._variable,
+        }
+        self._statements: dict[type, Callable[[Any], None]] = {
+            Block: self._block,
+            Class: self._class,
+            Expression: self._expression_statement,
+            Function: self._function,
+            If: self._if,
+            Print: self._print,
+            Return: self._return,
+            Var: self._var,
+            While: self._while,
+        }
+
+    def transpile_program(self, statements: list[Stmt]) -> PythonProgram:
+        self._bindings.statements(statements)
+        for statement in statements:
+            self._statement(statement)
+        return self._assemble(self._finish("def _main():"))
+
+    def transpile_expression(self, expression: Expr) -> PythonProgram:
+        self._bindings.expression(expression)
+        value = self._expression(expression)
+        self._emit(f"return {value}", _line(expression))
+        return self._assemble(self._finish("def _main():"))
+
+    # Code layout
+
+    def _emit(self, text: str, line: int) -> None:
+        self._def.lines.append((self._def.indent, text, line, self._reads))
+        self._reads = {}
+
+    def _finish(self, header: str, line: int = 0) -> list[Line]:
+        """Lines of the current function, indented from its header."""
+        function = self._def
+        lines = [(0, header, line, {})]
+        if function.globals:
+            lines.append((1, "global " + ", ".join(sorted(function.globals)), line, {}))
+        if function.nonlocals:
+            names = ", ".join(sorted(function.nonlocals))
+            lines.append((1, "nonlocal " + names, line, {}))
+        lines.extend((indent + 1, *rest) for indent, *rest in function.lines)
+        if not function.lines:
+            lines.append((1, "pass", line, {}))
+        return lines  # type: ignore[return-value]
+
+    def _nest(self, lines: list[Line]) -> None:
+        indent = self._def.indent
+        for depth, text, line, reads in lines:
+            self._def.lines.append((depth + indent, text, line, reads))
+
+    def _assemble(self, lines: list[Line]) -> PythonProgram:
+        source = []
+        line_map = []
+        reads = {}
+        for lineno, (indent, text, line, names) in enumerate(lines, start=1):
+            source.append(INDENT * indent + text)
+            line_map.append(line)
+            for name, read_line in names.items():
+                reads[lineno, name] = read_line
+        return PythonProgram(self.filename, "\n".join(source) + "\n", line_map, reads)
+
+    def _body(self, statement: Stmt, line: int) -> None:
+        self._def.indent += 1
+        count = len(self._def.lines)
+        self._statement(statement)
+        if len(self._def.lines) == count:
+            self._emit("pass", line)
+        self._def.indent -= 1
+
+    def _temporary(self) -> str:
+        self._temporaries += 1
+        return f"_t{self._temporaries}"
+
+    # Names
+
+    def _global(self, name: str) -> str:
+        return f"g_{name}"
+
+    def _target(self, expression: Any) -> str:
+        """Python name assigned by expression, declared in the current function."""
+        local = self._bindings.references.get(id(expression))
+        if local is None:
+            name = self._global(expression.name.lexeme)
+            self._def.globals.add(name)
+            return name
+        if local.owner is not self._def:
+            self._def.nonlocals.add(local.name)
+        return local.name
+
+    def _declare(self, statement: Any) -> str:
+        local = self._bindings.declarations.get(id(statement))
+        if local is None:
+            name = self._global(statement.name.lexeme)
+            self._def.globals.add(name)
+            if not self._functions:
+                self._declared.add(name)
+            return name
+        local.owner = self._def
+        return local.name
+
+    # Statements
+
+    def _statement(self, statement: Stmt) -> None:
+        self._statements[type(statement)](statement)
+
+    def _expression_statement(self, statement: Expression) -> None:
+        expression = statement.expression
+        if isinstance(expression, Assign):
+            # Plain assignment statements are cheaper than walrus expressions
+            value = self._expression(expression.value)
+            target = self._target(expression)
+            value = self._checked(expression, target, value)
+            self._emit(f"{target} = {value}", _line(expression))
+            return
+        self._emit(self._expression(expression), _line(expression))
+
+    def _print(self, statement: Print) -> None:
+        value = self._expression(statement.expression)
+        self._emit(f'_write(_stringify({value}) + "\\n")', _line(statement.expression))
+
+    def _var(self, statement: Var) -> None:
+        local = self._bindings.declarations.get(id(statement))
+        if local is not None:
+            # A local is in scope in its initializer, which may assign it
+            local.owner = self._def
+        if statement.initializer is None:
+            value = "None"
+        else:
+            value = self._expression(statement.initializer)
+        self._emit(f"{self._declare(statement)} = {value}", statement.name.line)
+
+    def _class(self, statement: Class) -> None:
+        name = self._declare(statement)
+        line = statement.name.line
+        self._emit(f"{name} = _unsupported('Class', {line})", line)
+
+    def _block(self, statement: Block) -> None:
+        if not self._def.loops or not self._captures(statement):
+            for inner in statement.statements:
+                self._statement(inner)
+            return
+
+        # Variables of each iteration must outlive it in their own closures
+        self._blocks += 1
+        name = f"_block{self._blocks}"
+        line = _line(statement)
+        enclosing = self._def
+        self._def = _Def("block", enclosing)
+        for inner in statement.statements:
+            self._statement(inner)
+        block = self._def
+        lines = self._finish(f"def {name}():", line)
+        self._def = enclosing
+        self._nest(lines)
+
+        if not block.returns:
+            self._emit(f"{name}()", line)
+            return
+        result = self._temporary()
+        self._emit(f"if ({result} := {name}()) is not None:", line)
+        self._def.indent += 1
+        if self._def.kind == "block":
+            self._def.returns = True
+            self._emit(f"return {result}", line)
+        else:
+            self._emit(f"return {result}[0]", line)
+        self._def.indent -= 1
+
+    def _captures(self, statement: Block) -> bool:
+        declarations = self._bindings.declarations
+        return any(
+            declarations[id(inner)].captured
+            for inner in statement.statements
+            if isinstance(inner, DECLARATIONS) and id(inner) in declarations
+        )
+
+    def _if(self, statement: If) -> None:
+        keyword = "if"
+        while True:
+            line = _line(statement.condition)
+            self._emit(f"{keyword} {self._condition(statement.condition)}:", line)
+            self._body(statement.then_branch, line)
+            else_branch = statement.else_branch
+            if else_branch is None:
+                return
+            if not isinstance(else_branch, If):
+                self._emit("else:", line)
+                self._body(else_branch, line)
+                return
+            # Chains of else if stay flat, Python limits indentation
+            keyword = "elif"
+            statement = else_branch
+
+    def _while(self, statement: While) -> None:
+        line = _line(statement.condition)
+        self._emit(f"while {self._condition(statement.condition)}:", line)
+        self._def.loops += 1
+        self._body(statement.body, line)
+        self._def.loops -= 1
+
+    def _function(self, statement: Function) -> None:
+        name = self._declare(statement)
+        line = statement.name.line
+        enclosing = self._def
+        self._def = _Def("function", enclosing)
+        self._functions += 1
+        params = []
+        for param in statement.params:
+            local = self._bindings.declarations[id(param)]
+            local.owner = self._def
+            params.append(local.name)
+        for inner in statement.body:
+            self._statement(inner)
+        lines = self._finish(f"def {name}({', '.join(params)}):", line)
+        self._functions -= 1
+        self._def = enclosing
+        self._nest(lines)
+        self._emit(f"{name}.__name__ = {statement.name.lexeme!r}", line)
+
+    def _return(self, statement: Return) -> None:
+        line = statement.keyword.line
+        value = "None" if statement.value is None else self._expression(statement.value)
+        if self._def.kind == "block":
+            self._def.returns = True
+            self._emit(f"return ({value},)", line)
+        else:
+            self._emit(f"return {value}", line)
+
+    # Expressions
+
+    def _expression(self, expression: Expr) -> str:
+        translate = self._expressions.get(type(expression))
+        if translate is None:
+            kind = type(expression).__name__
+            return f"_unsupported({kind!r}, {_line(expression)})"
+        return translate(expression)
+
+    def _condition(self, expression: Expr) -> str:
+        value = self._expression(expression)
+        if is_boolean(expression):
+            return value
+        if isinstance(expression, Literal):
+            return str(is_truthy(expression.value))
+        if isinstance(expression, Variable):
+            return f"{value} is not None and {value} is not False"
+        temporary = self._temporary()
+        return f"({temporary} := {value}) is not None and {temporary} is not False"
+
+    def _operand(self, expression: Expr, value: str, pure: bool) -> tuple[str, str]:
+        """
+        Text evaluating an operand first and text using it afterwards. Reads
+        of variables can be repeated when nothing can change them in between.
+        """
+        if isinstance(expression, Literal):
+            return value, value
+        if isinstance(expression, Variable) and pure:
+            return value, value
+        temporary = self._temporary()
+        return f"({temporary} := {value})", temporary
+
+    def _literal(self, expression: Literal) -> str:
+        value = expression.value
+        if value.__class__ is float:
+            if math.isnan(value):
+                return "_NAN"
+            if math.isinf(value):
+                return "_INF" if value > 0 else "(-_INF)"
+            text = repr(value)
+            return f"({text})" if text.startswith("-") else text
+        return repr(value)
+
+    def _grouping(self, expression: Grouping) -> str:
+        return self._expression(expression.expression)
+
+    def _variable(self, expression: Variable) -> str:
+        local = self._bindings.references.get(id(expression))
+        if local is not None:
+            return local.name
+        name = self._global(expression.name.lexeme)
+        self._reads.setdefault(name, expression.name.line)
+        return name
+
+    def _assign(self, expression: Assign) -> str:
+        value = self._expression(expression.value)
+        target = self._target(expression)
+        return f"({target} := {self._checked(expression, target, value)})"
+
+    def _checked(self, expression: Assign, target: str, value: str) -> str:
+        """Value assigned to target, raising first if it is an undefined global."""
+        if not target.startswith("g_") or (
+            not self._functions and target in self._declared
+        ):
+            return value
+        # Reading the global after the value raises NameError when undefined
+        self._reads.setdefault(target, expression.name.line)
+        return f"({value}, {target})[0]"
+
+    def _unary(self, expression: Unary) -> str:
+        right = expression.right
+        value = self._expression(right)
+        line = expression.operator.line
+        if expression.operator.type == TokenType.BANG:
+            if isinstance(right, Literal):
+                return str(not is_truthy(right.value))
+            if is_boolean(right):
+                return f"(not {value})"
+            first, then = self._operand(right, value, True)
+            return f"({first} is None or {then} is False)"
+
+        if is_number(right):
+            return f"(-{value})"
+        first, then = self._operand(right, value, True)
+        return f"(-{then} if {first}.__class__ is float else _operand({line}))"
+
+    def _logical(self, expression: Logical) -> str:
+        left = self._expression(expression.left)
+        right = self._expression(expression.right)
+        is_or = expression.operator.type == TokenType.OR
+        if isinstance(expression.left, Literal):
+            return left if is_truthy(expression.left.value) == is_or else right
+        if is_boolean(expression.left):
+            return f"({left} {'or' if is_or else 'and'} {right})"
+        first, then = self._operand(expression.left, left, True)
+        truthy = f"{first} is not None and {then} is not False"
+        if is_or:
+            return f"({then} if {truthy} else {right})"
+        return f"({right} if {truthy} else {then})"
+
+    def _binary(self, expression: Binary) -> str:
+        left_node, right_node = expression.left, expression.right
+        token_type = expression.operator.type
+        line = expression.operator.line
+        left = self._expression(left_node)
+        right = self._expression(right_node)
+        # The left operand can be read again if the right one changes nothing
+        pure = isinstance(right_node, (Literal, Variable))
+        left_first, left_then = self._operand(left_node, left, pure)
+        right_first, right_then = self._operand(right_node, right, True)
+
+        if token_type in (TokenType.EQUAL_EQUAL, TokenType.BANG_EQUAL):
+            negate = "not " if token_type == TokenType.BANG_EQUAL else ""
+            if isinstance(left_node, Literal) and isinstance(right_node, Literal):
+                equal = is_equal(left_node.value, right_node.value)
+                return str(equal != bool(negate))
+            if isinstance(right_node, Literal):
+                kind = right_node.value.__class__
+                if kind is not float and kind is not str:
+                    # nil, true and false are singletons
+                    return f"({negate}{left_first} is {right})"
+                return (
+                    f"({negate}({left_first}.__class__ is {kind.__name__}"
+                    f" and {left_then} == {right}))"
+                )
+            return (
+                f"({negate}({left_first}.__class__ is {right_first}.__class__"
+                f" and {left_then} == {right_then}))"
+            )
+
+        symbol = OPERATORS[token_type]
+        check = "_addends" if token_type == TokenType.PLUS else "_operands"
+        both_numbers = is_number(left_node) and is_number(right_node)
+        is_plus = token_type == TokenType.PLUS
+        if is_plus and _is_string(left_node) and _is_string(right_node):
+            return f"({left} + {right})"
+        if token_type == TokenType.SLASH and not _nonzero_number(right_node):
+            # Division by zero gives Infinity or NaN instead of raising
+            if both_numbers:
+                return f"_divide({left}, {right})"
+            return f"_slash({left}, {right}, {line})"
+        if both_numbers:
+            return f"({left} {symbol} {right})"
+
+        operation = f"{left_then} {symbol} {right_then}"
+        fail = f"{check}({line})"
+        # A literal operand of the right type leaves one operand to check
+        kinds = (float, str) if is_plus else (float,)
+        if _is_constant(right_node, kinds):
+            kind = right_node.value.__class__.__name__
+            return f"({operation} if {left_first}.__class__ is {kind} else {fail})"
+        if _is_constant(left_node, kinds):
+            kind = left_node.value.__class__.__name__
+            return f"({operation} if {right_first}.__class__ is {kind} else {fail})"
+        same = f"{left_first}.__class__ is {right_first}.__class__"
+        allowed = "in _ADDABLE" if is_plus else "is float"
+        return f"({operation} if {same} {allowed} else {fail})"
+
+    def _call(self, expression: Call) -> str:
+        callee = self._expression(expression.callee)
+        arguments = ", ".join(self._expression(a) for a in expression.arguments)
+        count = len(expression.arguments)
+        line = expression.paren.line
+        first, then = self._operand(expression.callee, callee, True)
+        # Lox functions of the right arity are called directly, anything else
+        # through a wrapper checking it once the arguments are evaluated
+        return (
+            f"({then} if {first}.__class__ is _function and "
+            f"{then}.__code__.co_argcount == {count} else _callable({then}, {line}))"
+            f"({arguments})"
+        )
+
+
+def is_boolean(expression: Expr) -> bool:
+    """Whether the expression can only produce true or false, or raise."""
+    if isinstance(expression, Literal):
+        return expression.value is True or expression.value is False
+    if isinstance(expression, Grouping):
+        return is_boolean(expression.expression)
+    if isinstance(expression, Unary):
+        return expression.operator.type == TokenType.BANG
+    if isinstance(expression, Binary):
+        return expression.operator.type in COMPARISONS
+    if isinstance(expression, Logical):
+        return is_boolean(expression.left) and is_boolean(expression.right)
+    return False
+
+
+def _is_string(expression: Expr) -> bool:
+    return isinstance(expression, Literal) and expression.value.__class__ is str
+
+
+def _is_constant(expression: Expr, kinds: tuple[type, ...]) -> bool:
+    return isinstance(expression, Literal) and expression.value.__class__ in kinds
+
+
+def _nonzero_number(expression: Expr) -> bool:
+    return (
+        isinstance(expression, Literal)
+        and expression.value.__class__ is float
+        and expression.value != 0
+    )
+
+
+def _line(node: Any) -> int:
+    """Line of the first token found in node, 0 for literals."""
+    while True:
+        if isinstance(node, (Expression, Print)):
+            node = node.expression
+        elif isinstance(node, (If, While)):
+            node = node.condition
+        elif isinstance(node, Block):
+            if not node.statements:
+                return 0
+            node = node.statements[0]
+        elif isinstance(node, (Binary, Logical)):
+            node = node.left
+        elif isinstance(node, Grouping):
+            node = node.expression
+        elif isinstance(node, Call):
+            node = node.callee
+        elif isinstance(node, Unary):
+            return node.operator.line
+        elif isinstance(node, (Return, This, Super)):
+            return node.keyword.line
+        elif isinstance(node, (Variable, Assign, Var, Function, Class, Get, Set)):
+            return node.name.line
+        else:
+            return 0
+
+
+def _fail(message: str, line: int) -> Any:
+    raise LoxRuntimeError(None, message, line)
+
+
+def _callable(callee: Any, line: int) -> Callable[..., Any]:
+    """Callable checking a Lox call once its arguments are evaluated."""
+
+    def call(*arguments: Any) -> Any:
+        if callee.__class__ is FunctionType:
+            arity = callee.__code__.co_argcount
+        elif isinstance(callee, LoxCallable):
+            arity = callee.arity()
+        else:
+            _fail("Can only call functions and classes.", line)
+        if len(arguments) != arity:
+            _fail(f"Expected {arity} arguments but got {len(arguments)}.", line)
+        if callee.__class__ is FunctionType:
+            return callee(*arguments)
+        return callee.call(list(arguments))
+
+    return call
+
+
+def _slash(left: Any, right: Any, line: int) -> float:
+    if left.__class__ is float and right.__class__ is float:
+        return divide(left, right)
+    return _fail("Operands must be numbers.", line)
+
+
+def _stringify(value: Any) -> str:
+    if value.__class__ is FunctionType:
+        return f"<fn {value.__name__}>"
+    return stringify(value)
+
+
+# Helpers the generated code refers to, never clashing with g_ and l_ names
+RUNTIME: dict[str, Any] = {
+    "_function": FunctionType,
+    "_callable": _callable,
+    "_divide": divide,
+    "_slash": _slash,
+    "_stringify": _stringify,
+    "_ADDABLE": (float, str),
+    "_INF": math.inf,
+    "_NAN": math.nan,
+    "_operand": lambda line: _fail("Operand must be a number.", line),
+    "_operands": lambda line: _fail("Operands must be numbers.", line),
+    "_addends": lambda line: _fail(
+        "Operands must be two numbers or two strings.", line
+    ),
+    "_unsupported": lambda kind, line: _fail(f"{kind} is not supported yet.", line),
+}
+
+
+class PythonEngine:
+    """
+    Runs programs translated by Transpiler, compiled with the built-in
+    ``compile()``. Globals live in one namespace for the life of the
+    engine, like the globals of the other backends.
+
+    Programs CPython refuses to compile, nested deeper than its parser
+    allows, run on ClosureCompiler instead.
+    """
+
+    def __init__(self, stdout: TextIO = sys.stdout):
+        self.stdout = stdout
+        self.globals: dict[str, Any] = dict(RUNTIME)
+        self.globals["_write"] = stdout.write
+        for name, function in NATIVE_FUNCTIONS.items():
+            self.globals[f"g_{name}"] = function
+        # Generated file name -> program, to map tracebacks to Lox lines
+        self.programs: dict[str, PythonProgram] = {}
+
+    def evaluate(self, expression: Expr) -> Any:
+        try:
+            program = self._transpiler().transpile_expression(expression)
+            code = self.compile(program)
+        except (_CompileLimit, RecursionError):
+            return ClosureCompiler(self.stdout).evaluate(expression)
+        return self.execute(code)
+
+    def run(self, statements: list[Stmt]) -> None:
+        try:
+            program = self._transpiler().transpile_program(statements)
+            code = self.compile(program)
+        except (_CompileLimit, RecursionError):
+            ClosureCompiler(self.stdout).run(statements)
+            return
+        self.execute(code)
+
+    def _transpiler(self) -> Transpiler:
+        return Transpiler(f"<lox-{len(self.programs) + 1}>")
+
+    def compile(self, program: PythonProgram) -> CodeType:
+        try:
+            with warnings.catch_warnings():
+                # Literal operands may compare with "is", which is meant here
+                warnings.simplefilter("ignore", SyntaxWarning)
+                code = compile(program.source, program.filename, "exec")
+        except (RecursionError, MemoryError):
+            raise _CompileLimit from None
+        except SyntaxError as error:
+            if any(limit in str(error) for limit in _COMPILE_LIMITS):
+                raise _CompileLimit from None
+            raise
+        self.programs[program.filename] = program
+        return code
+
+    def execute(self, code: CodeType) -> Any:
+        exec(code, self.globals)
+        main = self.globals.pop("_main")
+        try:
+            return main()
+        except NameError as error:
+            name = error.name or ""
+            line = self._line(error.__traceback__, name)
+            message = f"Undefined variable '{name[2:]}'."
+            raise LoxRuntimeError(None, message, line) from None
+        except RecursionError as error:
+            line = self._line(error.__traceback__)
+            raise LoxRuntimeError(None, "Stack overflow.", line) from None
+
+    def _line(
+        self, traceback: Optional[TracebackType], name: Optional[str] = None
+    ) -> int:
+        """Lox line of the innermost generated frame of a traceback."""
+        line = 0
+        while traceback is not None:
+            program = self.programs.get(traceback.tb_frame.f_code.co_filename)
+            if program is not None and traceback.tb_lineno is not None:
+                line = program.line(traceback.tb_lineno, name)
+            traceback = traceback.tb_next
+        return line
+
+
+class _CompileLimit(Exception):
+    pass
@@ -0,0 +1,531 @@
+import sys
+from typing import Any, NoReturn, Optional, TextIO
+
+from app.bytecode import BytecodeCompiler, FunctionProto, OpCode
+from app.errors import LoxRuntimeError
+from app.objects import InlineCache, LoxClass, LoxInstance
+from app.runtime import NATIVE_FUNCTIONS, LoxCallable, divide, stringify
+from app.syntax import Expr, Stmt
+
+# Nested Lox calls allowed by default, their frames live on the heap
+MAX_FRAMES = 1 << 16
+
+# Plain ints, comparing against them is cheaper than against enum members
+(
+    CONSTANT,
+    NIL,
+    TRUE,
+    FALSE,
+    POP,
+    GET_LOCAL,
+    SET_LOCAL,
+    GET_GLOBAL,
+    DEFINE_GLOBAL,
+    SET_GLOBAL,
+    GET_UPVALUE,
+    SET_UPVALUE,
+    EQUAL,
+    NOT_EQUAL,
+    GREATER,
+    GREATER_EQUAL,
+    LESS,
+    LESS_EQUAL,
+    ADD,
+    SUBTRACT,
+    MULTIPLY,
+    DIVIDE,
+    NOT,
+    NEGATE,
+    PRINT,
+    JUMP,
+    JUMP_IF_FALSE,
+    JUMP_IF_TRUE,
+    POP_JUMP_IF_FALSE,
+    LOOP,
+    CALL,
+    CLOSURE,
+    CLOSE_UPVALUE,
+    RETURN,
+    TAIL_CALL,
+    CLASS,
+    INHERIT,
+    METHOD,
+    GET_PROPERTY,
+    SET_PROPERTY,
+    GET_SUPER,
+    INVOKE,
+) = map(int, OpCode)
+
+
+class Upvalue:
+    """
+    Variable captured by a closure. While open, it points at a slot of the
+    VM stack; closing moves the value into a private one element list.
+    """
+
+    __slots__ = ("location", "index")
+
+    def __init__(self, location: list[Any], index: int):
+        self.location = location
+        self.index = index
+
+
+class Closure:
+    __slots__ = ("function", "upvalues")
+
+    def __init__(self, function: FunctionProto, upvalues: list[Upvalue]):
+        self.function = function
+        self.upvalues = upvalues
+
+    def __str__(self) -> str:
+        return str(self.function)
+
+
+class BoundMethod:
+    """Method read off an instance, called with the instance in slot zero."""
+
+    __slots__ = ("receiver", "method")
+
+    def __init__(self, receiver: LoxInstance, method: Closure):
+        self.receiver = receiver
+        self.method = method
+
+    def __str__(self) -> str:
+        return str(self.method)
+
+
+class VirtualMachine:
+    """
+    Stack based virtual machine running the output of BytecodeCompiler.
+    Lox calls push a frame on a list rather than recursing in Python, so
+    the call depth is only bounded by max_depth, and tail calls reuse the
+    frame of their caller.
+    """
+
+    def __init__(self, stdout: TextIO = sys.stdout, max_depth: int = MAX_FRAMES):
+        self.stdout = stdout
+        self.max_depth = max_depth
+        self.globals: dict[str, Any] = dict(NATIVE_FUNCTIONS)
+        self.stack: list[Any] = []
+        # Stack slot -> open upvalue pointing at it
+        self.open_upvalues: dict[int, Upvalue] = {}
+        # Of every property access site compiled, for their hit rates
+        self.inline_caches: list[InlineCache] = []
+
+    def evaluate(self, expression: Expr) -> Any:
+        compiler = BytecodeCompiler()
+        function = compiler.compile_expression(expression)
+        self.inline_caches.extend(compiler.inline_caches)
+        return self.interpret(function)
+
+    def run(self, statements: list[Stmt]) -> None:
+        compiler = BytecodeCompiler()
+        function = compiler.compile_program(statements)
+        self.inline_caches.extend(compiler.inline_caches)
+        self.interpret(function)
+
+    def interpret(self, function: FunctionProto) -> Any:
+        closure = Closure(function, [])
+        self.stack.append(closure)
+        try:
+            return self._execute(closure)
+        except LoxRuntimeError:
+            self.stack.clear()
+            self.open_upvalues.clear()
+            raise
+
+    def _execute(self, closure: Closure) -> Any:
+        stack = self.stack
+        globals_ = self.globals
+        open_upvalues = self.open_upvalues
+        write = self.stdout.write
+        max_depth = self.max_depth
+        # Callers of the running function as (closure, ip, base)
+        frames: list[tuple[Closure, int, int]] = []
+
+        function = closure.function
+        code = function.chunk.ops
+        constants = function.chunk.constants
+        upvalues = closure.upvalues
+        base = len(stack) - 1
+        ip = 0
+
+        # Hot instructions come first, every check is one comparison
+        while True:
+            op = code[ip]
+            ip += 1
+            if op == GET_LOCAL:
+                stack.append(stack[base + code[ip]])
+                ip += 1
+            elif op == CONSTANT:
+                stack.append(constants[code[ip] << 8 | code[ip + 1]])
+                ip += 2
+            elif op == GET_GLOBAL:
+                name = constants[code[ip] << 8 | code[ip + 1]]
+                ip += 2
+                try:
+                    stack.append(globals_[name])
+                except KeyError:
+                    self._error(function, ip, f"Undefined variable '{name}'.")
+            elif op == ADD:
+                b = stack.pop()
+                a = stack[-1]
+                cls = a.__class__
+                if cls is b.__class__ and (cls is float or cls is str):
+                    stack[-1] = a + b
+                else:
+                    self._error(
+                        function, ip, "Operands must be two numbers or two strings."
+                    )
+            elif op == SUBTRACT:
+                b = stack.pop()
+                a = stack[-1]
+                if a.__class__ is float and b.__class__ is float:
+                    stack[-1] = a - b
+                else:
+                    self._error(function, ip, "Operands must be numbers.")
+            elif op == LESS:
+                b = stack.pop()
+                a = stack[-1]
+                if a.__class__ is float and b.__class__ is float:
+                    stack[-1] = a < b
+                else:
+                    self._error(function, ip, "Operands must be numbers.")
+            elif op == POP_JUMP_IF_FALSE:
+                value = stack.pop()
+                if value is None or value is False:
+                    ip += code[ip] << 8 | code[ip + 1]
+                ip += 2
+            elif op == SET_LOCAL:
+                stack[base + code[ip]] = stack[-1]
+                ip += 1
+            elif op == POP:
+                stack.pop()
+            elif op == LOOP:
+                ip -= (code[ip] << 8 | code[ip + 1]) - 2
+            elif op == CALL:
+                count = code[ip]
+                ip += 1
+                callee = stack[-1 - count]
+                if callee.__class__ is not Closure:
+                    callee = self._prepare_call(function, ip, callee, count)
+                    if callee is None:
+                        continue
+                callee_function = callee.function
+                if callee_function.arity != count:
+                    self._error(
+                        function,
+                        ip,
+                        f"Expected {callee_function.arity} arguments "
+                        f"but got {count}.",
+                    )
+                if len(frames) >= max_depth:
+                    self._error(function, ip, "Stack overflow.")
+                frames.append((closure, ip, base))
+                closure = callee
+                function = callee_function
+                code = function.chunk.ops
+                constants = function.chunk.constants
+                upvalues = closure.upvalues
+                base = len(stack) - 1 - count
+                ip = 0
+            elif op == INVOKE:
+                cache = constants[code[ip] << 8 | code[ip + 1]]
+                count = code[ip + 2]
+                ip += 3
+                instance = stack[-1 - count]
+                if instance.__class__ is not LoxInstance:
+                    self._error(function, ip, "Only instances have properties.")
+                shape = instance.shape
+                if shape is cache.shape:
+                    cache.hits += 1
+                    callee = cache.entry
+                else:
+                    callee = cache.resolve(shape)
+                    if callee is None:
+                        message = f"Undefined property '{cache.name}'."
+                        self._error(function, ip, message)
+                if callee.__class__ is int:
+                    # A field holding something callable takes the slot
+                    callee = stack[-1 - count] = instance.fields[callee]
+                    if callee.__class__ is not Closure:
+                        callee = self._prepare_call(function, ip, callee, count)
+                        if callee is None:
+                            continue
+                callee_function = callee.function
+                if callee_function.arity != count:
+                    self._error(
+                        function,
+                        ip,
+                        f"Expected {callee_function.arity} arguments "
+                        f"but got {count}.",
+                    )
+                if len(frames) >= max_depth:
+                    self._error(function, ip, "Stack overflow.")
+                frames.append((closure, ip, base))
+                closure = callee
+                function = callee_function
+                code = function.chunk.ops
+                constants = function.chunk.constants
+                upvalues = closure.upvalues
+                base = len(stack) - 1 - count
+                ip = 0
+            elif op == GET_PROPERTY:
+                cache = constants[code[ip] << 8 | code[ip + 1]]
+                ip += 2
+                instance = stack[-1]
+                if instance.__class__ is not LoxInstance:
+                    self._error(function, ip, "Only instances have properties.")
+                shape = instance.shape
+                if shape is cache.shape:
+                    cache.hits += 1
+                    entry = cache.entry
+                else:
+                    entry = cache.resolve(shape)
+                    if entry is None:
+                        message = f"Undefined property '{cache.name}'."
+                        self._error(function, ip, message)
+                if entry.__class__ is int:
+                    stack[-1] = instance.fields[entry]
+                else:
+                    stack[-1] = BoundMethod(instance, entry)
+            elif op == SET_PROPERTY:
+                cache = constants[code[ip] << 8 | code[ip + 1]]
+                ip += 2
+                value = stack.pop()
+                instance = stack[-1]
+                if instance.__class__ is not LoxInstance:
+                    self._error(function, ip, "Only instances have fields.")
+                shape = instance.shape
+                if shape is cache.shape:
+                    cache.hits += 1
+                    index, next_shape = cache.entry
+                else:
+                    index, next_shape = cache.resolve(shape)
+                if next_shape is shape:
+                    instance.fields[index] = value
+                else:
+                    instance.fields.append(value)
+                    instance.shape = next_shape
+                stack[-1] = value
+            elif op == RETURN:
+                result = stack.pop()
+                if open_upvalues:
+                    self._close_upvalues(base)
+                del stack[base:]
+                if not frames:
+                    return result
+                stack.append(result)
+                closure, ip, base = frames.pop()
+                function = closure.function
+                code = function.chunk.ops
+                constants = function.chunk.constants
+                upvalues = closure.upvalues
+            elif op == TAIL_CALL:
+                count = code[ip]
+                ip += 1
+                callee = stack[-1 - count]
+                if callee.__class__ is not Closure:
+                    callee = self._prepare_call(function, ip, callee, count)
+                    if callee is None:
+                        # The RETURN that follows returns the result
+                        continue
+                callee_function = callee.function
+                if callee_function.arity != count:
+                    self._error(
+                        function,
+                        ip,
+                        f"Expected {callee_function.arity} arguments "
+                        f"but got {count}.",
+                    )
+                if open_upvalues:
+                    self._close_upvalues(base)
+                # The callee and its arguments take over the frame
+                stack[base:] = stack[len(stack) - 1 - count :]
+                closure = callee
+                function = callee_function
+                code = function.chunk.ops
+                constants = function.chunk.constants
+                upvalues = closure.upvalues
+                ip = 0
+            elif op == GET_UPVALUE:
+                upvalue = upvalues[code[ip]]
+                stack.append(upvalue.location[upvalue.index])
+                ip += 1
+            elif op == SET_UPVALUE:
+                upvalue = upvalues[code[ip]]
+                upvalue.location[upvalue.index] = stack[-1]
+                ip += 1
+            elif op == NIL:
+                stack.append(None)
+            elif op == TRUE:
+                stack.append(True)
+            elif op == FALSE:
+                stack.append(False)
+            elif op == SET_GLOBAL:
+                name = constants[code[ip] << 8 | code[ip + 1]]
+                ip += 2
+                if name not in globals_:
+                    self._error(function, ip, f"Undefined variable '{name}'.")
+                globals_[name] = stack[-1]
+            elif op == DEFINE_GLOBAL:
+                globals_[constants[code[ip] << 8 | code[ip + 1]]] = stack.pop()
+                ip += 2
+            elif op == EQUAL:
+                b = stack.pop()
+                a = stack[-1]
+                stack[-1] = a.__class__ is b.__class__ and a == b
+            elif op == NOT_EQUAL:
+                b = stack.pop()
+                a = stack[-1]
+                stack[-1] = not (a.__class__ is b.__class__ and a == b)
+            elif op == GREATER:
+                b = stack.pop()
+                a = stack[-1]
+                if a.__class__ is float and b.__class__ is float:
+                    stack[-1] = a > b
+                else:
+                    self._error(function, ip, "Operands must be numbers.")
+            elif op == GREATER_EQUAL:
+                b = stack.pop()
+                a = stack[-1]
+                if a.__class__ is float and b.__class__ is float:
+                    stack[-1] = a >= b
+                else:
+                    self._error(function, ip, "Operands must be numbers.")
+            elif op == LESS_EQUAL:
+                b = stack.pop()
+                a = stack[-1]
+                if a.__class__ is float and b.__class__ is float:
+                    stack[-1] = a <= b
+                else:
+                    self._error(function, ip, "Operands must be numbers.")
+            elif op == MULTIPLY:
+                b = stack.pop()
+                a = stack[-1]
+                if a.__class__ is float and b.__class__ is float:
+                    stack[-1] = a * b
+                else:
+                    self._error(function, ip, "Operands must be numbers.")
+            elif op == DIVIDE:
+                b = stack.pop()
+                a = stack[-1]
+                if a.__class__ is float and b.__class__ is float:
+                    stack[-1] = divide(a, b)
+                else:
+                    self._error(function, ip, "Operands must be numbers.")
+            elif op == NOT:
+                value = stack[-1]
+                stack[-1] = value is None or value is False
+            elif op == NEGATE:
+                value = stack[-1]
+                if value.__class__ is not float:
+                    self._error(function, ip, "Operand must be a number.")
+                stack[-1] = -value
+            elif op == PRINT:
+                write(stringify(stack.pop()) + "\n")
+            elif op == JUMP:
+                ip += (code[ip] << 8 | code[ip + 1]) + 2
+            elif op == JUMP_IF_FALSE:
+                value = stack[-1]
+                if value is None or value is False:
+                    ip += code[ip] << 8 | code[ip + 1]
+                ip += 2
+            elif op == JUMP_IF_TRUE:
+                value = stack[-1]
+                if value is not None and value is not False:
+                    ip += code[ip] << 8 | code[ip + 1]
+                ip += 2
+            elif op == CLOSURE:
+                proto = constants[code[ip] << 8 | code[ip + 1]]
+                ip += 2
+                captured = []
+                for _ in range(proto.upvalue_count):
+                    index = code[ip + 1]
+                    if code[ip]:
+                        captured.append(self._capture(base + index))
+                    else:
+                        captured.append(upvalues[index])
+                    ip += 2
+                stack.append(Closure(proto, captured))
+            elif op == CLOSE_UPVALUE:
+                self._close_upvalues(len(stack) - 1)
+                stack.pop()
+            elif op == GET_SUPER:
+                name = constants[code[ip] << 8 | code[ip + 1]]
+                ip += 2
+                method = stack.pop().methods.get(name)
+                if method is None:
+                    self._error(function, ip, f"Undefined property '{name}'.")
+                stack[-1] = BoundMethod(stack[-1], method)
+            elif op == CLASS:
+                name = constants[code[ip] << 8 | code[ip + 1]]
+                ip += 2
+                stack.append(LoxClass(name, None, {}))
+            elif op == METHOD:
+                name = constants[code[ip] << 8 | code[ip + 1]]
+                ip += 2
+                method = stack.pop()
+                stack[-1].add_method(name, method)
+            elif op == INHERIT:
+                superclass = stack[-2]
+                if superclass.__class__ is not LoxClass:
+                    self._error(function, ip, "Superclass must be a class.")
+                stack.pop().inherit(superclass)
+            else:
+                raise ValueError(f"Unknown opcode {op}")
+
+    def _capture(self, slot: int) -> Upvalue:
+        upvalue = self.open_upvalues.get(slot)
+        if upvalue is None:
+            upvalue = Upvalue(self.stack, slot)
+            self.open_upvalues[slot] = upvalue
+        return upvalue
+
+    def _close_upvalues(self, last: int) -> None:
+        """Close every open upvalue pointing at slot ``last`` or above."""
+        stack = self.stack
+        for slot in [slot for slot in self.open_upvalues if slot >= last]:
+            upvalue = self.open_upvalues.pop(slot)
+            upvalue.location = [stack[slot]]
+            upvalue.index = 0
+
+    def _prepare_call(
+        self, function: FunctionProto, ip: int, callee: Any, count: int
+    ) -> Optional[Closure]:
+        """
+        Closure to call for a callee that is not one, with its receiver put
+        in the callee's slot. None once the call is complete instead: a
+        native call, or a class without initializer.
+        """
+        stack = self.stack
+        if callee.__class__ is BoundMethod:
+            stack[-1 - count] = callee.receiver
+            return callee.method
+        if callee.__class__ is LoxClass:
+            initializer = callee.initializer
+            if initializer is None and count:
+                self._error(function, ip, f"Expected 0 arguments but got {count}.")
+            stack[-1 - count] = LoxInstance(callee.root)
+            return initializer
+        self._call_native(function, ip, callee, count)
+        return None
+
+    def _call_native(
+        self, function: FunctionProto, ip: int, callee: Any, count: int
+    ) -> None:
+        if not isinstance(callee, LoxCallable):
+            self._error(function, ip, "Can only call functions and classes.")
+        if callee.arity() != count:
+            self._error(
+                function, ip, f"Expected {callee.arity()} arguments but got {count}."
+            )
+        stack = self.stack
+        arguments = stack[len(stack) - count :]
+        del stack[len(stack) - count - 1 :]
+        stack.append(callee.call(arguments))
+
+    def _error(self, function: FunctionProto, ip: int, message: str) -> NoReturn:
+        # ip is past the instruction, every byte of which shares its line
+        line = function.chunk.lines[ip - 1]
+        raise LoxRuntimeError(None, message, line)
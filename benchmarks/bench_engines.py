@@ -0,0 +1,78 @@
+"""
+Compare the execution backends on loop and call heavy Lox programs.
+
+Usage: python -m benchmarks.bench_engines [repeat]
+"""
+
+import io
+import sys
+import time
+
+from app.closures import ClosureCompiler
+from app.interpreter import Interpreter
+from app.parser import Parser
+from app.resolver import Resolver
+from app.scanner import Scanner
+from app.transpiler import PythonEngine
+from app.vm import VirtualMachine
+
+PROGRAMS = {
+    "loop": """
+        var total = 0;
+        for (var i = 0; i < 200000; i = i + 1) {
+            if (i / 2 > 10) total = total + i * 2; else total = total - 1;
+        }
+        print total;
+    """,
+    "locals": """
+        fun work() {
+            var total = 0;
+            for (var i = 0; i < 200000; i = i + 1) {
+                var step = i * 2;
+                { total = total + step; }
+            }
+            return total;
+        }
+        print work();
+    """,
+    "calls": """
+        fun fib(n) {
+            if (n < 2) return n;
+            return fib(n - 1) + fib(n - 2);
+        }
+        print fib(22);
+    """,
+    "strings": """
+        var text = "";
+        var i = 0;
+        while (i < 50000) { text = text + "ab"; i = i + 1; }
+        print text == "";
+    """,
+}
+
+BACKENDS = {
+    "tree": Interpreter,
+    "closure": ClosureCompiler,
+    "vm": VirtualMachine,
+    "python": PythonEngine,
+}
+
+
+def main() -> None:
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+
+    for program, source in PROGRAMS.items():
+        tokens, _ = Scanner(source).scan_tokens()
+        statements = Parser(tokens).parse_program()
+        Resolver().resolve(statements)
+        for backend, engine in BACKENDS.items():
+            best = float("inf")
+            for _ in range(repeat):
+                started = time.perf_counter()
+                engine(io.StringIO()).run(statements)
+                best = min(best, time.perf_counter() - started)
+            print(f"{program:>6} {backend:>8}: {best:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+"""
+Compare the throughput of the scanner engines, and of the buffer scan spread
+over every CPU core.
+
+Usage: python -m benchmarks.bench_scanner [lines]
+"""
+
+import os
+import sys
+import time
+
+from app.scanner import ScanEngine, Scanner
+
+SAMPLE = """var result = (alpha + beta_2) >= 7.25 or "Success" != "Failure";
+while (counter <= 10) { counter = counter + 1; print counter * 3.5; } // loop
+fun add(a, b) { return a+b; }
+"""
+
+
+def main() -> None:
+    lines = int(sys.argv[1]) if len(sys.argv) > 1 else 30_000
+    source = SAMPLE * (lines // SAMPLE.count("\n"))
+
+    for engine in ScanEngine:
+        started = time.perf_counter()
+        tokens, _ = Scanner(source, engine).scan_tokens()
+        elapsed = time.perf_counter() - started
+        print(
+            f"{engine.value:>8}: {len(tokens)} tokens in {elapsed:.3f}s "
+            f"({len(tokens) / elapsed:,.0f} tokens/s)"
+        )
+
+    for jobs in sorted({1, os.cpu_count() or 1}):
+        started = time.perf_counter()
+        buffer, _ = Scanner(source).scan_parallel(jobs)
+        elapsed = time.perf_counter() - started
+        print(
+            f"{jobs:>3} jobs: {len(buffer)} tokens in {elapsed:.3f}s "
+            f"({len(buffer) / elapsed:,.0f} tokens/s)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Deterministic generators of synthetic Lox programs for the benchmarks. The
+same kind, size and seed always give the same source.
+
+Usage: python -m benchmarks.corpus <kind> [characters] [seed]
+"""
+
+import random
+import sys
+from typing import Callable
+
+NAMES = (
+    "alpha beta gamma delta epsilon counter total index result value node "
+    "left right parent child buffer offset length width height scale"
+).split()
+WORDS = "lorem ipsum dolor sit amet consectetur adipiscing elit sed do".split()
+OPERATORS = ("+", "-", "*", "/", "<", "<=", ">", ">=", "==", "!=")
+# Parentheses per statement of the nested corpus, within what the recursive
+# descent parser and resolver handle at the default recursion limit
+NESTING_DEPTH = 60
+
+
+def _name(rng: random.Random) -> str:
+    return f"{rng.choice(NAMES)}_{rng.randrange(100)}"
+
+
+def _number(rng: random.Random) -> str:
+    if rng.random() < 0.5:
+        return str(rng.randrange(100000))
+    return f"{rng.randrange(1000)}.{rng.randrange(1, 10000)}"
+
+
+def _string(rng: random.Random) -> str:
+    return '"' + " ".join(rng.choices(WORDS, k=rng.randint(1, 6))) + '"'
+
+
+def _identifier_statement(rng: random.Random, index: int) -> str:
+    """Declarations, calls and property accesses, mostly names."""
+    choice = index % 4
+    if choice == 0:
+        operands = [_name(rng) for _ in range(rng.randint(2, 5))]
+        expression = f" {rng.choice(OPERATORS[:4])} ".join(operands)
+        return f"var {_name(rng)} = {expression};"
+    if choice == 1:
+        arguments = ", ".join(_name(rng) for _ in range(rng.randint(0, 4)))
+        return f"{_name(rng)}({arguments});"
+    if choice == 2:
+        return f"{_name(rng)}.{_name(rng)} = {_name(rng)}.{_name(rng)};"
+    parameters = ", ".join(f"p{position}" for position in range(rng.randint(0, 3)))
+    return f"fun {_name(rng)}({parameters}) {{ return {_name(rng)}; }}"
+
+
+def _number_statement(rng: random.Random, index: int) -> str:
+    operands = [_number(rng) for _ in range(rng.randint(3, 8))]
+    expression = operands[0]
+    for operand in operands[1:]:
+        expression += f" {rng.choice(OPERATORS[:4])} {operand}"
+    return f"print {expression};"
+
+
+def _string_statement(rng: random.Random, index: int) -> str:
+    parts = " + ".join(_string(rng) for _ in range(rng.randint(1, 4)))
+    return f"var text_{index} = {parts};"
+
+
+def _nested_statement(rng: random.Random, index: int) -> str:
+    """Groups, unary operators and calls nested within each other."""
+    expression = _number(rng)
+    for _ in range(rng.randint(NESTING_DEPTH // 2, NESTING_DEPTH)):
+        choice = rng.randrange(4)
+        if choice == 0:
+            expression = f"({expression})"
+        elif choice == 1:
+            expression = f"-{expression}"
+        elif choice == 2:
+            expression = f"f({expression})"
+        else:
+            expression = f"({expression} {rng.choice(OPERATORS)} {_number(rng)})"
+    return f"print {expression};"
+
+
+STATEMENTS: dict[str, Callable[[random.Random, int], str]] = {
+    "identifiers": _identifier_statement,
+    "numbers": _number_statement,
+    "strings": _string_statement,
+    "nested": _nested_statement,
+}
+
+KINDS = (*STATEMENTS, "long_line")
+
+
+def generate(kind: str, size: int, seed: int = 0) -> str:
+    """
+    Source of whole statements, one per line, at least size characters
+    long. The long_line kind puts identifier heavy statements on one line.
+    """
+    rng = random.Random(f"{kind}:{seed}")
+    if kind == "long_line":
+        statement, separator = _identifier_statement, " "
+    else:
+        statement, separator = STATEMENTS[kind], "\n"
+
+    lines = []
+    length = 0
+    while length < size:
+        line = statement(rng, len(lines))
+        lines.append(line)
+        length += len(line) + 1
+    return separator.join(lines) + "\n"
+
+
+def main() -> None:
+    kind = sys.argv[1]
+    size = int(sys.argv[2]) if len(sys.argv) > 2 else 100_000
+    seed = int(sys.argv[3]) if len(sys.argv) > 3 else 0
+    sys.stdout.write(generate(kind, size, seed))
+
+
+if __name__ == "__main__":
+    main()
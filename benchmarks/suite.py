@@ -0,0 +1,194 @@
+"""
+Measure throughput and peak memory of scanning, parsing and resolving the
+synthetic corpora over growing sizes, and compare runs against a stored
+JSON baseline.
+
+Usage:
+    python -m benchmarks.suite run [--sizes=25000,100000] [--repeat=3]
+        [--output=results.json]
+    python -m benchmarks.suite compare <baseline.json> [<results.json>]
+        [--threshold=0.2]
+
+Without a results file, compare runs the suite with the baseline's sizes
+first. It exits with 1 when any measurement regressed beyond the threshold.
+"""
+
+import argparse
+import gc
+import json
+import math
+import platform
+import sys
+import time
+import tracemalloc
+from dataclasses import dataclass
+from typing import Any, Callable
+
+from app.parser import Parser
+from app.resolver import Resolver
+from app.scanner import Scanner
+from app.symbols import SymbolTable
+from app.syntax import Stmt
+from app.tokenization import Token
+from benchmarks.corpus import KINDS, generate
+
+DEFAULT_SIZES = (25_000, 100_000, 400_000)
+DEFAULT_THRESHOLD = 0.2
+
+
+@dataclass(slots=True)
+class Corpus:
+    source: str
+    tokens: list[Token]
+    symbols: SymbolTable
+    statements: list[Stmt]
+
+    @classmethod
+    def generate(cls, kind: str, size: int) -> "Corpus":
+        source = generate(kind, size)
+        scanner = Scanner(source)
+        tokens, _ = scanner.scan_tokens()
+        statements = Parser(tokens, scanner.symbols).parse_program()
+        return cls(source, tokens, scanner.symbols, statements)
+
+
+def _scan(corpus: Corpus) -> Any:
+    return Scanner(corpus.source).scan_tokens()
+
+
+def _parse(corpus: Corpus) -> Any:
+    return Parser(corpus.tokens, corpus.symbols).parse_program()
+
+
+def _resolve(corpus: Corpus) -> Any:
+    # A full walk of every node, standing for tree traversal in general
+    return Resolver().resolve(corpus.statements)
+
+
+STAGES: dict[str, Callable[[Corpus], Any]] = {
+    "scan": _scan,
+    "parse": _parse,
+    "resolve": _resolve,
+}
+
+
+def measure(stage: Callable[[Corpus], Any], corpus: Corpus, repeat: int) -> dict:
+    best = math.inf
+    for _ in range(repeat):
+        gc.collect()
+        started = time.perf_counter()
+        stage(corpus)
+        best = min(best, time.perf_counter() - started)
+
+    # Traced separately, tracemalloc slows allocation down several times
+    gc.collect()
+    tracemalloc.start()
+    stage(corpus)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "tokens": len(corpus.tokens),
+        "seconds": best,
+        "tokens_per_second": len(corpus.tokens) / best,
+        "peak_bytes": peak,
+    }
+
+
+def run(sizes: list[int], repeat: int) -> dict:
+    results: dict[str, dict] = {}
+    scaling: dict[str, float] = {}
+    for kind in KINDS:
+        for size in sizes:
+            corpus = Corpus.generate(kind, size)
+            for stage_name, stage in STAGES.items():
+                result = measure(stage, corpus, repeat)
+                results[f"{stage_name}/{kind}/{size}"] = result
+                print(
+                    f"{stage_name:>8} {kind:>12} {size:>9}: "
+                    f"{result['tokens_per_second']:>12,.0f} tokens/s "
+                    f"{result['peak_bytes'] / 2**20:>8.1f} MiB",
+                    file=sys.stderr,
+                )
+
+        # Exponent of time over tokens between the smallest and largest
+        # corpus, about 1 for linear stages
+        if len(sizes) > 1:
+            for stage_name in STAGES:
+                first = results[f"{stage_name}/{kind}/{min(sizes)}"]
+                last = results[f"{stage_name}/{kind}/{max(sizes)}"]
+                scaling[f"{stage_name}/{kind}"] = math.log(
+                    last["seconds"] / first["seconds"]
+                ) / math.log(last["tokens"] / first["tokens"])
+
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "sizes": sizes,
+        "repeat": repeat,
+        "results": results,
+        "scaling": scaling,
+    }
+
+
+def compare(baseline: dict, current: dict, threshold: float) -> list[str]:
+    """Descriptions of the measurements worse than baseline by threshold."""
+    regressions = []
+    for key, before in baseline["results"].items():
+        after = current["results"].get(key)
+        if after is None:
+            continue
+        for metric in ("seconds", "peak_bytes"):
+            ratio = after[metric] / before[metric] if before[metric] else 1.0
+            if ratio > 1 + threshold:
+                regressions.append(
+                    f"{key} {metric}: {before[metric]:.6g} -> "
+                    f"{after[metric]:.6g} (+{ratio - 1:.0%})"
+                )
+    return regressions
+
+
+def main() -> None:
+    arguments = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    commands = arguments.add_subparsers(dest="command", required=True)
+    run_command = commands.add_parser("run")
+    run_command.add_argument(
+        "--sizes",
+        default=",".join(map(str, DEFAULT_SIZES)),
+        help="corpus sizes in characters, comma separated",
+    )
+    run_command.add_argument("--repeat", type=int, default=3)
+    run_command.add_argument("--output")
+    compare_command = commands.add_parser("compare")
+    compare_command.add_argument("baseline")
+    compare_command.add_argument("current", nargs="?")
+    compare_command.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    options = arguments.parse_args()
+
+    if options.command == "run":
+        sizes = [int(size) for size in options.sizes.split(",")]
+        report = json.dumps(run(sizes, options.repeat), indent=2)
+        if options.output:
+            with open(options.output, "w") as file:
+                file.write(report + "\n")
+        else:
+            print(report)
+        return
+
+    with open(options.baseline) as file:
+        baseline = json.load(file)
+    if options.current:
+        with open(options.current) as file:
+            current = json.load(file)
+    else:
+        current = run(baseline["sizes"], baseline["repeat"])
+
+    regressions = compare(baseline, current, options.threshold)
+    for regression in regressions:
+        print(f"regression {regression}")
+    if regressions:
+        exit(1)
+    print(f"no regressions beyond {options.threshold:.0%}")
+
+
+if __name__ == "__main__":
+    main()
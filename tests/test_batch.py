@@ -0,0 +1,71 @@
+import pytest
+
+from app.batch import batch, find_sources
+
+
+@pytest.fixture
+def tree(tmp_path):
+    (tmp_path / "sub").mkdir()
+    (tmp_path / "b.lox").write_text('print "b";\n')
+    (tmp_path / "a.lox").write_text("print 1;\n")
+    (tmp_path / "sub" / "c.lox").write_text("print 1 +;\n")
+    (tmp_path / "notes.txt").write_text("not lox\n")
+    return tmp_path
+
+
+class TestFindSources:
+    def test_directory_is_sorted_and_recursive(self, tree):
+        assert find_sources(str(tree)) == [
+            str(tree / "a.lox"),
+            str(tree / "b.lox"),
+            str(tree / "sub" / "c.lox"),
+        ]
+
+    def test_glob(self, tree):
+        assert find_sources(str(tree / "*.lox")) == [
+            str(tree / "a.lox"),
+            str(tree / "b.lox"),
+        ]
+
+    def test_glob_skips_directories(self, tree):
+        assert find_sources(str(tree / "**")) == [
+            str(tree / "a.lox"),
+            str(tree / "b.lox"),
+            str(tree / "notes.txt"),
+            str(tree / "sub" / "c.lox"),
+        ]
+
+    def test_manifest_is_relative_to_itself(self, tree):
+        manifest = tree / "manifest"
+        manifest.write_text("# checked in\nsub/c.lox\n\nb.lox\n")
+        assert find_sources(str(manifest)) == [
+            str(tree / "sub/c.lox"),
+            str(tree / "b.lox"),
+        ]
+
+
+class TestBatch:
+    def test_runs_files_in_order(self, tree, capsys):
+        assert batch(["run", str(tree), "--jobs=2", "--cache=off"]) == 65
+        captured = capsys.readouterr()
+        assert captured.out == (
+            f"==> {tree / 'a.lox'} <==\n1\n"
+            f"==> {tree / 'b.lox'} <==\nb\n"
+            f"==> {tree / 'sub' / 'c.lox'} <==\n"
+        )
+        assert captured.err.splitlines() == [
+            f"{tree / 'sub' / 'c.lox'}: [line 1] Error at ';': Expect expression.",
+            f"{tree / 'sub' / 'c.lox'}: exit 65",
+            "3 files, 2 ok, 1 failed, exit 65: 1",
+        ]
+
+    def test_all_ok(self, tree, capsys):
+        assert batch(["tokenize", str(tree / "*.lox")]) == 0
+        assert capsys.readouterr().err == "2 files, 2 ok, 0 failed\n"
+
+    @pytest.mark.parametrize(
+        "arguments",
+        [["run"], ["frob", "."], ["run", ".", "--format=binary"], ["run", "missing"]],
+    )
+    def test_usage_errors(self, tree, arguments):
+        assert batch(arguments) == 1
@@ -0,0 +1,45 @@
+import pytest
+
+from app.parser import Parser
+from app.resolver import Resolver
+from app.scanner import Scanner
+from benchmarks.corpus import KINDS, generate
+from benchmarks.suite import compare
+
+
+class TestCorpus:
+    @pytest.mark.parametrize("kind", KINDS)
+    def test_deterministic_valid_programs(self, kind):
+        source = generate(kind, 5000)
+        assert len(source) >= 5000
+        assert source == generate(kind, 5000)
+        assert source != generate(kind, 5000, seed=1)
+
+        scanner = Scanner(source)
+        tokens, errors = scanner.scan_tokens()
+        assert not errors
+        statements = Parser(tokens, scanner.symbols).parse_program()
+        assert not Resolver().resolve(statements)
+
+    def test_long_line(self):
+        assert generate("long_line", 5000).count("\n") == 1
+
+
+class TestCompare:
+    def test_flags_regressions_beyond_threshold(self):
+        baseline = {
+            "results": {
+                "scan/numbers/100": {"seconds": 1.0, "peak_bytes": 100},
+                "parse/numbers/100": {"seconds": 1.0, "peak_bytes": 100},
+            }
+        }
+        current = {
+            "results": {
+                "scan/numbers/100": {"seconds": 1.1, "peak_bytes": 100},
+                "parse/numbers/100": {"seconds": 0.5, "peak_bytes": 150},
+            }
+        }
+        assert compare(baseline, current, 0.2) == [
+            "parse/numbers/100 peak_bytes: 100 -> 150 (+50%)"
+        ]
+        assert len(compare(baseline, current, 0.05)) == 2
@@ -0,0 +1,81 @@
+import random
+import tracemalloc
+from decimal import Decimal
+
+import pytest
+
+from app.parser import Parser
+from app.scanner import Scanner
+from app.tokenization import Token, TokenType
+
+
+class TestTokenBuffer:
+    def test_lazy_tokens(self):
+        buffer, errors = Scanner('var name = "abc" + 4.5;').scan_buffer()
+
+        assert not errors
+        assert len(buffer) == 8
+        assert buffer.type(1) == TokenType.IDENTIFIER
+        assert buffer.lexeme(1) == "name"
+        assert buffer.literal(3) == "abc"
+        assert buffer.literal(5) == Decimal("4.5")
+        assert buffer[3] == Token(TokenType.STRING, '"abc"', "abc", 1)
+        assert buffer[-1] == Token(TokenType.EOF, "", None, 1)
+        assert buffer[5:7] == [
+            Token(TokenType.NUMBER, "4.5", Decimal("4.5"), 1),
+            Token(TokenType.SEMICOLON, ";", None, 1),
+        ]
+        with pytest.raises(IndexError):
+            buffer[8]
+
+    @pytest.mark.parametrize(
+        "source",
+        ["", "\n\n", 'a\r\nb "x" 1.5 // c\n@\x0c"open', "(){}\t!= 12ab", '"'],
+    )
+    def test_matches_scan_tokens(self, source):
+        buffer, buffer_errors = Scanner(source).scan_buffer()
+        tokens, errors = Scanner(source).scan_tokens()
+
+        assert list(buffer) == tokens
+        # Only buffer errors know their offset
+        assert [(type(error), str(error)) for error in buffer_errors] == [
+            (type(error), str(error)) for error in errors
+        ]
+
+    def test_matches_scan_tokens_on_random_input(self):
+        alphabet = list(' \t\n\r.,;(){}+-*/!=<>"@az_Z09') + ["//", "or", "1.5"]
+        rnd = random.Random(7)
+        for _ in range(500):
+            source = "".join(rnd.choices(alphabet, k=rnd.randint(0, 30)))
+            assert list(Scanner(source).scan_buffer()[0]) == (
+                Scanner(source).scan_tokens()[0]
+            ), source
+
+    def test_parser_accepts_buffer(self):
+        buffer, _ = Scanner('(true == "bar") + 42').scan_buffer()
+        assert str(Parser(buffer).parse()) == "(+ (group (== true bar)) 42.0)"
+
+    def test_compact(self):
+        source = "var counter = counter + 1.5;\n" * 1000
+
+        tracemalloc.start()
+        buffer = Scanner(source).scan_buffer()[0]
+        buffer_bytes = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+
+        tracemalloc.start()
+        tokens = Scanner(source).scan_tokens()[0]
+        token_bytes = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+
+        assert len(buffer) == len(tokens)
+        assert buffer_bytes * 10 < token_bytes
+
+    def test_columns_widen_with_the_source(self):
+        small = Scanner("print 1;").scan_buffer()[0]
+        assert small.starts.typecode == "H"
+        source = "print 1;\n" * 8000
+        buffer = Scanner(source).scan_buffer()[0]
+        assert buffer.starts.typecode == buffer.lines.typecode == "I"
+        assert buffer[-2].offset == len(source) - 2
+        assert buffer[-1].line == 8000
@@ -0,0 +1,218 @@
+import io
+
+import pytest
+
+from app.bytecode import BytecodeCompiler, Chunk, OpCode, disassemble
+from app.errors import LoxRuntimeError, ParseError
+from app.parser import Parser
+from app.scanner import Scanner
+from app.vm import VirtualMachine
+
+
+def compile_program(source: str):
+    tokens, errors = Scanner(source).scan_tokens()
+    assert not errors
+    return BytecodeCompiler().compile_program(Parser(tokens).parse_program())
+
+
+def run(source: str) -> str:
+    stdout = io.StringIO()
+    VirtualMachine(stdout).interpret(compile_program(source))
+    return stdout.getvalue()
+
+
+class TestBytecodeCompiler:
+    def test_chunk_layout(self):
+        function = compile_program("var a = 1;\nprint a + 1;")
+        chunk = function.chunk
+        assert list(chunk.code) == [
+            OpCode.CONSTANT, 0, 0,
+            OpCode.DEFINE_GLOBAL, 0, 1,
+            OpCode.GET_GLOBAL, 0, 1,
+            OpCode.CONSTANT, 0, 0,
+            OpCode.ADD,
+            OpCode.PRINT,
+            OpCode.NIL,
+            OpCode.RETURN,
+        ]  # fmt: skip
+        assert chunk.constants == [1.0, "a"]
+        assert list(chunk.lines) == [1] * 6 + [2] * 10
+
+    def test_constants_keep_types_apart(self):
+        function = compile_program('print 1; print "1"; print 1;')
+        assert function.chunk.constants == [1.0, "1"]
+
+    def test_signed_zeros_keep_apart(self):
+        # Folding turns -0 into a -0.0 constant
+        chunk = Chunk()
+        assert [chunk.add_constant(value) for value in (-0.0, 0.0, -0.0)] == [0, 1, 0]
+        assert str(chunk.constants[0]) == "-0.0"
+
+    def test_classes(self):
+        source = "class A < B { f() { return super.f(this.x); } }\nA().f();"
+        listing = "\n".join(disassemble(compile_program(source)))
+        for opcode in ("CLASS", "INHERIT", "METHOD", "GET_PROPERTY", "GET_SUPER"):
+            assert opcode in listing
+        assert "INVOKE            (0 args)    4 'f'" in listing
+
+    def test_locals_and_upvalues(self):
+        function = compile_program(
+            "{ var x = 1; fun f() { return x; } }",
+        )
+        nested = [c for c in function.chunk.constants if hasattr(c, "chunk")]
+        assert nested[0].upvalue_count == 1
+        assert OpCode.CLOSE_UPVALUE in function.chunk.code
+        assert OpCode.GET_UPVALUE in nested[0].chunk.code
+
+    def test_disassemble(self):
+        listing = list(disassemble(compile_program("fun f(a) { return a; }\nf(1);")))
+        assert listing == [
+            "== <script> ==",
+            "0000    1 CLOSURE              0 '<fn f>'",
+            "0003    | DEFINE_GLOBAL        1 'f'",
+            "0006    2 GET_GLOBAL           1 'f'",
+            "0009    | CONSTANT             2 '1'",
+            "0012    | CALL                 1",
+            "0014    | POP",
+            "0015    | NIL",
+            "0016    | RETURN",
+            "== f ==",
+            "0000    1 GET_LOCAL            1",
+            "0002    | RETURN",
+            "0003    | NIL",
+            "0004    | RETURN",
+        ]
+
+    @pytest.mark.parametrize(
+        "source, message",
+        [
+            ("return 1;", "[line 1] Error at 'return': Can't return from top-level code."),
+            (
+                "{ var a = a; }",
+                "[line 1] Error at 'a': Can't read local variable in its own initializer.",
+            ),
+            (
+                "{ var a; var a; }",
+                "[line 1] Error at 'a': Already a variable with this name in this scope.",
+            ),
+            (
+                "fun f(a, a) {}",
+                "[line 1] Error at 'a': Already a variable with this name in this scope.",
+            ),
+        ],
+    )
+    def test_errors(self, source, message):
+        with pytest.raises(ParseError) as error:
+            compile_program(source)
+        assert str(error.value) == message
+
+
+class TestVirtualMachine:
+    def test_closures_capture_variables_not_values(self):
+        source = """
+            var get; var set;
+            {
+                var shared = "before";
+                fun g() { return shared; }
+                fun s(value) { shared = value; }
+                get = g; set = s;
+            }
+            set("after");
+            print get();
+        """
+        assert run(source) == "after\n"
+
+    def test_each_iteration_closes_its_own_variable(self):
+        source = """
+            var first; var second;
+            for (var i = 0; i < 2; i = i + 1) {
+                var j = i;
+                fun show() { print j; }
+                if (first == nil) first = show; else second = show;
+            }
+            first();
+            second();
+        """
+        assert run(source) == "0\n1\n"
+
+    def test_nested_upvalues(self):
+        source = """
+            fun outer() {
+                var x = 1;
+                fun middle() { fun inner() { x = x + 1; return x; } return inner; }
+                return middle();
+            }
+            var f = outer();
+            f();
+            print f();
+        """
+        assert run(source) == "3\n"
+
+    def test_stack_overflow(self):
+        vm = VirtualMachine(io.StringIO())
+        with pytest.raises(LoxRuntimeError) as error:
+            vm.interpret(compile_program("fun f(n) { return 1 + f(n); }\nf(0);"))
+        assert str(error.value) == "Stack overflow.\n[line 1]"
+        assert vm.stack == []
+
+    def test_max_depth(self):
+        source = "fun f(n) { if (n == 0) return 0; return 1 + f(n - 1); }\n"
+        # f(10) down to f(0) are 11 calls deep
+        program = compile_program(source + "print f(10);")
+        VirtualMachine(io.StringIO(), max_depth=11).interpret(program)
+        with pytest.raises(LoxRuntimeError) as error:
+            VirtualMachine(io.StringIO(), max_depth=10).interpret(program)
+        assert str(error.value) == "Stack overflow.\n[line 1]"
+
+    def test_deep_recursion(self):
+        source = """
+            fun count(n) { if (n == 0) return 0; return 1 + count(n - 1); }
+            print count(20000);
+        """
+        assert run(source) == "20000\n"
+
+    def test_tail_calls_reuse_the_frame(self):
+        source = """
+            fun even(n) { if (n == 0) return true; return odd(n - 1); }
+            fun odd(n) { if (n == 0) return false; return even(n - 1); }
+            print even(100001);
+        """
+        stdout = io.StringIO()
+        VirtualMachine(stdout, max_depth=2).interpret(compile_program(source))
+        assert stdout.getvalue() == "false\n"
+
+    def test_tail_call_closes_upvalues(self):
+        source = """
+            fun identity(f) { return f; }
+            fun make() {
+                var x = "captured";
+                fun get() { return x; }
+                return identity(get);
+            }
+            print make()();
+            fun native() { return clock() >= 0; }
+            print native();
+        """
+        assert run(source) == "captured\ntrue\n"
+        function = compile_program("fun f() { return f(); }")
+        assert OpCode.TAIL_CALL in function.chunk.constants[0].chunk.code
+
+    def test_deep_method_recursion(self):
+        source = """
+            class Node {
+                init(next) { this.next = next; }
+                length() {
+                    if (this.next == nil) return 1;
+                    return 1 + this.next.length();
+                }
+            }
+            var list = nil;
+            for (var i = 0; i < 20000; i = i + 1) list = Node(list);
+            print list.length();
+        """
+        assert run(source) == "20000\n"
+
+    def test_error_line_inside_function(self):
+        with pytest.raises(LoxRuntimeError) as error:
+            run('fun f() {\n  return -"x";\n}\nf();')
+        assert str(error.value) == "Operand must be a number.\n[line 2]"
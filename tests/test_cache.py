@@ -0,0 +1,127 @@
+import os
+import pickle
+
+from app.cache import HEADER, ArtifactCache, MemoryCache, configured_directory
+from app.main import cache_directory
+from app.parser import Parser
+from app.scanner import Scanner
+from app.tokenization import DEFERRED, NumericMode, Token
+
+SOURCE = "fun add(a, b) { return a + b; }\nprint add(1, 2.5);"
+
+
+def parse_program(source: str):
+    tokens, errors = Scanner(source).scan_buffer()
+    assert not errors
+    return Parser(tokens).parse_program()
+
+
+class TestArtifactCache:
+    def test_round_trip(self, tmp_path):
+        cache = ArtifactCache(str(tmp_path))
+        key = cache.key(SOURCE, "program")
+        assert cache.load(key) is None
+
+        program = parse_program(SOURCE)
+        cache.store(key, program)
+        loaded = cache.load(key)
+        assert [str(s) for s in loaded] == [str(s) for s in program]
+        assert os.listdir(tmp_path) == [key + ".loxc"]
+
+    def test_key_covers_source_and_options(self):
+        key = ArtifactCache.key(SOURCE, "program", "decimal")
+        assert key == ArtifactCache.key(SOURCE, "program", "decimal")
+        assert key != ArtifactCache.key(SOURCE + " ", "program", "decimal")
+        assert key != ArtifactCache.key(SOURCE, "evaluate", "decimal")
+        assert key != ArtifactCache.key(SOURCE, "program", "float")
+
+    def test_deferred_numbers_survive(self):
+        token = Token.number("2.5", 3, NumericMode.FLOAT)
+        loaded = pickle.loads(pickle.dumps(token, pickle.HIGHEST_PROTOCOL))
+        assert loaded._literal is DEFERRED
+        assert loaded == token
+        assert loaded.literal == 2.5
+
+    def test_corrupt_entries_are_misses(self, tmp_path):
+        cache = ArtifactCache(str(tmp_path))
+        key = cache.key(SOURCE)
+        with open(cache.path(key), "wb") as file:
+            file.write(HEADER + b"garbage")
+        assert cache.load(key) is None
+        assert not os.path.exists(cache.path(key))
+
+        with open(cache.path(key), "wb") as file:
+            file.write(b"LOXC\xff\xff" + pickle.dumps([1]))
+        assert cache.load(key) is None
+
+    def test_least_recently_used_are_evicted(self, tmp_path):
+        entry_size = len(HEADER) + len(pickle.dumps("x" * 100, 5))
+        cache = ArtifactCache(str(tmp_path), max_bytes=entry_size * 2)
+        keys = [cache.key(str(i)) for i in range(3)]
+
+        cache.store(keys[0], "x" * 100)
+        cache.store(keys[1], "x" * 100)
+        os.utime(cache.path(keys[0]), (1, 1))
+        os.utime(cache.path(keys[1]), (2, 2))
+        # A hit makes the oldest entry the most recently used one
+        assert cache.load(keys[0]) == "x" * 100
+
+        cache.store(keys[2], "x" * 100)
+        assert sorted(os.listdir(tmp_path)) == sorted(
+            key + ".loxc" for key in (keys[0], keys[2])
+        )
+
+    def test_oversized_artifacts_are_not_stored(self, tmp_path):
+        cache = ArtifactCache(str(tmp_path), max_bytes=64)
+        cache.store(cache.key(SOURCE), "x" * 100)
+        assert os.listdir(tmp_path) == []
+
+    def test_unwritable_directory_is_ignored(self, tmp_path):
+        blocker = tmp_path / "file"
+        blocker.write_text("")
+        cache = ArtifactCache(str(blocker / "cache"))
+        key = cache.key(SOURCE)
+        cache.store(key, "value")
+        assert cache.load(key) is None
+
+    def test_directory_is_private(self, tmp_path):
+        cache = ArtifactCache(str(tmp_path / "cache"))
+        cache.store(cache.key(SOURCE), "value")
+        assert os.stat(tmp_path / "cache").st_mode & 0o777 == 0o700
+
+    def test_entries_of_other_users_are_misses(self, tmp_path, monkeypatch):
+        cache = ArtifactCache(str(tmp_path))
+        key = cache.key(SOURCE)
+        cache.store(key, "value")
+        monkeypatch.setattr(os, "getuid", lambda: os.stat(tmp_path).st_uid + 1)
+        assert cache.load(key) is None
+
+    def test_off_unless_asked_for(self, tmp_path, monkeypatch):
+        monkeypatch.delenv("LOX_CACHE_DIR", raising=False)
+        assert configured_directory() is None
+        assert cache_directory("off") is None
+        assert cache_directory("").endswith(os.path.join(".cache", "lox"))
+        monkeypatch.setenv("LOX_CACHE_DIR", str(tmp_path))
+        assert configured_directory() == cache_directory("") == str(tmp_path)
+
+
+class TestMemoryCache:
+    def test_loads_fresh_copies(self):
+        cache = MemoryCache()
+        key = ArtifactCache.key(SOURCE, "program")
+        assert cache.load(key) is None
+
+        program = parse_program(SOURCE)
+        cache.store(key, program)
+        first, second = cache.load(key), cache.load(key)
+        assert [str(s) for s in first] == [str(s) for s in program]
+        assert first is not second and first[0] is not second[0]
+
+    def test_evicts_least_recently_used(self):
+        cache = MemoryCache(max_bytes=150)
+        cache.store("a", "x" * 40)
+        cache.store("b", "y" * 40)
+        cache.load("a")
+        cache.store("c", "z" * 40)
+        assert list(cache.entries) == ["a", "c"]
+        assert cache.size <= 150
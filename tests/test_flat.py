@@ -0,0 +1,103 @@
+import random
+import sys
+
+import pytest
+
+from app.errors import ParseError
+from app.flat import FlatParser, NodeKind
+from app.parser import Parser
+from app.scanner import Scanner
+
+SOURCES = [
+    "1 + 2 * 3 - 4 / 5",
+    '("foo" == "bar") != !true',
+    "-a.b(c, d = 1)(e).f",
+    "a.b = c = d or e and nil",
+    "super.method(this)",
+    "f()",
+    "(1 + 2",
+    "f(1, 2",
+    "1 + 2 = 3",
+    "a.",
+    "super x",
+    ")",
+]
+
+
+def _result(parser_class, source):
+    tokens, _ = Scanner(source).scan_tokens()
+    try:
+        return str(parser_class(tokens).parse())
+    except ParseError as error:
+        return str(error)
+
+
+class TestFlatParser:
+    @pytest.mark.parametrize("source", SOURCES)
+    def test_matches_parser(self, source):
+        assert _result(FlatParser, source) == _result(Parser, source)
+
+    def test_matches_parser_on_random_input(self):
+        pieces = ["1", '"s"', "true", "nil", "a", "this", "super.m", "super"]
+        pieces += ["+", "*", "==", "<", "and", "or", "=", "!", "-", "(", ")", ","]
+        pieces += [".", ".x", "()"]
+        rnd = random.Random(3)
+        for _ in range(3000):
+            source = " ".join(rnd.choices(pieces, k=rnd.randint(1, 10)))
+            assert _result(FlatParser, source) == _result(Parser, source), source
+
+    def test_deep_nesting_uses_constant_stack(self):
+        depth = 100_000
+        tokens, _ = Scanner("(" * depth + "-1" + ")" * depth).scan_tokens()
+        limit = sys.getrecursionlimit()
+        sys.setrecursionlimit(100)
+        try:
+            tree = FlatParser(tokens).parse()
+            rendered = str(tree)
+            nodes = sum(1 for _ in tree.preorder())
+        finally:
+            sys.setrecursionlimit(limit)
+
+        assert rendered == "(group " * depth + "(- 1.0)" + ")" * depth
+        assert nodes == depth + 2
+
+    def test_structure(self):
+        tokens, _ = Scanner("f(1, 2) + x").scan_tokens()
+        tree = FlatParser(tokens).parse()
+
+        assert [tree.kind(index) for index in tree.postorder()] == [
+            NodeKind.VARIABLE,
+            NodeKind.LITERAL,
+            NodeKind.LITERAL,
+            NodeKind.CALL,
+            NodeKind.VARIABLE,
+            NodeKind.BINARY,
+        ]
+        assert tree.children(tree.root) == [3, 4]
+        assert tree.children(3) == [0, 1, 2]
+        assert tree.token(tree.root).lexeme == "+"
+        assert list(tree.preorder()) == [5, 3, 0, 1, 2, 4]
+
+    def test_fold_dispatches_by_kind(self):
+        tokens, _ = Scanner("(1 + 2) * -3").scan_tokens()
+        tree = FlatParser(tokens).parse()
+
+        def literal(tree, index, children):
+            return float(tree.token(index).lexeme)
+
+        def grouping(tree, index, children):
+            return children[0]
+
+        def unary(tree, index, children):
+            return -children[0]
+
+        def binary(tree, index, children):
+            left, right = children
+            return left + right if tree.token(index).lexeme == "+" else left * right
+
+        handlers = [None] * len(NodeKind)
+        handlers[NodeKind.LITERAL] = literal
+        handlers[NodeKind.GROUPING] = grouping
+        handlers[NodeKind.UNARY] = unary
+        handlers[NodeKind.BINARY] = binary
+        assert tree.fold(handlers) == -9.0
@@ -0,0 +1,141 @@
+import random
+import re
+
+import pytest
+
+from app.errors import ParseError
+from app.incremental import Document, TextEdit
+from app.parser import Parser
+from app.scanner import Scanner, ScanEngine
+
+SOURCE = (
+    "var a = 1;\n"
+    "if (a > 0) print a;\n"
+    "fun f(x) {\n"
+    "  return x + 1;\n"
+    "}\n"
+    "print f(a);\n"
+)
+
+
+def describe(statements) -> str:
+    # Symbol ids depend on the order names were first seen
+    return re.sub(r"symbol=\d+", "", repr(statements))
+
+
+def assert_fresh(document: Document):
+    """The document holds what scanning and parsing its source anew gives."""
+    scanner = Scanner(document.source, engine=ScanEngine.REGEX)
+    tokens, errors = scanner.scan_tokens()
+    assert list(map(str, document.tokens)) == list(map(str, tokens))
+    assert [str(error) for error in document.errors] == [
+        str(error) for error in errors
+    ] + ([str(document.parse_error)] if document.parse_error else [])
+    try:
+        statements = Parser(tokens, scanner.symbols).parse_program()
+    except ParseError as error:
+        assert str(document.parse_error) == str(error)
+    else:
+        assert document.parse_error is None
+        assert describe(document.statements) == describe(statements)
+
+
+class TestDocument:
+    def test_initial_state(self):
+        document = Document(SOURCE)
+        assert document.source == SOURCE
+        assert len(document.statements) == 4
+        assert document.tokens[-1].line == 6
+        assert_fresh(document)
+
+    def test_edit_within_line(self):
+        document = Document(SOURCE)
+        update = document.edit(TextEdit((3, 13), (3, 14), "2"))
+        assert document.lines[3] == "  return x + 2;"
+        assert update.lines == range(3, 4)
+        # The function and the statement before it, nothing after
+        assert update.statements == range(1, 3)
+        assert_fresh(document)
+
+    def test_inserted_lines_shift_tokens_below(self):
+        document = Document(SOURCE)
+        last = document.statements[-1]
+        update = document.edit(TextEdit((1, 0), (1, 0), "var b = 2;\nvar c = 3;\n"))
+        assert update.lines == range(1, 4)
+        assert update.statements == range(0, 4)
+        assert document.statements[-1] is last
+        assert document.tokens[-2].line == 8
+        assert_fresh(document)
+
+    def test_removed_lines(self):
+        document = Document(SOURCE)
+        document.edit(TextEdit((2, 0), (5, 0), ""))
+        assert document.source == "var a = 1;\nif (a > 0) print a;\nprint f(a);\n"
+        assert len(document.statements) == 3
+        assert_fresh(document)
+
+    def test_else_extends_statement_before_edit(self):
+        document = Document(SOURCE)
+        document.edit(TextEdit((2, 0), (2, 0), "else print 0;\n"))
+        assert len(document.statements) == 4
+        assert_fresh(document)
+
+    def test_unterminated_string_error_line(self):
+        document = Document(SOURCE)
+        document.edit(TextEdit((0, 0), (0, 0), '"open\n'))
+        assert [str(error) for error in document.errors][0] == (
+            "[line 1] Error: Unterminated string."
+        )
+        assert_fresh(document)
+
+    def test_parse_error_recovers_after_fix(self):
+        document = Document(SOURCE)
+        document.edit(TextEdit((0, 9), (0, 10), ""))
+        assert document.parse_error is not None
+        assert document.statements == []
+        document.edit(TextEdit((0, 9), (0, 9), ";"))
+        assert document.parse_error is None
+        assert len(document.statements) == 4
+        assert_fresh(document)
+
+    def test_apply_in_order(self):
+        document = Document("")
+        updates = document.apply(
+            [
+                TextEdit((0, 0), (0, 0), "print 1;\n"),
+                TextEdit((1, 0), (1, 0), "print 2;"),
+            ]
+        )
+        assert document.source == "print 1;\nprint 2;"
+        assert [update.lines for update in updates] == [range(0, 2), range(1, 2)]
+        assert_fresh(document)
+
+    @pytest.mark.parametrize("seed", range(3))
+    def test_random_edits_match_fresh_scan(self, seed):
+        pieces = ["", ";", "\n", "else print 1;", "}", "{", "var z = 2;\n", "@"]
+        document = Document(SOURCE * 5)
+        rng = random.Random(seed)
+        for _ in range(200):
+            lines = document.lines
+            start = rng.randrange(len(lines))
+            end = min(len(lines) - 1, start + rng.randrange(3))
+            start_column = rng.randrange(len(lines[start]) + 1)
+            end_column = rng.randrange(len(lines[end]) + 1)
+            if start == end and end_column < start_column:
+                start_column, end_column = end_column, start_column
+            text = rng.choice(pieces)
+            document.edit(TextEdit((start, start_column), (end, end_column), text))
+            # Line numbers are fixed lazily, so only look now and then
+            if rng.random() < 0.2:
+                assert_fresh(document)
+        assert_fresh(document)
+
+    def test_edits_splice_in_place(self):
+        document = Document(SOURCE * 3)
+        statements = document.statements
+        first = statements[0]
+        document.edit(TextEdit((6, 0), (6, 0), "print 2;\nprint 3;\n"))
+        assert document.statements is statements
+        assert statements[0] is first
+        assert len(statements) == 14
+        assert_fresh(document)
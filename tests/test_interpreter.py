@@ -0,0 +1,249 @@
+import io
+
+import pytest
+
+from app.closures import ClosureCompiler
+from app.errors import LoxRuntimeError
+from app.interpreter import Interpreter
+from app.parser import Parser
+from app.resolver import Resolver
+from app.runtime import stringify
+from app.scanner import Scanner
+from app.transpiler import PythonEngine
+from app.vm import VirtualMachine
+
+BACKENDS = [Interpreter, ClosureCompiler, VirtualMachine, PythonEngine]
+
+
+def evaluate(backend, source: str):
+    tokens, errors = Scanner(source).scan_tokens()
+    assert not errors
+    expression = Parser(tokens).parse()
+    assert not Resolver().resolve_expression(expression)
+    return backend().evaluate(expression)
+
+
+def parse_program(source: str):
+    tokens, errors = Scanner(source).scan_tokens()
+    assert not errors
+    statements = Parser(tokens).parse_program()
+    assert not Resolver().resolve(statements)
+    return statements
+
+
+def run(backend, source: str) -> str:
+    stdout = io.StringIO()
+    backend(stdout).run(parse_program(source))
+    return stdout.getvalue()
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+class TestEvaluate:
+    @pytest.mark.parametrize(
+        "source, expected",
+        [
+            ("1 + 2 * 3", "7"),
+            ("(10.40 * 2) / 4", "5.2"),
+            ('"foo" + "bar"', "foobar"),
+            ("!nil", "true"),
+            ("-(-3)", "3"),
+            ("1 == 1.0", "true"),
+            ('1 == "1"', "false"),
+            ("nil == false", "false"),
+            ("3 >= 4 != true", "true"),
+            ("nil or 2", "2"),
+            ("false and missing", "false"),
+            ("1 / 0", "Infinity"),
+            ("-1 / 0", "-Infinity"),
+            ("0 / 0", "NaN"),
+            ("-0", "-0"),
+        ],
+    )
+    def test_expressions(self, backend, source, expected):
+        assert stringify(evaluate(backend, source)) == expected
+
+    @pytest.mark.parametrize(
+        "source, message",
+        [
+            ('-"a"', "Operand must be a number.\n[line 1]"),
+            ('1 + "a"', "Operands must be two numbers or two strings.\n[line 1]"),
+            ("true * 2", "Operands must be numbers.\n[line 1]"),
+            ("2 < nil", "Operands must be numbers.\n[line 1]"),
+            ("missing", "Undefined variable 'missing'.\n[line 1]"),
+            ('"f"()', "Can only call functions and classes.\n[line 1]"),
+            ("clock(1)", "Expected 0 arguments but got 1.\n[line 1]"),
+        ],
+    )
+    def test_runtime_errors(self, backend, source, message):
+        with pytest.raises(LoxRuntimeError) as error:
+            evaluate(backend, source)
+        assert str(error.value) == message
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+class TestRun:
+    def test_scopes(self, backend):
+        source = """
+            var a = "global";
+            {
+                var a = "outer";
+                { a = "assigned"; print a; }
+                print a;
+            }
+            print a;
+        """
+        assert run(backend, source) == "assigned\nassigned\nglobal\n"
+
+    def test_control_flow(self, backend):
+        source = """
+            var total = 0;
+            for (var i = 0; i < 5; i = i + 1) {
+                if (i == 2) total = total + 10; else total = total + i;
+            }
+            while (total > 15) total = total - 2;
+            print total;
+        """
+        assert run(backend, source) == "14\n"
+
+    def test_functions_and_closures(self, backend):
+        source = """
+            fun fib(n) { if (n < 2) return n; return fib(n - 1) + fib(n - 2); }
+            print fib(15);
+            fun counter() {
+                var count = 0;
+                fun increment() { count = count + 1; return count; }
+                return increment;
+            }
+            var next = counter();
+            next();
+            print next();
+            fun nothing() {}
+            print nothing();
+            print fib;
+        """
+        assert run(backend, source) == "610\n2\nnil\n<fn fib>\n"
+
+    def test_closures_capture_each_iteration(self, backend):
+        source = """
+            var first;
+            var second;
+            for (var i = 0; i < 2; i = i + 1) {
+                var j = i;
+                fun show() { print j; }
+                if (i == 0) first = show; else second = show;
+            }
+            first();
+            second();
+        """
+        assert run(backend, source) == "0\n1\n"
+
+    def test_return_from_loop(self, backend):
+        source = """
+            fun first(limit) {
+                for (var i = 0; ; i = i + 1) { if (i * i > limit) return i; }
+            }
+            print first(50);
+        """
+        assert run(backend, source) == "8\n"
+
+    def test_assignment_in_own_initializer(self, backend):
+        source = "{ var b = (b = 0); print b; var c = 1 + (c = 5); print c; }"
+        assert run(backend, source) == "0\n6\n"
+
+    def test_runtime_error_stops_program(self, backend):
+        stdout = io.StringIO()
+        statements = parse_program('print 1;\nprint -"x";\nprint 2;')
+        with pytest.raises(LoxRuntimeError) as error:
+            backend(stdout).run(statements)
+        assert stdout.getvalue() == "1\n"
+        assert str(error.value) == "Operand must be a number.\n[line 2]"
+
+    def test_stack_overflow(self, backend):
+        with pytest.raises(LoxRuntimeError) as error:
+            run(backend, "fun f(n) {\n  return 1 + f(n);\n}\nf(0);")
+        assert str(error.value) == "Stack overflow.\n[line 2]"
+
+    def test_wrong_arity(self, backend):
+        with pytest.raises(LoxRuntimeError) as error:
+            run(backend, "fun f(a, b) {}\nf(1);")
+        assert str(error.value) == "Expected 2 arguments but got 1.\n[line 2]"
+
+
+@pytest.mark.parametrize("backend", [ClosureCompiler, VirtualMachine])
+class TestClasses:
+    """Classes run on the closure backend and the vm only so far."""
+
+    def test_fields_methods_and_initializers(self, backend):
+        source = """
+            class Point {
+                init(x, y) { this.x = x; this.y = y; }
+                sum() { return this.x + this.y; }
+            }
+            var p = Point(1, 2);
+            print p;
+            print Point;
+            print p.sum();
+            p.x = 10;
+            print p.sum();
+            print p.init(3, 4).sum();
+            var method = p.sum;
+            print method;
+            print method();
+        """
+        assert run(backend, source) == (
+            "Point instance\nPoint\n3\n12\n7\n<fn sum>\n7\n"
+        )
+
+    def test_inheritance_and_super(self, backend):
+        source = """
+            class A { name() { return "A"; } greet() { print "hi " + this.name(); } }
+            class B < A { name() { return "B" + super.name(); } }
+            class C < B {}
+            C().greet();
+        """
+        assert run(backend, source) == "hi BA\n"
+
+    def test_fields_shadow_methods(self, backend):
+        source = """
+            class A { m() { return "method"; } }
+            fun f() { return "field"; }
+            var a = A();
+            print a.m();
+            a.m = f;
+            print a.m();
+        """
+        assert run(backend, source) == "method\nfield\n"
+
+    def test_return_in_initializer_gives_instance(self, backend):
+        source = """
+            class A { init() { this.v = 1; return; this.v = 2; } }
+            print A().v;
+        """
+        assert run(backend, source) == "1\n"
+
+    @pytest.mark.parametrize(
+        "source, message",
+        [
+            ("class A {}\nprint A().x;", "Undefined property 'x'.\n[line 2]"),
+            ('var a = "s";\nprint a.x;', "Only instances have properties.\n[line 2]"),
+            ("var a = 1;\na.x = 2;", "Only instances have fields.\n[line 2]"),
+            ("var B = 1;\nclass A < B {}", "Superclass must be a class.\n[line 2]"),
+            ("class A {}\nA(1);", "Expected 0 arguments but got 1.\n[line 2]"),
+            (
+                "class A { init(a) {} }\nA();",
+                "Expected 1 arguments but got 0.\n[line 2]",
+            ),
+            (
+                "class A {\n  init(n) { A(n + 1); }\n}\nA(0);",
+                "Stack overflow.\n[line 2]",
+            ),
+            (
+                "class A { f() { this.g(); } }\nvar a = A();\na.g = a.f;\na.f();",
+                "Stack overflow.\n[line 1]",
+            ),
+        ],
+    )
+    def test_runtime_errors(self, backend, source, message):
+        with pytest.raises(LoxRuntimeError) as error:
+            run(backend, source)
+        assert str(error.value) == message
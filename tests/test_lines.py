@@ -0,0 +1,60 @@
+import random
+
+import pytest
+
+from app.lines import LineIndex
+from app.scanner import Scanner
+
+
+def positions(source: str) -> list[tuple[int, int]]:
+    """Line and column of every offset, by walking the lines."""
+    result = []
+    for number, line in enumerate(source.splitlines(keepends=True) or [""], 1):
+        result.extend((number, column) for column in range(1, len(line) + 1))
+    return result
+
+
+class TestLineIndex:
+    @pytest.mark.parametrize(
+        "source", ["", "a", "a\n", "\n\n", "ab\r\ncd\re\x0cf", "x y\n\nz"]
+    )
+    def test_positions_match_lines(self, source):
+        index = LineIndex.build(source)
+        assert len(index) == max(len(source.splitlines()), 1)
+        for offset, position in enumerate(positions(source)):
+            assert index.position(offset) == position
+            assert index.line(offset) == position[0]
+            assert index.column(offset) == position[1]
+            assert index.offset(*position) == offset
+
+    def test_end_of_source_is_on_last_line(self):
+        index = LineIndex.build("ab\ncd\n")
+        assert index.position(6) == (2, 4)
+
+    def test_random_sources(self):
+        rng = random.Random(7)
+        for _ in range(50):
+            source = "".join(rng.choices("ab \n\r", k=rng.randrange(40)))
+            index = LineIndex.build(source)
+            for offset, position in enumerate(positions(source)):
+                assert index.position(offset) == position
+
+
+class TestScannedPositions:
+    SOURCE = 'var a = 1;\r\n  print "x" + a;\n\t@ b;\n"open'
+
+    def test_buffer_index_matches_build(self):
+        buffer, _ = Scanner(self.SOURCE).scan_buffer()
+        assert buffer.line_index.starts == LineIndex.build(self.SOURCE).starts
+
+    def test_token_positions(self):
+        buffer, _ = Scanner(self.SOURCE).scan_buffer()
+        assert buffer.position(5) == (2, 3)
+        assert buffer[5].lexeme == "print" and buffer[5].offset == 14
+        for index in range(len(buffer)):
+            assert buffer.position(index)[0] == buffer.lines[index]
+
+    def test_error_offsets(self):
+        _, errors = Scanner(self.SOURCE).scan_buffer()
+        index = LineIndex.build(self.SOURCE)
+        assert [index.position(error.offset) for error in errors] == [(3, 2), (4, 1)]
@@ -0,0 +1,96 @@
+import io
+
+from app.closures import ClosureCompiler
+from app.objects import POLYMORPHIC_LIMIT, InlineCache, LoxClass, cache_statistics
+from app.parser import Parser
+from app.resolver import Resolver
+from app.scanner import Scanner
+
+
+def run(source: str) -> ClosureCompiler:
+    tokens, _ = Scanner(source).scan_tokens()
+    statements = Parser(tokens).parse_program()
+    assert not Resolver().resolve(statements)
+    compiler = ClosureCompiler(io.StringIO())
+    compiler.run(statements)
+    return compiler
+
+
+class TestShape:
+    def test_transitions_are_shared(self):
+        klass = LoxClass("A", None, {})
+        first = klass.root.with_field("x").with_field("y")
+        second = klass.root.with_field("x").with_field("y")
+        assert first is second
+        assert first.fields == {"x": 0, "y": 1}
+        assert klass.root.with_field("y").with_field("x") is not first
+
+    def test_instances_with_same_fields_share_a_shape(self):
+        compiler = run(
+            """
+            class P { init(x, y) { this.x = x; this.y = y; } }
+            var a = P(1, 2);
+            var b = P(3, 4);
+            """
+        )
+        a, b = compiler.globals["a"], compiler.globals["b"]
+        assert a.shape is b.shape
+        assert a.fields == [1.0, 2.0]
+
+
+class TestInlineCache:
+    def test_monomorphic_site_hits(self):
+        compiler = run(
+            """
+            class P { init() { this.x = 1; } get() { return this.x; } }
+            var p = P();
+            for (var i = 0; i < 10; i = i + 1) p.get();
+            """
+        )
+        statistics = cache_statistics(compiler.inline_caches)
+        assert statistics["invoke"] == {
+            "sites": 1,
+            "hits": 9,
+            "misses": 1,
+            "megamorphic": 0,
+        }
+        assert statistics["get"]["hits"] == 9
+        assert statistics["set"] == {
+            "sites": 1,
+            "hits": 0,
+            "misses": 1,
+            "megamorphic": 0,
+        }
+
+    def test_polymorphic_site_hits(self):
+        classes = "".join(
+            f"class C{index} {{ v() {{ return {index}; }} }}\n"
+            for index in range(POLYMORPHIC_LIMIT + 1)
+        )
+        calls = "".join(f"call(C{index}());\n" for index in range(POLYMORPHIC_LIMIT))
+        compiler = run(
+            classes
+            + "fun call(o) { return o.v(); }\n"
+            + calls * 2
+        )
+        sites = [cache for cache in compiler.inline_caches if cache.kind == "invoke"]
+        polymorphic = sites[0]
+        assert (polymorphic.hits, polymorphic.misses) == (POLYMORPHIC_LIMIT, 4)
+        assert not polymorphic.megamorphic
+
+    def test_megamorphic_site_keeps_working(self):
+        cache = InlineCache("get", "v", 1)
+        classes = [
+            LoxClass(f"C{index}", None, {"v": index})
+            for index in range(POLYMORPHIC_LIMIT + 2)
+        ]
+        for _ in range(2):
+            for klass in classes:
+                # What a site does: the first shape is checked inline
+                if klass.root is cache.shape:
+                    entry = cache.entry
+                else:
+                    entry = cache.resolve(klass.root)
+                assert entry == klass.methods["v"]
+        assert cache.megamorphic
+        assert len(cache.shapes) + 1 == POLYMORPHIC_LIMIT
@@ -0,0 +1,150 @@
+import io
+
+import pytest
+
+from app.closures import ClosureCompiler
+from app.errors import LoxRuntimeError
+from app.optimizer import (
+    ConstantFolding,
+    DeadCodeElimination,
+    PassManager,
+    StrengthReduction,
+    count_nodes,
+)
+from app.parser import Parser
+from app.resolver import Resolver
+from app.scanner import Scanner
+
+
+def parse(source: str):
+    tokens, errors = Scanner(source).scan_tokens()
+    assert not errors
+    return Parser(tokens).parse()
+
+
+def parse_program(source: str):
+    tokens, errors = Scanner(source).scan_tokens()
+    assert not errors
+    return Parser(tokens).parse_program()
+
+
+def run(statements) -> str:
+    assert not Resolver().resolve(statements)
+    stdout = io.StringIO()
+    ClosureCompiler(stdout).run(statements)
+    return stdout.getvalue()
+
+
+class TestConstantFolding:
+    @pytest.mark.parametrize(
+        "source, expected",
+        [
+            ("1 + 2 * 3", "7.0"),
+            ('("a" + "b") + "c"', "abc"),
+            ("-(3)", "-3.0"),
+            ("!nil", "true"),
+            ("1 / 0", "Infinity"),
+            ("2 >= 3 == false", "true"),
+            ('1 == "1"', "false"),
+            ("nil or x", "x"),
+            ("1 and x", "x"),
+            ("false and x", "false"),
+            ("x + (1 + 1)", "(+ x 2.0)"),
+        ],
+    )
+    def test_folds(self, source, expected):
+        assert str(ConstantFolding().run_expression(parse(source))) == expected
+
+    @pytest.mark.parametrize("source", ['1 + "a"', '-"a"', "nil < 1"])
+    def test_runtime_errors_are_kept(self, source):
+        assert str(ConstantFolding().run_expression(parse(source))) == str(
+            parse(source)
+        )
+
+
+class TestStrengthReduction:
+    @pytest.mark.parametrize(
+        "source, expected",
+        [
+            ("x / 4", "(* x 0.25)"),
+            ("x / 0.5", "(* x 2.0)"),
+            ("x / 3", "(/ x 3.0)"),
+            ("(x - y) * 1", "(group (- x y))"),
+            ("x * 1", "(* x 1.0)"),
+            ("-(-(a * b))", "(group (* a b))"),
+            ("-(-a)", "(- (group (- a)))"),
+            ("(a / 2) - 0", "(group (* a 0.5))"),
+            ("(a * b) + 0", "(+ (group (* a b)) 0.0)"),
+        ],
+    )
+    def test_reductions(self, source, expected):
+        assert str(StrengthReduction().run_expression(parse(source))) == expected
+
+    def test_division_keeps_error(self):
+        statements = StrengthReduction().run(parse_program('print "a" / 4;'))
+        with pytest.raises(LoxRuntimeError) as error:
+            run(statements)
+        assert str(error.value) == "Operands must be numbers.\n[line 1]"
+
+
+class TestDeadCodeElimination:
+    def test_branches_loops_and_returns(self):
+        statements = DeadCodeElimination().run(
+            parse_program(
+                """
+                if (false) print 1; else print 2;
+                if (nil) print 3;
+                while (false) print 4;
+                fun f() { return 1; print 5; }
+                "unused";
+                { }
+                """
+            )
+        )
+        assert len(statements) == 2
+        assert str(statements[0].expression) == "2.0"
+        assert len(statements[1].body) == 1
+
+
+class TestPassManager:
+    def test_reports(self):
+        source = """
+            var flag = 1 > 2;
+            if (1 > 2) { print "debug"; }
+            print 60 * 60 / 2;
+        """
+        manager = PassManager()
+        statements = manager.run(parse_program(source))
+        assert [report.name for report in manager.reports] == [
+            "fold",
+            "strength",
+            "dead-code",
+        ]
+        assert manager.reports[0].nodes_before == count_nodes(parse_program(source))
+        assert sum(report.removed for report in manager.reports) == 13
+        assert count_nodes(statements) == 4
+        assert str(manager.reports[0]) == "fold: removed 8 of 17 nodes"
+
+    @pytest.mark.parametrize(
+        "source",
+        [
+            """
+            fun fib(n) { if (n < 2) return n; return fib(n - 1) + fib(n - 2); }
+            print fib(10) / 2;
+            print -(-fib(5)) * 1;
+            """,
+            """
+            var s = "";
+            for (var i = 0; i < 3 * 2; i = i + 1) {
+                if (true and i > 2) s = s + "x"; else s = s + ("y" + "z");
+            }
+            print s;
+            print 0 / 0 == 0 / 0;
+            print -0 * 1;
+            print (10.40 * 2) / 8;
+            """,
+        ],
+    )
+    def test_preserves_output(self, source):
+        optimized = PassManager().run(parse_program(source))
+        assert run(optimized) == run(parse_program(source))
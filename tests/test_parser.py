@@ -1,53 +1,162 @@
-from decimal import Decimal
+import pytest
 
+from app.errors import ErrorLog, ParseError
 from app.parser import Parser
+from app.scanner import Scanner
+from app.syntax import Binary, Block, Function, Literal, Print, Var, While
 from app.tokenization import Token, TokenType
 
 
+def parse(source: str):
+    tokens, errors = Scanner(source).scan_tokens()
+    assert not errors
+    return Parser(tokens).parse()
+
+
+def parse_program(source: str):
+    tokens, errors = Scanner(source).scan_tokens()
+    assert not errors
+    return Parser(tokens).parse_program()
+
+
 class TestParser:
-    def test_bool(self):
-        parser = Parser(
-            [
-                Token(TokenType.TRUE, "true", None, 1),
-                Token(TokenType.FALSE, "false", None, 2),
-                Token(TokenType.NIL, "nil", None, 3),
-            ]
-        )
-        expression = parser.parse().traverse()
-        assert [el.value for el in expression] == ["true", "false", "nil"]
+    @pytest.mark.parametrize("source", ["true", "false", "nil"])
+    def test_bool(self, source):
+        assert str(parse(source)) == source
 
-    def test_numbers(self):
-        parser = Parser(
-            [
-                Token(TokenType.NUMBER, "3.14", Decimal("3.14"), 1),
-                Token(TokenType.NUMBER, "0", Decimal("0.0"), 1),
-                Token(TokenType.NUMBER, "42", Decimal("42.0"), 1),
-            ]
-        )
-        expression = parser.parse().traverse()
-        assert [el.value for el in expression] == ["3.14", "0.0", "42.0"]
+    @pytest.mark.parametrize(
+        "source, expected", [("3.14", "3.14"), ("0", "0.0"), ("42", "42.0")]
+    )
+    def test_numbers(self, source, expected):
+        expression = parse(source)
+        assert isinstance(expression, Literal)
+        assert str(expression) == expected
 
     def test_strings(self):
         parser = Parser(
             [
-                Token(TokenType.STRING, '"abc"', "abc", 1),
-                Token(TokenType.STRING, '"123"', "123", 1),
                 Token(
                     TokenType.STRING, '"abc*&*U&D>=-123+!="', "abc*&*U&D>=-123+!=", 1
                 ),
+                Token(TokenType.EOF, "", None, 1),
             ]
         )
-        expression = parser.parse().traverse()
-
-        assert [el.value for el in expression] == ["abc", "123", "abc*&*U&D>=-123+!="]
+        assert str(parser.parse()) == "abc*&*U&D>=-123+!="
 
     def test_groups(self):
-        parser = Parser(
-            [
-                Token(TokenType.LEFT_PAREN, "(", None, 1),
-                Token(TokenType.STRING, '"bar"', "bar", 1),
-                Token(TokenType.RIGHT_PAREN, ")", None, 2),
-            ]
+        assert str(parse('("bar")')) == "(group bar)"
+        assert str(parse("((true))")) == "(group (group true))"
+
+    def test_unary(self):
+        assert str(parse("!!true")) == "(! (! true))"
+        assert str(parse("-(-5)")) == "(- (group (- 5.0)))"
+
+    @pytest.mark.parametrize(
+        "source, expected",
+        [
+            ("1 + 2 * 3", "(+ 1.0 (* 2.0 3.0))"),
+            ("1 - 2 - 3", "(- (- 1.0 2.0) 3.0)"),
+            ("8 / 4 / 2", "(/ (/ 8.0 4.0) 2.0)"),
+            ("(1 + 2) * 3", "(* (group (+ 1.0 2.0)) 3.0)"),
+            ("1 < 2 == 3 >= 4", "(== (< 1.0 2.0) (>= 3.0 4.0))"),
+            ("a or b and c", "(or a (and b c))"),
+            ("-a * b", "(* (- a) b)"),
+        ],
+    )
+    def test_precedence(self, source, expected):
+        assert str(parse(source)) == expected
+
+    def test_assignment_calls_and_properties(self):
+        assert str(parse("a = b = 1")) == "(= a (= b 1.0))"
+        assert str(parse("f(1, g())(2)")) == "(call (call f 1.0 (call g)) 2.0)"
+        assert str(parse("a.b.c = d")) == "(= (. (. a b) c) d)"
+
+    def test_long_chain_is_iterative(self):
+        expression = parse(" + ".join(["1"] * 5000))
+        depth = 0
+        while isinstance(expression, Binary):
+            expression = expression.left
+            depth += 1
+        assert depth == 4999
+
+    @pytest.mark.parametrize(
+        "source, message",
+        [
+            ("(1 +", "[line 1] Error at end: Expect expression."),
+            ("(1", "[line 1] Error at end: Expect ')' after expression."),
+            ("1 + 2 = 3", "[line 1] Error at '=': Invalid assignment target."),
+            ("a.", "[line 1] Error at end: Expect property name after '.'."),
+            (")", "[line 1] Error at ')': Expect expression."),
+        ],
+    )
+    def test_errors(self, source, message):
+        with pytest.raises(ParseError) as error:
+            parse(source)
+        assert str(error.value) == message
+
+    def test_program(self):
+        statements = parse_program(
+            """
+            var x = 1;
+            fun add(a, b) { return a + b; }
+            for (var i = 0; i < 3; i = i + 1) print add(x, i);
+            """
         )
-        expression = parser.parse().traverse()
-        assert [el.value for el in expression] == ["(group ", "bar", ")"]
+        assert [type(statement) for statement in statements] == [Var, Function, Block]
+        initializer, loop = statements[2].statements
+        assert isinstance(initializer, Var)
+        assert isinstance(loop, While)
+        body, increment = loop.body.statements
+        assert isinstance(body, Print)
+        assert str(increment.expression) == "(= i (+ i 1.0))"
+
+    @pytest.mark.parametrize(
+        "source, message",
+        [
+            ("print 1", "[line 1] Error at end: Expect ';' after value."),
+            ("var 1;", "[line 1] Error at '1': Expect variable name."),
+            ("{ print 1;", "[line 1] Error at end: Expect '}' after block."),
+            ("fun f(a b) {}", "[line 1] Error at 'b': Expect ')' after parameters."),
+            ("class A < {}", "[line 1] Error at '{': Expect superclass name."),
+        ],
+    )
+    def test_program_errors(self, source, message):
+        with pytest.raises(ParseError) as error:
+            parse_program(source)
+        assert str(error.value) == message
+
+
+class TestRecovery:
+    def parse_all(self, source: str, limit=None):
+        tokens, _ = Scanner(source).scan_tokens()
+        errors = ErrorLog(limit)
+        return Parser(tokens).parse_program(errors), errors
+
+    def test_reports_every_statement_error(self):
+        source = "var a = ;\nprint 1;\nfun (x) {}\nprint 2 +;\nvar b = 3;"
+        statements, errors = self.parse_all(source)
+        assert [str(error) for error in errors] == [
+            "[line 1] Error at ';': Expect expression.",
+            "[line 3] Error at '(': Expect function name.",
+            "[line 4] Error at ';': Expect expression.",
+        ]
+        assert [type(statement) for statement in statements] == [Print, Var]
+
+    def test_resumes_at_statement_keyword(self):
+        statements, errors = self.parse_all("var a = + 1 var b = 2;")
+        assert len(errors) == 1
+        assert [statement.name.lexeme for statement in statements] == ["b"]
+
+    def test_counts_errors_past_limit(self):
+        statements, errors = self.parse_all("print +;\n" * 20, limit=3)
+        assert len(errors) == 3
+        assert errors.total == 20
+        assert errors.summary() == [
+            "[lines 4-20] 17 more ParseError errors not shown."
+        ]
+        assert statements == []
+
+    def test_clean_program_leaves_log_empty(self):
+        statements, errors = self.parse_all("print 1; print 2;")
+        assert len(statements) == 2
+        assert not errors
@@ -0,0 +1,88 @@
+import io
+import json
+
+import pytest
+
+from app.flat import FlatParser
+from app.parser import Parser
+from app.records import (
+    LENGTH,
+    jsonl_tokens,
+    jsonl_tree,
+    read_binary,
+    write_binary,
+)
+from app.scanner import Scanner
+
+
+def binary(source: str, tree: bool = False) -> bytes:
+    tokens, _ = Scanner(source).scan_buffer()
+    stream = io.BytesIO()
+    write_binary(stream, tokens, FlatParser(tokens).parse() if tree else None)
+    return stream.getvalue()
+
+
+class TestBinary:
+    def test_tokens_round_trip(self):
+        source = 'var café = "é" + 1.50;\nprint café >= nil;'
+        tokens, _ = Scanner(source).scan_buffer()
+        records = read_binary(binary(source))
+
+        assert records.tokens == list(tokens)
+        assert list(records.starts) == list(tokens.starts)
+        assert list(records.lengths) == list(tokens.lengths)
+        assert [token.symbol for token in records.tokens] == [
+            token.symbol for token in tokens
+        ]
+        assert Parser(records.tokens, records.symbols).parse_program()
+
+    def test_tree_round_trip(self):
+        source = '(1 + "x") * -foo.bar(2, nil) == !true'
+        tokens, _ = Scanner(source).scan_buffer()
+        records = read_binary(binary(source, tree=True))
+        assert str(records.tree) == str(FlatParser(tokens).parse())
+
+    def test_unknown_records_are_skipped(self):
+        data = binary("1;")
+        header, records = data[:6], data[6:]
+        extra = LENGTH.pack(3) + bytes([9, 1, 2])
+        assert read_binary(header + extra + records).tokens == read_binary(data).tokens
+
+    @pytest.mark.parametrize("data", [b"", b"LOXA\x01\x00", b"LOXR\x02\x00"])
+    def test_bad_header(self, data):
+        with pytest.raises(ValueError):
+            read_binary(data)
+
+
+class TestJsonLines:
+    def test_tokens(self):
+        tokens, _ = Scanner('x = "a"; 2').scan_buffer()
+        lines = [json.loads(line) for line in jsonl_tokens(tokens)]
+        assert lines[2] == {
+            "type": "STRING",
+            "lexeme": '"a"',
+            "literal": "a",
+            "line": 1,
+            "start": 4,
+            "length": 3,
+        }
+        assert lines[4]["literal"] == 2.0
+        assert lines[-1]["type"] == "EOF"
+
+    def test_overflowing_number_keeps_its_digits(self):
+        tokens, _ = Scanner("9" * 400).scan_buffer()
+        line = next(jsonl_tokens(tokens))
+        assert json.loads(line)["literal"] == "9" * 400
+
+    def test_tree_is_postorder(self):
+        tokens, _ = Scanner("-(1 + 2)").scan_buffer()
+        nodes = [json.loads(line) for line in jsonl_tree(FlatParser(tokens).parse())]
+        assert [node["kind"] for node in nodes] == [
+            "LITERAL",
+            "LITERAL",
+            "BINARY",
+            "GROUPING",
+            "UNARY",
+        ]
+        assert nodes[2]["children"] == [0, 1]
+        assert nodes[-1]["token"]["lexeme"] == "-"
@@ -0,0 +1,117 @@
+import pytest
+
+from app.parser import Parser
+from app.resolver import Resolver
+from app.scanner import Scanner
+from app.syntax import GLOBAL
+
+
+def parse_program(source: str):
+    tokens, errors = Scanner(source).scan_tokens()
+    assert not errors
+    return Parser(tokens).parse_program()
+
+
+def resolve(source: str):
+    statements = parse_program(source)
+    resolver = Resolver()
+    resolver.resolve(statements)
+    return statements, resolver
+
+
+class TestResolver:
+    def test_slots_and_depths(self):
+        statements, resolver = resolve(
+            """
+            var g = 1;
+            fun f(a, b) {
+                var c = a;
+                { var d = b; print c + d + g; }
+                return c;
+            }
+            """
+        )
+        assert not resolver.errors
+        declaration, function = statements
+        assert declaration.slot == GLOBAL
+        assert function.slot == GLOBAL
+        # a, b and c share the function scope
+        assert function.slot_count == 3
+        assert function.body[0].slot == 2
+
+        block = function.body[1]
+        assert block.slot_count == 1
+        printed = block.statements[1].expression
+        g = printed.right
+        c_plus_d = printed.left
+        assert (c_plus_d.left.depth, c_plus_d.left.slot) == (1, 2)
+        assert (c_plus_d.right.depth, c_plus_d.right.slot) == (0, 0)
+        assert g.depth == GLOBAL
+
+    def test_blocks_without_declarations_get_no_scope(self):
+        statements, _ = resolve("fun f(x) { { { x = x + 1; } } }")
+        inner = statements[0].body[0]
+        assert inner.slot_count == 0
+        assignment = inner.statements[0].statements[0].expression
+        assert (assignment.depth, assignment.slot) == (0, 0)
+
+    def test_closure_binds_at_declaration(self):
+        statements, _ = resolve(
+            """
+            var a = 1;
+            { fun show() { print a; } var a = 2; }
+            """
+        )
+        show = statements[1].statements[0]
+        assert show.body[0].expression.depth == GLOBAL
+
+    @pytest.mark.parametrize(
+        "source, message",
+        [
+            (
+                "{ var a = 1; { var a = a; } }",
+                "[line 1] Error at 'a': Can't read local variable in its own initializer.",
+            ),
+            (
+                "fun f() { var a; var a; }",
+                "[line 1] Error at 'a': Already a variable with this name in this scope.",
+            ),
+            ("return;", "[line 1] Error at 'return': Can't return from top-level code."),
+            ("print this;", "[line 1] Error at 'this': Can't use 'this' outside of a class."),
+            (
+                "class A { f() { super.f(); } }",
+                "[line 1] Error at 'super': Can't use 'super' in a class with no superclass.",
+            ),
+            ("class A < A {}", "[line 1] Error at 'A': A class can't inherit from itself."),
+            (
+                "class A { init() { return 1; } }",
+                "[line 1] Error at 'return': Can't return a value from an initializer.",
+            ),
+        ],
+    )
+    def test_errors(self, source, message):
+        _, resolver = resolve(source)
+        assert [str(error) for error in resolver.errors] == [message]
+
+    def test_global_redeclaration_is_allowed(self):
+        _, resolver = resolve("var a = 1; var a = a;")
+        assert not resolver.errors
+
+    def test_warnings(self):
+        _, resolver = resolve(
+            """
+            fun f(unused_param) {
+                var unused = 1;
+                var written = 2;
+                written = 3;
+                var read = 4;
+                return read + later + missing;
+            }
+            var later = 1;
+            """
+        )
+        assert [str(warning) for warning in resolver.warnings] == [
+            "[line 3] Warning at 'unused': Unused local variable 'unused'.",
+            "[line 4] Warning at 'written': Unused local variable 'written'.",
+            "[line 7] Warning at 'missing': Undefined variable 'missing'.",
+        ]
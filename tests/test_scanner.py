@@ -1,10 +1,18 @@
+import random
 from decimal import Decimal
 
 import pytest
 
-from app.errors import TokenError, UnterminatedStringError
-from app.scanner import Scanner
-from app.tokenization import TokenType, Token
+from app.errors import ErrorLog, TokenError, UnterminatedStringError
+from app import scanner
+from app.scanner import ScanEngine, Scanner, iter_lines, split_lines
+from app.tokenization import (
+    DEFERRED,
+    NumericMode,
+    Token,
+    TokenType,
+    format_number,
+)
 
 
 TEST_TOKEN_MAPPING = [
@@ -62,8 +70,8 @@ class TestScanner:
         assert len(errors) == 2
         assert isinstance(errors[0], TokenError)
         assert isinstance(errors[1], TokenError)
-        assert vars(errors[0]) == vars(TokenError("%", 1))
-        assert vars(errors[1]) == vars(TokenError("@", 2))
+        assert vars(errors[0]) == vars(TokenError("%", 1, 3))
+        assert vars(errors[1]) == vars(TokenError("@", 2, 9))
         assert tokens[0] == Token(TokenType.LEFT_PAREN, "(", None, 1)
         assert tokens[1] == Token(TokenType.LEFT_BRACE, "{", None, 1)
         assert tokens[2] == Token(TokenType.RIGHT_BRACE, "}", None, 1)
@@ -128,7 +136,7 @@ class TestScanner:
         assert tokens[0] == Token(TokenType.EOF, "", None, 1)
         assert len(errors) == 1
         assert isinstance(errors[0], UnterminatedStringError)
-        assert vars(errors[0]) == vars(UnterminatedStringError(1))
+        assert vars(errors[0]) == vars(UnterminatedStringError(1, 0))
 
     def test_string_with_comments(self):
         scanner = Scanner('"foo \tbar 123 // hello world!"')
@@ -273,3 +281,279 @@ EOF  null
         """
         for token, expect in zip(tokens, expected_result.splitlines()):
             assert str(token) == expect
+
+
+STREAMING_SOURCES = [
+    "",
+    "(",
+    "var a = 1;\nprint a;\n",
+    'var s = "abc";\r\nprint s @ 2;\r\n"open',
+    "1\r2\x0c3 4\n\n",
+    "foo bar // comment\n  baz\t42.5\n",
+]
+
+
+class TestStreamingScanner:
+    @pytest.mark.parametrize("source", STREAMING_SOURCES)
+    @pytest.mark.parametrize("chunk_size", [1, 2, 3, 64])
+    def test_matches_scan_tokens(self, source, chunk_size):
+        expected_tokens, expected_errors = Scanner(source).scan_tokens()
+
+        scanner = Scanner()
+        chunks = (
+            source[idx : idx + chunk_size] for idx in range(0, len(source), chunk_size)
+        )
+        tokens = list(scanner.iter_tokens(chunks))
+
+        assert tokens == expected_tokens
+        assert [str(error) for error in scanner.errors] == [
+            str(error) for error in expected_errors
+        ]
+
+    @pytest.mark.parametrize("engine", list(ScanEngine))
+    def test_interning_is_optional(self, engine):
+        chunks = ['var a = "s";\n', "a = b;\n"]
+        scanner = Scanner(engine=engine)
+        assert all(token.symbol is None for token in scanner.iter_tokens(chunks))
+        assert len(scanner.symbols) == 0
+
+        scanner = Scanner(engine=engine)
+        tokens = list(scanner.iter_tokens(chunks, intern=True))
+        assert [token.symbol for token in tokens if token.symbol is not None] == [
+            0,
+            1,
+            0,
+            2,
+        ]
+        assert list(scanner.symbols) == ["a", "s", "b"]
+
+    def test_errors_side_channel(self):
+        reported = []
+        scanner = Scanner()
+
+        tokens = scanner.iter_tokens(["(@\n", '"bar'], on_error=reported.append)
+
+        assert next(tokens) == Token(TokenType.LEFT_PAREN, "(", None, 1)
+        assert len(reported) == 0
+        assert list(tokens) == [Token(TokenType.EOF, "", None, 2)]
+        assert [str(error) for error in reported] == [
+            "[line 1] Error: Unexpected character: @",
+            "[line 2] Error: Unterminated string.",
+        ]
+        assert not scanner.errors
+
+    def test_iter_lines(self):
+        chunks = ["a\r", "\nb", "c\r", "d", "\n"]
+        assert list(iter_lines(chunks)) == "".join(chunks).splitlines()
+
+
+ENGINE_SOURCES = STREAMING_SOURCES + [
+    "a!=b x==1 i<=10",
+    "point.x = 1.5.3;",
+    "123. .5",
+    "abc// comment\ndef",
+    'print"hi"+name',
+    "else{ 12{ }",
+    '"',
+    "var é = 1;",
+]
+
+
+def _scan(source: str, engine: ScanEngine):
+    tokens, errors = Scanner(source, engine).scan_tokens()
+    return tokens, [(type(error), vars(error)) for error in errors]
+
+
+class TestScanEngines:
+    @pytest.mark.parametrize("source", ENGINE_SOURCES)
+    def test_engines_agree(self, source):
+        assert _scan(source, ScanEngine.REGEX) == _scan(source, ScanEngine.CLASSIC)
+
+    def test_engines_agree_on_random_input(self):
+        alphabet = list(' \t\n\r.,;(){}+-*/!=<>"@az_Z09') + ["//", "or", "1.5", "é"]
+        rnd = random.Random(42)
+        for _ in range(2000):
+            source = "".join(rnd.choices(alphabet, k=rnd.randint(0, 30)))
+            assert _scan(source, ScanEngine.REGEX) == _scan(
+                source, ScanEngine.CLASSIC
+            ), source
+
+    @pytest.mark.parametrize("engine", list(ScanEngine))
+    def test_adjacent_lexemes(self, engine):
+        tokens, errors = Scanner("a!=b.c 1.", engine).scan_tokens()
+        assert not errors
+        assert [(token.type, token.lexeme) for token in tokens] == [
+            (TokenType.IDENTIFIER, "a"),
+            (TokenType.BANG_EQUAL, "!="),
+            (TokenType.IDENTIFIER, "b"),
+            (TokenType.DOT, "."),
+            (TokenType.IDENTIFIER, "c"),
+            (TokenType.NUMBER, "1"),
+            (TokenType.DOT, "."),
+            (TokenType.EOF, ""),
+        ]
+
+    @pytest.mark.parametrize("engine", list(ScanEngine))
+    def test_offsets(self, engine):
+        source = 'var ab = 12;\r\n  print "s" >= ab; @\n"open'
+        expected = [token.offset for token in Scanner(source).scan_buffer()[0]]
+        tokens, errors = Scanner(source, engine).scan_tokens()
+        assert [token.offset for token in tokens] == expected
+        assert [error.offset for error in errors] == [33, 35]
+
+        chunks = [source[index : index + 5] for index in range(0, len(source), 5)]
+        scanner = Scanner(engine=engine)
+        tokens = list(scanner.iter_tokens(chunks))
+        assert [token.offset for token in tokens] == expected
+        assert [error.offset for error in scanner.errors] == [33, 35]
+
+        tokens, _ = Scanner(engine=engine).scan_line(1, "  print ab;", 14)
+        assert [token.offset for token in tokens] == [16, 22, 24]
+        tokens, _ = Scanner(engine=engine).scan_line(1, "  print ab;")
+        assert {token.offset for token in tokens} == {None}
+
+    @pytest.mark.parametrize("engine", list(ScanEngine))
+    def test_streaming(self, engine):
+        scanner = Scanner(engine=engine)
+        tokens = list(scanner.iter_tokens(["var x", " = 1;\n"]))
+        assert tokens == Scanner("var x = 1;", engine).scan_tokens()[0]
+
+
+class TestNumericMode:
+    @pytest.mark.parametrize("engine", list(ScanEngine))
+    def test_float_literals(self, engine):
+        tokens, _ = Scanner("42 2345.6789", engine, NumericMode.FLOAT).scan_tokens()
+        assert tokens[0] == Token(TokenType.NUMBER, "42", 42.0, 1)
+        assert type(tokens[0].literal) is float
+        assert tokens[1].literal == 2345.6789
+
+    def test_conversion_is_deferred(self):
+        tokens, _ = Scanner("1.5").scan_tokens()
+        assert tokens[0]._literal is DEFERRED
+        assert tokens[0].literal == Decimal("1.5")
+        assert tokens[0]._literal == Decimal("1.5")
+
+    @pytest.mark.parametrize(
+        "source", ["42 3.14 0.0000001 1e300", "99999999999999999999 000.50"]
+    )
+    def test_same_output(self, source):
+        outputs = {
+            mode: [
+                str(token) for token in Scanner(source, numeric=mode).scan_tokens()[0]
+            ]
+            for mode in NumericMode
+        }
+        assert outputs[NumericMode.FLOAT] == outputs[NumericMode.DECIMAL]
+
+    def test_format_number(self):
+        assert format_number(42.0) == "42.0"
+        assert format_number(1e-7) == "1E-7"
+        assert format_number(1e20) == "1E+20"
+        assert format_number(float("inf")) == "Infinity"
+        assert format_number(Decimal("1.5")) == "1.5"
+
+
+class TestParallelScan:
+    @pytest.fixture(autouse=True)
+    def small_chunks(self, monkeypatch):
+        monkeypatch.setattr(scanner, "MIN_CHUNK_SIZE", 8)
+
+    def test_split_lines(self):
+        source = "a\r\nbb\r\nc\nd"
+        bounds = split_lines(source, 4)
+        assert bounds[0][0] == 0 and bounds[-1][1] == len(source)
+        for (_, end), (start, _) in zip(bounds, bounds[1:]):
+            assert end == start
+            assert source[end - 1] == "\n"
+        assert split_lines("no breaks at all", 4) == [(0, 16)]
+
+    def test_matches_scan_buffer(self):
+        source = 'var a = "x";\r\n@ b = a + 1.5;\n"open\n' * 10 + "print a;"
+        expected, expected_errors = Scanner(source).scan_buffer()
+        buffer, errors = Scanner(source).scan_parallel(2)
+
+        assert list(buffer) == list(expected)
+        assert buffer.symbol_ids == expected.symbol_ids
+        assert [str(error) for error in errors] == [
+            str(error) for error in expected_errors
+        ]
+
+    def test_single_job_scans_serially(self):
+        buffer, _ = Scanner("print 1;\n" * 10).scan_parallel(1)
+        assert len(buffer) == 31
+
+
+class TestErrorLimit:
+    def test_keeps_errors_up_to_limit(self):
+        _, errors = Scanner("@\n" * 10 + '"open', error_limit=4).scan_tokens()
+        assert [error.line for error in errors] == [1, 2, 3, 4]
+        assert errors.total == 11
+        assert errors.summary() == [
+            "[lines 5-10] 6 more TokenError errors not shown.",
+            "[lines 11-11] 1 more UnterminatedStringError errors not shown.",
+        ]
+
+    def test_unlimited_by_default(self):
+        _, errors = Scanner("@\n" * 10).scan_tokens()
+        assert len(errors) == 10
+        assert errors.summary() == []
+
+    @pytest.mark.parametrize("engine", list(ScanEngine))
+    def test_counts_runs_past_limit(self, engine):
+        source = "@#$ a ~~\n1 @@ \\x;\n" * 5
+        expected = Scanner(source, engine).scan_tokens()
+        tokens, errors = Scanner(source, engine, error_limit=2).scan_tokens()
+        assert tokens == expected[0]
+        assert errors.total == len(expected[1])
+        assert errors.summary() == [
+            f"[lines 1-10] {len(expected[1]) - 2} more TokenError errors not shown."
+        ]
+
+    def test_buffer_counts_runs_past_limit(self):
+        source = "@#$ a ~~\n1 @@ \\x;\n" * 5
+        buffer, errors = Scanner(source, error_limit=2).scan_buffer()
+        expected, all_errors = Scanner(source).scan_buffer()
+        assert list(buffer) == list(expected)
+        assert errors.total == len(all_errors)
+        assert errors.dropped == {"TokenError": [len(all_errors) - 2, 1, 10]}
+
+    def test_extend_merges_dropped(self):
+        first, second = ErrorLog(1), ErrorLog(1)
+        for line in (1, 2):
+            first.append(TokenError("@", line))
+        for line in (7, 9):
+            second.append(TokenError("@", line))
+        first.extend(second)
+        assert [error.line for error in first] == [1]
+        assert first.dropped == {"TokenError": [3, 2, 9]}
+
+    def test_parallel_scan_merges_limits(self, monkeypatch):
+        monkeypatch.setattr(scanner, "MIN_CHUNK_SIZE", 8)
+        source = "@ 1;\n" * 40
+        _, expected = Scanner(source, error_limit=5).scan_buffer()
+        _, errors = Scanner(source, error_limit=5).scan_parallel(3)
+        assert [str(error) for error in errors] == [str(error) for error in expected]
+        assert errors.summary() == expected.summary()
+
+
+class TestParallelLineIndex:
+    def test_matches_scan_buffer(self, monkeypatch):
+        monkeypatch.setattr(scanner, "MIN_CHUNK_SIZE", 8)
+        source = "var a = 1;\r\n@\n\n" * 20 + "print a;"
+        expected, expected_errors = Scanner(source).scan_buffer()
+        buffer, errors = Scanner(source).scan_parallel(3)
+        assert buffer.line_index.starts == expected.line_index.starts
+        assert [error.offset for error in errors] == [
+            error.offset for error in expected_errors
+        ]
+
+    def test_trailing_line_break(self, monkeypatch):
+        monkeypatch.setattr(scanner, "MIN_CHUNK_SIZE", 1)
+        source = "a;\nb;\nc;\n"
+        # The last of the chunks is empty, starting at the final break
+        assert split_lines(source, 4)[-1] == (9, 9)
+        expected, _ = Scanner(source).scan_buffer()
+        buffer, _ = Scanner(source).scan_parallel(2)
+        assert buffer.line_index.starts == expected.line_index.starts
+        eof = len(expected) - 1
+        assert buffer.position(eof) == expected.position(eof)
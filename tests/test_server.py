@@ -0,0 +1,116 @@
+import io
+import signal
+import threading
+
+import pytest
+
+from app.client import request
+from app.protocol import FRAME, receive_message, send_message
+from app.server import Server, handle, serve_stream, start_worker
+
+PROGRAM = 'print "hi";\nprint 1 + 2;\n'
+
+
+@pytest.fixture
+def script(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "ok.lox").write_text(PROGRAM)
+    (tmp_path / "bad.lox").write_text("print 1 +;\n")
+    return tmp_path
+
+
+class TestProtocol:
+    def test_round_trip(self):
+        stream = io.BytesIO()
+        send_message(stream, {"arguments": ["run", "ok.lox"], "id": 1})
+        send_message(stream, {"text": "ünïcode"})
+        stream.seek(0)
+        assert receive_message(stream) == {"arguments": ["run", "ok.lox"], "id": 1}
+        assert receive_message(stream) == {"text": "ünïcode"}
+        assert receive_message(stream) is None
+
+    def test_truncated_message(self):
+        stream = io.BytesIO(FRAME.pack(10) + b'{"a"')
+        with pytest.raises(ValueError):
+            receive_message(stream)
+
+
+class TestHandle:
+    def test_captures_output_and_status(self, script):
+        assert handle({"arguments": ["run", "ok.lox"], "id": 7}) == {
+            "status": 0,
+            "stdout": "hi\n3\n",
+            "stderr": "",
+            "id": 7,
+        }
+        response = handle({"arguments": ["run", "bad.lox", "--cache=off"]})
+        assert response["status"] == 65
+        assert response["stderr"] == "[line 1] Error at ';': Expect expression.\n"
+
+    def test_usage_errors(self, script):
+        assert handle({"arguments": ["frob", "ok.lox"]})["status"] == 1
+        assert handle({"arguments": ["run", "ok.lox", "--jobs=0"]})["status"] == 1
+        arguments = ["run", "ok.lox", "--max-depth=8", "--backend=closure"]
+        response = handle({"arguments": arguments})
+        assert response["status"] == 1
+        assert response["stderr"] == "Option --max-depth needs --backend=vm\n"
+        assert handle({"arguments": ["run", "ok.lox", "--max-depth=8"]})["status"] == 0
+
+    def test_deep_nesting(self, script):
+        (script / "nested.lox").write_text("(" * 500 + "1" + ")" * 500)
+        (script / "negated.lox").write_text("print " + "-" * 600 + "1;")
+        response = handle({"arguments": ["evaluate", "nested.lox", "--cache=off"]})
+        assert response["status"] == 65
+        assert response["stderr"] == (
+            "[line 1] Error at '(': Expression nested too deeply.\n"
+        )
+        response = handle({"arguments": ["parse", "nested.lox", "--cache=off"]})
+        assert response["status"] == 0
+        for backend in ("closure", "tree"):
+            arguments = ["run", "negated.lox", f"--backend={backend}"]
+            response = handle({"arguments": arguments})
+            assert response["status"] == 65
+            assert response["stderr"] == "Error: Expression nested too deeply.\n"
+
+    def test_binary_output_survives(self, script):
+        response = handle({"arguments": ["tokenize", "ok.lox", "--format=binary"]})
+        data = response["stdout"].encode("utf-8", "surrogateescape")
+        assert data.startswith(b"LOXR")
+
+
+class TestServer:
+    def test_workers_leave_interrupts_to_the_server(self, monkeypatch):
+        handlers = {}
+        monkeypatch.setattr(signal, "signal", handlers.__setitem__)
+        start_worker()
+        assert handlers == {signal.SIGINT: signal.SIG_IGN}
+
+    def test_serves_socket(self, script):
+        address = str(script / "lox.sock")
+        with Server(address, jobs=1) as server:
+            thread = threading.Thread(target=server.serve_forever)
+            thread.start()
+            try:
+                first = request(["run", "ok.lox"], address, str(script))
+                second = request(["run", "bad.lox"], address, str(script))
+            finally:
+                server.shutdown()
+                thread.join()
+        assert (first["status"], first["stdout"]) == (0, "hi\n3\n")
+        assert second["status"] == 65
+        assert not (script / "lox.sock").exists()
+
+    def test_serves_stream(self, script):
+        requests = io.BytesIO()
+        send_message(requests, {"id": "a", "arguments": ["run", "ok.lox"]})
+        send_message(requests, {"id": "b"})
+        requests.seek(0)
+        responses = io.BytesIO()
+        serve_stream(requests, responses)
+
+        responses.seek(0)
+        by_id = {}
+        while (response := receive_message(responses)) is not None:
+            by_id[response["id"]] = response
+        assert by_id["a"]["stdout"] == "hi\n3\n"
+        assert by_id["b"]["status"] == 1
@@ -0,0 +1,79 @@
+import io
+import json
+
+import pytest
+
+from app.errors import TokenError
+from app.flat import FlatParser
+from app.parser import Parser
+from app.scanner import Scanner
+from app.stats import DISABLED, Stats
+
+
+class TestStats:
+    def test_phases_add_up_and_call_hooks(self):
+        stats = Stats(trace_memory=False)
+        seen = []
+        stats.add_hook(lambda name, seconds: seen.append(name))
+        for _ in range(2):
+            with stats.phase("scan"):
+                pass
+        with pytest.raises(RuntimeError):
+            with stats.phase("parse"):
+                raise RuntimeError
+        assert seen == ["scan", "scan", "parse"]
+        assert set(stats.phases) == {"scan", "parse"}
+
+    def test_token_counts(self):
+        source = "var a = a + 1;"
+        buffer, _ = Scanner(source).scan_buffer()
+        tokens, _ = Scanner(source).scan_tokens()
+        counted = Stats(trace_memory=False)
+        counted.count_tokens(buffer)
+        streamed = Stats(trace_memory=False)
+        assert list(streamed.count_stream(iter(tokens))) == tokens
+        assert counted.tokens == streamed.tokens
+        assert counted.tokens["IDENTIFIER"] == 2
+        assert counted.tokens.total() == 8
+
+    def test_node_counts(self):
+        stats = Stats(trace_memory=False)
+        tokens, _ = Scanner("fun f(x) { print x + 1; }").scan_tokens()
+        stats.count_nodes(Parser(tokens).parse_program())
+        assert stats.nodes == {
+            "Function": 1,
+            "Print": 1,
+            "Binary": 1,
+            "Variable": 1,
+            "Literal": 1,
+        }
+
+        flat = Stats(trace_memory=False)
+        buffer, _ = Scanner("-(1 + 2)").scan_buffer()
+        flat.count_nodes(FlatParser(buffer).parse())
+        assert flat.nodes == {"LITERAL": 2, "BINARY": 1, "GROUPING": 1, "UNARY": 1}
+
+    def test_report(self):
+        stats = Stats()
+        stats.start()
+        with stats.phase("scan"):
+            data = [bytes(1000) for _ in range(100)]
+        stats.stop()
+        stats.count_errors([TokenError("@", 1)])
+        stream = io.StringIO()
+        stats.write(stream)
+        report = json.loads(stream.getvalue())
+        assert report["errors"] == {"TokenError": 1}
+        assert report["peak_bytes"] >= 100 * 1000
+        assert report["wall_seconds"] >= report["phases"]["scan"]
+        assert data
+
+    def test_disabled_records_nothing(self):
+        with DISABLED.phase("scan"):
+            pass
+        tokens = iter([])
+        assert DISABLED.count_stream(tokens) is tokens
+        DISABLED.count_errors([TokenError("@", 1)])
+        assert DISABLED.phases == {} and not DISABLED.errors
+        with pytest.raises(ValueError):
+            DISABLED.add_hook(print)
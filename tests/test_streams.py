@@ -0,0 +1,53 @@
+import io
+
+import pytest
+
+from app import streams
+from app.streams import LineWriter, read_chunks, read_source, write_batched
+
+
+@pytest.fixture(params=[False, True], ids=["read", "mmap"])
+def mapped(request, monkeypatch):
+    if request.param:
+        monkeypatch.setattr(streams, "MMAP_THRESHOLD", 0)
+    return request.param
+
+
+class TestInput:
+    def test_read_chunks_decodes_split_characters(self, tmp_path, mapped):
+        path = tmp_path / "source.lox"
+        text = 'print "héllo wörld";\r\n' * 20
+        path.write_bytes(text.encode())
+        chunks = list(read_chunks(str(path), chunk_size=7))
+        assert "".join(chunks) == text
+        assert len(chunks) > 1
+
+    def test_read_source(self, tmp_path, mapped):
+        path = tmp_path / "source.lox"
+        path.write_bytes("var ä = 1;\n".encode())
+        assert read_source(str(path)) == "var ä = 1;\n"
+
+    def test_empty_file(self, tmp_path, mapped):
+        path = tmp_path / "empty.lox"
+        path.write_bytes(b"")
+        assert list(read_chunks(str(path))) == []
+        assert read_source(str(path)) == ""
+
+
+class TestOutput:
+    def test_line_writer_batches(self):
+        stream = io.StringIO()
+        with LineWriter(stream, batch_size=3) as writer:
+            writer.write("a")
+            writer.write("b")
+            assert stream.getvalue() == ""
+            writer.write("c")
+            assert stream.getvalue() == "a\nb\nc\n"
+            writer.write("d")
+            writer.writelines(map(str, range(5)))
+        assert stream.getvalue() == "a\nb\nc\nd\n0\n1\n2\n3\n4\n"
+
+    def test_write_batched(self):
+        stream = io.StringIO()
+        write_batched(stream, ("(", "+ ", "1", ")"), batch_size=3)
+        assert stream.getvalue() == "(+ 1)"
@@ -0,0 +1,61 @@
+import pytest
+
+from app.parser import Parser
+from app.scanner import ScanEngine, Scanner
+from app.symbols import SymbolTable
+from app.tokenization import TokenType
+
+
+class TestSymbolTable:
+    def test_intern(self):
+        symbols = SymbolTable()
+
+        assert symbols.intern("foo") == 0
+        assert symbols.intern("bar") == 1
+        assert symbols.intern("foo") == 0
+        assert symbols.name(1) == "bar"
+        assert symbols.lookup("baz") is None
+        assert "foo" in symbols
+        assert len(symbols) == 2
+        assert list(symbols) == ["foo", "bar"]
+
+    @pytest.mark.parametrize("engine", list(ScanEngine))
+    def test_scanner_interns_identifiers_and_strings(self, engine):
+        scanner = Scanner('var foo = "foo"; foo = bar + foo; print "x";', engine)
+        tokens, errors = scanner.scan_tokens()
+
+        assert not errors
+        symbols = {
+            token.lexeme: token.symbol
+            for token in tokens
+            if token.type == TokenType.IDENTIFIER
+        }
+        assert symbols == {"foo": 0, "bar": 1}
+        foo_tokens = [token for token in tokens if token.symbol == 0]
+        assert len(foo_tokens) == 4
+        assert foo_tokens[2].lexeme is foo_tokens[0].lexeme
+        assert foo_tokens[3].lexeme is foo_tokens[0].lexeme
+        assert foo_tokens[1].type == TokenType.STRING
+        assert foo_tokens[1].literal is scanner.symbols.name(0)
+        assert [token.symbol for token in tokens if token.type == TokenType.VAR] == [
+            None
+        ]
+        assert list(scanner.symbols) == ["foo", "bar", "x"]
+
+    def test_buffer_uses_symbol_table(self):
+        scanner = Scanner('foo "bar" foo')
+        buffer, _ = scanner.scan_buffer()
+
+        assert [buffer.symbol(index) for index in range(len(buffer))] == [
+            0,
+            1,
+            0,
+            None,
+        ]
+        assert buffer.lexeme(2) is scanner.symbols.name(0)
+        assert buffer[1].literal == "bar"
+
+    def test_parser_shares_symbols(self):
+        scanner = Scanner("foo")
+        tokens, _ = scanner.scan_tokens()
+        assert Parser(tokens, scanner.symbols).symbols is scanner.symbols
@@ -0,0 +1,121 @@
+import io
+
+import pytest
+
+from app.errors import LoxRuntimeError
+from app.parser import Parser
+from app.resolver import Resolver
+from app.scanner import Scanner
+from app.transpiler import PythonEngine, Transpiler
+
+
+def parse_program(source: str):
+    tokens, errors = Scanner(source).scan_tokens()
+    assert not errors
+    statements = Parser(tokens).parse_program()
+    assert not Resolver().resolve(statements)
+    return statements
+
+
+def transpile(source: str) -> str:
+    return Transpiler().transpile_program(parse_program(source)).source
+
+
+def run(source: str, engine=None) -> str:
+    stdout = io.StringIO()
+    engine = engine or PythonEngine(stdout)
+    engine.stdout = stdout
+    engine.globals["_write"] = stdout.write
+    engine.run(parse_program(source))
+    return stdout.getvalue()
+
+
+class TestTranspiler:
+    def test_program_layout(self):
+        source = transpile("var a = 1;\n{ var b = a; print b * 2 + 1; }")
+        assert source == (
+            "def _main():\n"
+            "    global g_a\n"
+            "    g_a = 1.0\n"
+            "    l_b_0 = g_a\n"
+            "    _write(_stringify(((l_b_0 * 2.0 if l_b_0.__class__ is float"
+            ' else _operands(2)) + 1.0)) + "\\n")\n'
+        )
+
+    def test_known_numbers_skip_checks(self):
+        source = transpile("print -(1 + 2) * 3 < 4;")
+        assert "_operands" not in source
+        assert "(((-(1.0 + 2.0)) * 3.0) < 4.0)" in source
+
+    def test_line_map(self):
+        program = Transpiler().transpile_program(
+            parse_program("var a = 1;\n\nfun f() {\n  return a;\n}")
+        )
+        lines = program.source.splitlines()
+        assert lines[3] == "    def g_f():"
+        assert program.lines[3] == 3
+        assert program.lines[lines.index("        return g_a")] == 4
+
+    def test_captured_loop_variables_get_a_function(self):
+        source = transpile(
+            "while (true) { var a = 1; fun f() { return a; } print f; }"
+        )
+        assert "def _block1():" in source
+        # Blocks whose variables are not captured are inlined
+        assert "_block" not in transpile("while (true) { var a = 1; print a; }")
+
+    def test_python_keywords_as_names(self):
+        source = """
+            var None = 1;
+            fun def(lambda) { var pass = lambda; return pass; }
+            print def(None);
+        """
+        assert run(source) == "1\n"
+
+    def test_assignments(self):
+        source = """
+            var a = 1;
+            fun f() {
+                var b = 2;
+                fun g() { a = b = b + 1; }
+                g();
+                return b;
+            }
+            print f();
+            print a;
+        """
+        assert run(source) == "3\n3\n"
+
+    def test_assignment_in_own_initializer(self):
+        source = """
+            { var b = (b = 0); print b; }
+            { var c = (c = 1); fun f() { return c; } print f(); }
+        """
+        assert run(source) == "0\n1\n"
+
+    def test_globals_persist_across_runs(self):
+        engine = PythonEngine(io.StringIO())
+        run("var a = 1; fun f() { return a; }", engine)
+        assert run("a = a + 1; print f();", engine) == "2\n"
+
+    @pytest.mark.parametrize(
+        "source, message",
+        [
+            (
+                "fun f() {\n  return 1 +\n    missing;\n}\nf();",
+                "Undefined variable 'missing'.\n[line 3]",
+            ),
+            ("a = 1;\nvar a;", "Undefined variable 'a'.\n[line 1]"),
+            ("fun f() { f(); }\nf();", "Stack overflow.\n[line 1]"),
+            ('print "a" - "b";', "Operands must be numbers.\n[line 1]"),
+            ("class A {}", "Class is not supported yet.\n[line 1]"),
+        ],
+    )
+    def test_runtime_errors(self, source, message):
+        with pytest.raises(LoxRuntimeError) as error:
+            run(source)
+        assert str(error.value) == message
+
+    def test_too_deep_for_cpython_runs_elsewhere(self):
+        # Nested deeper than CPython's parser allows
+        assert run("print " + " + ".join(["1"] * 400) + ";") == "400\n"